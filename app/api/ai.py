@@ -1,24 +1,40 @@
-from typing import List
-
-from fastapi import APIRouter, Depends, HTTPException
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-
-from app.db.session import get_db
-from app.schemas.ai import RiskInput, RiskOutput, PartRiskScore
-from app.models.trace_event import TraceEvent
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select, any_, bindparam, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from app.db.session import get_db, get_async_db
+from app.schemas.ai import (
+    RiskInput,
+    RiskOutput,
+    PartRiskScore,
+    RiskBatchRequest,
+    AnomalyOut,
+    AnomalyPage,
+)
 from app.models.part import Part
+from app.models.part_risk_state import PartRiskState
+from app.models.anomaly import Anomaly
 from app.core.roles import require_supervisor_or_admin
+from app.core.pagination import encode_cursor, decode_cursor
+from app.core.streaming import ndjson_lines, ndjson_response
+from app.services.risk_engine import RiskInputs, evaluate, evaluate_batch
+from app.services.metrics_cache import cached_endpoint
 
 router = APIRouter(prefix="/ai", tags=["ai"])
 
+# Filas por bloque al leer y puntuar en lote
+BATCH_CHUNK_SIZE = 10_000
+
 
 # ======================== RISK SCORE BASADO EN REGLAS (INPUT MANUAL) ========================
 @router.post("/risk-score", response_model=RiskOutput)
 def risk_score(data: RiskInput):
     """
     Calcula el riesgo de falla a partir de datos agregados enviados en el body.
-    No depende de la base de datos; solo aplica reglas sobre los valores recibidos.
+    No depende de la base de datos; solo aplica el motor de reglas sobre los valores recibidos.
     """
     # Validación de datos
     if data.tiempo_total_segundos < 0:
@@ -26,71 +42,122 @@ def risk_score(data: RiskInput):
     if data.num_retrabajos < 0:
         raise HTTPException(status_code=400, detail="El número de retrabajos no puede ser negativo.")
 
-    score = 0.0
-    explicaciones: List[str] = []
-
-    # Evaluación de tiempo total
-    if data.tiempo_total_segundos > 900:
-        score += 0.4
-        explicaciones.append("Tiempo total muy superior al promedio esperado.")
-    elif data.tiempo_total_segundos > 600:
-        score += 0.2
-        explicaciones.append("Tiempo total algo superior al promedio.")
-
-    # Evaluación de retrabajos
-    if data.num_retrabajos >= 2:
-        score += 0.4
-        explicaciones.append("Tiene múltiples retrabajos.")
-    elif data.num_retrabajos == 1:
-        score += 0.2
-        explicaciones.append("Tiene un retrabajo registrado.")
-
-    # Evaluación de estación
-    if data.estacion_actual.upper().startswith("INSPECCION"):
-        score += 0.1
-        explicaciones.append("Se encuentra en inspección final.")
-
-    # Limitar entre 0 y 1
-    score = min(score, 1.0)
-
-    # Determinación de nivel de riesgo
-    if score >= 0.7:
-        nivel = "ALTO"
-    elif score >= 0.4:
-        nivel = "MEDIO"
-    else:
-        nivel = "BAJO"
+    result = evaluate(
+        RiskInputs(
+            tiempo_total=data.tiempo_total_segundos,
+            retrabajo_count=data.num_retrabajos,
+            estacion=data.estacion_actual,
+        )
+    )
 
     return RiskOutput(
-        riesgo_falla=score,
-        nivel=nivel,
-        explicacion=" ".join(explicaciones) or "Riesgo bajo según reglas actuales.",
+        riesgo_falla=result.riesgo,
+        nivel=result.nivel,
+        explicacion=". ".join(result.razones) + ".",
     )
 
 
+# ======================== RISK SCORE EN LOTE (MILES DE PIEZAS) ========================
+# Debe declararse antes de /risk-score/{part_id} para que "batch" no se tome como ID.
+@router.post("/risk-score/batch")
+def risk_score_batch(
+    req: RiskBatchRequest,
+    db: Session = Depends(get_db),
+    current_user=Depends(require_supervisor_or_admin),
+):
+    """
+    Calcula el riesgo de muchas piezas a la vez (lote, turno, lista de IDs).
+    Lee los totales de todas las piezas con una sola consulta (parts + part_risk_state),
+    aplica el motor de reglas en lote (NumPy) por bloques
+    y devuelve el resultado en streaming como NDJSON (una pieza por línea).
+    """
+    stmt = (
+        select(
+            Part.id,
+            func.coalesce(PartRiskState.tiempo_total_segundos, 0.0),
+            func.coalesce(PartRiskState.scrap_count, 0),
+            func.coalesce(PartRiskState.retrabajo_count, 0),
+            func.coalesce(PartRiskState.eventos_totales, 0),
+        )
+        .select_from(Part)
+        .outerjoin(PartRiskState, PartRiskState.part_id == Part.id)
+        .order_by(Part.id)
+    )
+
+    if req.part_ids:
+        # = ANY(array) evita el límite de parámetros de un IN con miles de IDs
+        stmt = stmt.where(
+            Part.id == any_(bindparam("part_ids", req.part_ids, type_=ARRAY(Integer)))
+        )
+    if req.lote:
+        stmt = stmt.where(func.upper(Part.lote) == req.lote.strip().upper())
+    if req.tipo_pieza:
+        stmt = stmt.where(func.upper(Part.tipo_pieza) == req.tipo_pieza.strip().upper())
+    if req.fecha_desde:
+        stmt = stmt.where(Part.fecha_creacion >= req.fecha_desde)
+    if req.fecha_hasta:
+        stmt = stmt.where(Part.fecha_creacion <= req.fecha_hasta)
+
+    result = db.execute(stmt.execution_options(yield_per=BATCH_CHUNK_SIZE))
+
+    def generate():
+        for chunk in result.partitions():
+            yield ndjson_lines(_score_chunk(chunk))
+
+    return ndjson_response(generate())
+
+
+def _score_chunk(rows) -> list[dict]:
+    """
+    Aplica el motor de reglas en lote a un bloque de filas
+    (part_id, tiempo_total, scrap_count, retrabajos, eventos).
+    """
+    part_ids, tiempo, scrap, retrabajos, eventos = (np.asarray(col) for col in zip(*rows))
+    tiempo = tiempo.astype(np.float64)
+    riesgo, nivel = evaluate_batch(tiempo, scrap, retrabajos)
+
+    return [
+        {
+            "part_id": pid,
+            "riesgo": r,
+            "nivel": n,
+            "tiempo_total": t,
+            "scrap_count": s,
+            "retrabajos": rt,
+            "eventos_totales": e,
+        }
+        for pid, r, n, t, s, rt, e in zip(
+            part_ids.tolist(),
+            riesgo.tolist(),
+            nivel.tolist(),
+            np.round(tiempo, 2).tolist(),
+            scrap.tolist(),
+            retrabajos.tolist(),
+            eventos.tolist(),
+        )
+    ]
+
+
 # ======================== RISK SCORE PARA UNA PIEZA (USANDO TRACE EVENTS) ========================
 @router.post("/risk-score/{part_id}", response_model=PartRiskScore)
-def risk_score_part(
+async def risk_score_part(
     part_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user=Depends(require_supervisor_or_admin),
 ):
     """
     Calcula el riesgo de una pieza en base a todos sus TraceEvents.
-    Usa los tiempos de proceso, SCRAPs y retrabajos registrados en la BD.
+    Usa los totales de tiempo, SCRAPs y retrabajos acumulados en part_risk_state.
     """
     # Verificar si la pieza existe
-    part = db.query(Part).filter(Part.id == part_id).first()
+    part = await db.get(Part, part_id)
     if not part:
         raise HTTPException(status_code=404, detail="La pieza no existe.")
 
-    events = (
-        db.query(TraceEvent)
-        .filter(TraceEvent.part_id == part_id)
-        .all()
-    )
+    # Totales acumulados de la pieza (una búsqueda por clave primaria)
+    state = await db.get(PartRiskState, part_id)
 
-    if not events:
+    if state is None or not state.eventos_totales:
         return PartRiskScore(
             part_id=part_id,
             tiempo_total=0.0,
@@ -100,103 +167,53 @@ def risk_score_part(
             razones=["No hay eventos registrados para esta pieza."],
         )
 
-    # Calcular tiempo total SOLO cuando ambos timestamps existen
-    total_time = 0.0
-    for ev in events:
-        if ev.timestamp_entrada and ev.timestamp_salida:
-            delta = (ev.timestamp_salida - ev.timestamp_entrada).total_seconds()
-            total_time += delta
-
-    scrap_count = sum(1 for ev in events if ev.resultado == "SCRAP")
-    retrabajo_count = sum(1 for ev in events if ev.resultado == "RETRABAJO")
-
-    riesgo = 0.0
-    razones: List[str] = []
-
-    # Evaluación de tiempo total
-    if float(total_time) > 900:
-        riesgo += 0.4
-        razones.append("Tiempo total elevado.")
-    elif float(total_time) > 600:
-        riesgo += 0.2
-        razones.append("Tiempo total encima del promedio.")
-
-    # Evaluación de SCRAP
-    if scrap_count > 0:
-        riesgo += 0.4
-        razones.append("Historial de SCRAP.")
-
-    # Evaluación de retrabajos
-    if retrabajo_count >= 2:
-        riesgo += 0.2
-        razones.append("Múltiples retrabajos.")
-    elif retrabajo_count == 1:
-        riesgo += 0.1
-        razones.append("Un retrabajo registrado.")
-
-    # Si no hay ninguna razón, dejar algo explícito
-    if not razones:
-        razones.append("Sin factores de riesgo detectados.")
+    result = evaluate(
+        RiskInputs(
+            tiempo_total=state.tiempo_total_segundos,
+            scrap_count=state.scrap_count,
+            retrabajo_count=state.retrabajo_count,
+        )
+    )
 
     return PartRiskScore(
         part_id=part_id,
-        tiempo_total=total_time,
-        scrap_count=scrap_count,
-        retrabajos=retrabajo_count,
-        riesgo=min(riesgo, 1.0),
-        razones=razones,
+        tiempo_total=state.tiempo_total_segundos,
+        scrap_count=state.scrap_count,
+        retrabajos=state.retrabajo_count,
+        riesgo=result.riesgo,
+        razones=result.razones,
     )
 
 
 # ======================== DETECCIÓN DE ANOMALÍAS ========================
-@router.get("/anomalies")
+@router.get("/anomalies", response_model=AnomalyPage)
+@cached_endpoint("anomalies", ("limit", "cursor", "scope", "station_id", "tipo_pieza"))
 def anomalies(
+    limit: int = Query(50, ge=1, le=500),
+    cursor: str | None = None,
+    scope: str | None = Query(None, pattern="^(station|tipo_pieza)$"),
+    station_id: int | None = None,
+    tipo_pieza: str | None = None,
     db: Session = Depends(get_db),
     current_user=Depends(require_supervisor_or_admin),
 ):
     """
-    Detecta piezas cuyo tiempo total de proceso está > 150% del promedio.
-    Agrupa por part_id y suma los tiempos de todos los eventos.
+    Lista las anomalías detectadas al cerrar eventos (z-score del tiempo de ciclo
+    contra la media de su estación o de su tipo de pieza), de la más reciente
+    a la más antigua. Se detectan al escribir; aquí solo se leen por páginas.
     """
-    avg_time = db.query(
-        func.avg(
-            func.extract(
-                "epoch",
-                TraceEvent.timestamp_salida - TraceEvent.timestamp_entrada
-            )
-        )
-    ).scalar()
-
-    if not avg_time:
-        return []
-
-    threshold = float(avg_time) * 1.5  # 50% arriba del promedio
-
-    rows = (
-        db.query(
-            TraceEvent.part_id,
-            func.sum(
-                func.extract(
-                    "epoch",
-                    TraceEvent.timestamp_salida - TraceEvent.timestamp_entrada
-                )
-            ).label("total_time")
-        )
-        .group_by(TraceEvent.part_id)
-        .having(func.sum(
-            func.extract(
-                "epoch",
-                TraceEvent.timestamp_salida - TraceEvent.timestamp_entrada
-            )
-        ) > threshold)
-        .all()
-    )
-
-    return [
-        {
-            "part_id": part_id,
-            "tiempo_total_seg": float(total_time),
-            "porcentaje_sobre_promedio": round((float(total_time) / float(avg_time)) * 100, 2),
-        }
-        for part_id, total_time in rows
-    ]
+    query = db.query(Anomaly)
+    if scope:
+        query = query.filter(Anomaly.scope == scope)
+    if station_id is not None:
+        query = query.filter(Anomaly.station_id == station_id)
+    if tipo_pieza:
+        query = query.filter(func.upper(Anomaly.tipo_pieza) == tipo_pieza.upper())
+    if cursor:
+        query = query.filter(Anomaly.id < decode_cursor(cursor))
+
+    rows = query.order_by(Anomaly.id.desc()).limit(limit + 1).all()
+    next_cursor = encode_cursor(rows[limit - 1].id) if len(rows) > limit else None
+    # Se convierten aquí para que la caché no guarde objetos ORM ligados a la sesión
+    items = [AnomalyOut.model_validate(row) for row in rows[:limit]]
+    return {"items": items, "next_cursor": next_cursor}
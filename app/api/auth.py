@@ -2,12 +2,15 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from jose import jwt, JWTError
+from starlette.concurrency import run_in_threadpool
 from app.api import get_db
 from app.core.config import settings
-from app.core.security import hash_password, verify_password, create_access_token
+from app.core.security import create_access_token
+from app.core.password_pool import PasswordPoolBusy, busy_exception, password_pool
 from app.schemas.user import UserCreate, UserOut
 from app.schemas.token import Token
 from app.models.user import User
+from app.services.user_cache import Principal, get_principal
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -17,38 +20,57 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 # ---------- REGISTRO ----------
 
 @router.post("/register", response_model=UserOut)
-def register(user_in: UserCreate, db: Session = Depends(get_db)):
-    existing = db.query(User).filter(User.email == user_in.email).first()
+async def register(user_in: UserCreate, db: Session = Depends(get_db)):
+    existing = await run_in_threadpool(
+        lambda: db.query(User).filter(User.email == user_in.email).first()
+    )
     if existing:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="El email ya está registrado",
         )
 
+    # El hash corre en el pool de contraseñas, no en el threadpool del servidor
+    try:
+        password_hash = await password_pool.hash(user_in.password)
+    except PasswordPoolBusy:
+        raise busy_exception()
+    except ValueError as exc:
+        # UserCreate ya rechaza contraseñas vacías; esto cubre cualquier otro rechazo del hash
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(exc),
+        )
+
     # Crear usuario nuevo
     user = User(
         nombre=user_in.nombre,
         email=user_in.email,
-        password_hash=hash_password(user_in.password),
+        password_hash=password_hash,
         rol=user_in.rol,
         activo=True,
     )
 
-    db.add(user)
-    db.commit()
-    db.refresh(user)
+    def save():
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+
+    await run_in_threadpool(save)
     return user
 
 
 # ---------- LOGIN ----------
 
 @router.post("/login", response_model=Token)
-def login(
+async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db),
 ):
     # Buscamos por email, porque en OAuth2PasswordRequestForm el campo se llama "username"
-    user = db.query(User).filter(User.email == form_data.username).first()
+    user = await run_in_threadpool(
+        lambda: db.query(User).filter(User.email == form_data.username).first()
+    )
 
     # Para depuración, distinguimos entre usuario inexistente y contraseña incorrecta
     if not user:
@@ -58,7 +80,13 @@ def login(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    if not verify_password(form_data.password, user.password_hash):
+    # La verificación corre en el pool de contraseñas; si está lleno, 503 inmediato
+    try:
+        valid = await password_pool.verify(form_data.password, user.password_hash)
+    except PasswordPoolBusy:
+        raise busy_exception()
+
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Credenciales inválidas (contraseña)",
@@ -74,10 +102,11 @@ def login(
 
 # ---------- OBTENER USUARIO ACTUAL (para endpoints protegidos) ----------
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db),
-) -> User:
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> Principal:
+    """
+    Valida el JWT y devuelve el usuario desde la caché de principals.
+    Solo se consulta la BD (con una sesión propia) cuando el usuario no está en caché.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Token inválido o expirado",
@@ -93,10 +122,10 @@ def get_current_user(
         user_id: str | None = payload.get("sub")
         if user_id is None:
             raise credentials_exception
-    except JWTError:
+        user = await get_principal(int(user_id))
+    except (JWTError, ValueError):
         raise credentials_exception
 
-    user = db.query(User).get(int(user_id))
     if user is None:
         raise credentials_exception
 
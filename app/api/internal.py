@@ -0,0 +1,88 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from app.core.config import settings
+from app.core.password_pool import password_pool
+from app.core.roles import require_admin
+from app.core.request_metrics import request_metrics
+from app.db.pool_stats import describe
+from app.db.session import async_engine, async_pool_stats, engine, sync_pool_stats
+from app.services.live_feed import live_feed
+from app.services.metrics_cache import metrics_cache
+from app.services.trace_snapshot import trace_snapshot
+from app.services.user_cache import user_cache
+
+router = APIRouter(prefix="/internal", tags=["internal"])
+
+
+# ---------------------- ESTADÍSTICAS DE CACHÉ ---------------------- #
+@router.get("/cache-stats")
+def cache_stats(current_user=Depends(require_admin)):
+    """
+    Aciertos, fallos, expulsiones e invalidaciones de las cachés de métricas
+    y de usuarios autenticados de este proceso.
+    Solo ADMIN.
+    """
+    return {"metrics": metrics_cache.stats(), "users": user_cache.stats()}
+
+
+# ---------------------- POOL DE CONEXIONES ---------------------- #
+@router.get("/pool-stats")
+def pool_stats(current_user=Depends(require_admin)):
+    """
+    Configuración, uso actual y contadores (checkouts, espera, overflow,
+    timeouts) de los pools síncrono y asíncrono de este proceso.
+    Solo ADMIN.
+    """
+    return {
+        "sync": describe(engine, sync_pool_stats),
+        "async": describe(async_engine.sync_engine, async_pool_stats),
+    }
+
+
+# ---------------------- POOL DE CONTRASEÑAS ---------------------- #
+@router.get("/password-pool-stats")
+def password_pool_stats(current_user=Depends(require_admin)):
+    """
+    Workers, límite y trabajos pendientes del pool de hash/verificación de
+    contraseñas de este proceso, con los completados, fallidos, rechazados
+    (503) y los reinicios del pool tras la caída de un worker.
+    Solo ADMIN.
+    """
+    return password_pool.stats()
+
+
+# ---------------------- COPIA EN MEMORIA DE TRACE_EVENTS ---------------------- #
+@router.get("/snapshot-stats")
+def snapshot_stats(current_user=Depends(require_admin)):
+    """
+    Filas, memoria, marca de agua, antigüedad (lag_seconds) y tiempos de carga
+    y refresco de la copia columnar de trace_events de este proceso.
+    Solo ADMIN.
+    """
+    return {"metrics_source": settings.METRICS_SOURCE, **trace_snapshot.stats()}
+
+
+# ---------------------- CANAL EN VIVO ---------------------- #
+@router.get("/live-stats")
+def live_stats(current_user=Depends(require_admin)):
+    """
+    Suscriptores de /live en este proceso, recálculos del estado, mensajes
+    enviados, reenvíos de snapshot a clientes lentos y errores.
+    Solo ADMIN.
+    """
+    return live_feed.stats()
+
+
+# ---------------------- MÉTRICAS POR ENDPOINT ---------------------- #
+@router.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics(current_user=Depends(require_admin)):
+    """
+    Histogramas de latencia y de consultas SQL por petición, tiempo en BD,
+    bytes de respuesta y conteo por status, por ruta, en formato Prometheus.
+    Solo ADMIN (configurar el scrape con el token en Authorization).
+    """
+    return PlainTextResponse(
+        request_metrics.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
@@ -0,0 +1,87 @@
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+
+from app.api.auth import get_current_user
+from app.core.config import settings
+from app.core.roles import require_supervisor_or_admin
+from app.services.live_feed import LiveMessage, live_feed
+
+router = APIRouter(prefix="/live", tags=["live"])
+
+
+# ---------------------- SERVER-SENT EVENTS ---------------------- #
+def _sse(message: LiveMessage) -> str:
+    return f"id: {message.seq}\nevent: {message.event}\ndata: {message.data}\n\n"
+
+
+@router.get("/events")
+async def live_events(current_user=Depends(require_supervisor_or_admin)):
+    """
+    Actualizaciones del dashboard por Server-Sent Events: un evento "snapshot"
+    al conectar y luego eventos "delta" (conteos por status, piezas OK por día
+    y anomalías nuevas) cuando se crean o cierran eventos de traza.
+    Requiere rol SUPERVISOR o ADMIN.
+    """
+    subscriber = await live_feed.subscribe()
+
+    async def generate():
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscriber.get(), settings.LIVE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comentario SSE: mantiene viva la conexión a través de proxies
+                    yield ": ping\n\n"
+                    continue
+                yield _sse(message)
+        finally:
+            live_feed.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# ---------------------- WEBSOCKET ---------------------- #
+async def _wait_disconnect(websocket: WebSocket) -> None:
+    """Lee y descarta lo que envíe el cliente (pings, keep-alive) hasta que cierre."""
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
+
+
+@router.websocket("/ws")
+async def live_ws(websocket: WebSocket, token: str = Query(...)):
+    """
+    Mismos mensajes que /live/events (JSON con "type" snapshot o delta) por WebSocket.
+    El navegador no puede enviar Authorization al abrir un WebSocket, así que
+    el JWT va en ?token=. Requiere rol SUPERVISOR o ADMIN.
+    """
+    try:
+        await require_supervisor_or_admin(await get_current_user(token))
+    except HTTPException as exc:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=exc.detail)
+        return
+
+    await websocket.accept()
+    subscriber = await live_feed.subscribe()
+    # Lo que envíe el cliente se ignora; leer solo sirve para enterarse de que cerró
+    closed = asyncio.create_task(_wait_disconnect(websocket))
+    try:
+        while True:
+            message = asyncio.create_task(subscriber.get())
+            done, _ = await asyncio.wait({message, closed}, return_when=asyncio.FIRST_COMPLETED)
+            if closed in done:
+                message.cancel()
+                break
+            await websocket.send_text(message.result().data)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        closed.cancel()
+        live_feed.unsubscribe(subscriber)
@@ -1,43 +1,52 @@
-from datetime import datetime
+from datetime import date, datetime, timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import func
-from sqlalchemy.orm import Session
-from app.db.session import get_db
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.db.session import get_async_db
 from app.models.part import Part
-from app.models.trace_event import TraceEvent
+from app.models.throughput_rollup import ThroughputRollup
 from app.core.roles import require_supervisor_or_admin
+from app.services import cycle_sketches
+from app.services.throughput_rollup import UTC_DAY, utc_midnight
+from app.services.metrics_cache import cached_endpoint
+from app.services.trace_snapshot import trace_snapshot
 
 router = APIRouter(prefix="/metrics", tags=["metrics"])
 
 # ---------------------- PARTS BY STATUS ---------------------- #
 @router.get("/parts-by-status")
-def parts_by_status(
-    db: Session = Depends(get_db),
+@cached_endpoint("parts-by-status")
+async def parts_by_status(
+    db: AsyncSession = Depends(get_async_db),
     current_user=Depends(require_supervisor_or_admin),
 ):
     """
     Devuelve un conteo de piezas por status.
     Requiere rol SUPERVISOR o ADMIN.
     """
-    rows = (
-        db.query(Part.status, func.count(Part.id))
+    rows = await db.execute(
+        select(Part.status, func.count(Part.id))
         .group_by(Part.status)
-        .all()
     )
     return {status: count for status, count in rows}
 
 
 # ---------------------- THROUGHPUT --------------------------- #
 @router.get("/throughput")
-def throughput(
+@cached_endpoint("throughput", ("from_date", "to_date"))
+async def throughput(
     from_date: str,
     to_date: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user=Depends(require_supervisor_or_admin),
 ):
     """
     Devuelve piezas OK por día entre from_date y to_date (YYYY-MM-DD).
-    Usa los TraceEvent con resultado OK y timestamp_salida no nulo.
+    Lee la tabla throughput_rollup (piezas OK por hora), que se mantiene
+    al crear/cerrar eventos, en lugar de recorrer trace_events.
+    Con METRICS_SOURCE=snapshot se calcula sobre la copia en memoria.
     """
     try:
         from_date_obj = datetime.strptime(from_date, "%Y-%m-%d").date()
@@ -48,18 +57,17 @@ def throughput(
             detail="Formato de fecha incorrecto. Usa YYYY-MM-DD.",
         )
 
-    rows = (
-        db.query(
-            func.date(TraceEvent.timestamp_salida),
-            func.count(TraceEvent.id),
-        )
-        .filter(TraceEvent.resultado == "OK")
-        .filter(TraceEvent.timestamp_salida.isnot(None))
-        .filter(func.date(TraceEvent.timestamp_salida) >= from_date_obj)
-        .filter(func.date(TraceEvent.timestamp_salida) <= to_date_obj)
-        .group_by(func.date(TraceEvent.timestamp_salida))
-        .order_by(func.date(TraceEvent.timestamp_salida))
-        .all()
+    if settings.METRICS_SOURCE == "snapshot":
+        return await run_in_threadpool(trace_snapshot.throughput, from_date_obj, to_date_obj)
+
+    rows = await db.execute(
+        select(UTC_DAY, func.sum(ThroughputRollup.ok_count))
+        # Rango sobre la columna (sin función) para usar la clave primaria
+        .where(ThroughputRollup.bucket >= utc_midnight(from_date_obj))
+        .where(ThroughputRollup.bucket < utc_midnight(to_date_obj + timedelta(days=1)))
+        .group_by(UTC_DAY)
+        .having(func.sum(ThroughputRollup.ok_count) > 0)
+        .order_by(UTC_DAY)
     )
 
     return [{"fecha": str(day), "piezas": count} for day, count in rows]
@@ -67,60 +75,56 @@ def throughput(
 
 # ------------------- STATION CYCLE TIME ---------------------- #
 @router.get("/station-cycle-time")
-def station_cycle_time(
-    db: Session = Depends(get_db),
+@cached_endpoint("station-cycle-time", ("desde", "hasta", "station_id"))
+async def station_cycle_time(
+    desde: date | None = None,
+    hasta: date | None = None,
+    station_id: int | None = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user=Depends(require_supervisor_or_admin),
 ):
     """
-    Devuelve el tiempo de ciclo promedio (en segundos) por estación.
+    Devuelve el tiempo de ciclo (en segundos) por estación:
+    promedio, número de eventos y percentiles p50/p90/p95/p99.
     Calculado como timestamp_salida - timestamp_entrada.
+    Se sirve desde los sketches diarios por estación (días UTC entre desde y hasta,
+    ambos incluidos; sin fechas usa todo el histórico).
+    Con METRICS_SOURCE=snapshot se calcula sobre la copia en memoria, con
+    cuantiles exactos.
     """
-    rows = (
-        db.query(
-            TraceEvent.station_id,
-            func.avg(
-                func.extract(
-                    "epoch",
-                    TraceEvent.timestamp_salida - TraceEvent.timestamp_entrada,
-                )
-            ),
+    if desde and hasta and desde > hasta:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="desde no puede ser posterior a hasta.",
         )
-        .filter(TraceEvent.timestamp_salida.isnot(None))
-        .filter(TraceEvent.timestamp_entrada.isnot(None))
-        .group_by(TraceEvent.station_id)
-        .all()
-    )
 
-    return [
-        {
-            "station_id": station_id,
-            "tiempo_promedio_segundos": float(avg_secs) if avg_secs is not None else None,
-        }
-        for station_id, avg_secs in rows
-    ]
+    if settings.METRICS_SOURCE == "snapshot":
+        return await run_in_threadpool(trace_snapshot.station_cycle_time, desde, hasta, station_id)
+
+    # El merge de sketches es código síncrono; corre sobre la conexión async
+    return await db.run_sync(cycle_sketches.station_quantiles, desde, hasta, station_id)
 
 
 # ----------------------- SCRAP RATE -------------------------- #
 @router.get("/scrap-rate")
-def scrap_rate(
-    db: Session = Depends(get_db),
+@cached_endpoint("scrap-rate")
+async def scrap_rate(
+    db: AsyncSession = Depends(get_async_db),
     current_user=Depends(require_supervisor_or_admin),
 ):
     """
     Devuelve el porcentaje de SCRAP por tipo de pieza.
     scrap_rate va de 0 a 1 (0% a 100%).
     """
-    total_by_type = (
-        db.query(Part.tipo_pieza, func.count(Part.id))
+    total_by_type = await db.execute(
+        select(Part.tipo_pieza, func.count(Part.id))
         .group_by(Part.tipo_pieza)
-        .all()
     )
 
-    scrap_by_type = (
-        db.query(Part.tipo_pieza, func.count(Part.id))
-        .filter(Part.status == "SCRAP")
+    scrap_by_type = await db.execute(
+        select(Part.tipo_pieza, func.count(Part.id))
+        .where(Part.status == "SCRAP")
         .group_by(Part.tipo_pieza)
-        .all()
     )
 
     total_dict = {t: c for t, c in total_by_type}
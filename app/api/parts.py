@@ -1,9 +1,14 @@
 from datetime import date
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from app.db.session import get_db
 from app.models.part import Part
-from app.schemas.part import PartCreate, PartOut, PartUpdate
+from app.schemas.part import PartCreate, PartOut, PartPage, PartUpdate
+from app.core.pagination import encode_cursor, decode_cursor
+from app.core.serialization import json_response, model_columns, model_rows
+from app.core.streaming import ndjson_lines, ndjson_response
+from app.services import change_feed
+from app.services.metrics_cache import invalidate_for
 from app.core.roles import (
     require_user,
     require_supervisor_or_admin,
@@ -14,6 +19,12 @@ from sqlalchemy import func
 
 router = APIRouter(prefix="/parts", tags=["parts"])
 
+# Filas que se leen por viaje al servidor en modo streaming
+STREAM_CHUNK_SIZE = 1000
+
+# Columnas del listado: se leen como filas y se serializan sin pasar por PartOut
+PART_COLUMNS = model_columns(PartOut, Part)
+
 
 # ------------------ CREAR PIEZA (OPERATOR / ADMIN) ------------------ #
 @router.post("/", response_model=PartOut)
@@ -37,32 +48,28 @@ def create_part(
 
     part = Part(**part_in.model_dump())
     db.add(part)
+    db.flush()
+    change_feed.queue_part_status(db, part.id, part.status)
     db.commit()
+    invalidate_for("parts")
     db.refresh(part)
     return part
 
 
-# -------- LISTAR PIEZAS (SUPERVISOR / ADMIN) + filtros ------------- #
-@router.get("/", response_model=list[PartOut])
-def list_parts(
+# ------------------ FILTROS DE PIEZAS ------------------ #
+def filter_parts(
+    query,
     status: str | None = None,
     tipo_pieza: str | None = None,
     lote: str | None = None,
     fecha_desde: date | None = None,
     fecha_hasta: date | None = None,
-    db: Session = Depends(get_db),
-    current_user=Depends(require_supervisor_or_admin),
 ):
     """
-    Lista piezas con filtros opcionales:
-    - status
-    - tipo_pieza
-    - lote
-    - rango de fechas (fecha_creacion entre fecha_desde y fecha_hasta)
-    Permitido para SUPERVISOR o ADMIN.
+    Aplica los filtros de listado a una consulta de Part.
+    Los predicados func.upper(col) == valor coinciden con los índices
+    de expresión definidos en el modelo Part.
     """
-    query = db.query(Part)
-
     # --- Filtro por status (normaliza a MAYÚSCULAS) ---
     if status:
         status_norm = status.strip().upper()
@@ -85,7 +92,64 @@ def list_parts(
     if fecha_hasta:
         query = query.filter(Part.fecha_creacion <= fecha_hasta)
 
-    return query.order_by(Part.id).all()
+    return query
+
+
+# -------- LISTAR PIEZAS (SUPERVISOR / ADMIN) + filtros ------------- #
+@router.get("/", response_model=PartPage)
+def list_parts(
+    status: str | None = None,
+    tipo_pieza: str | None = None,
+    lote: str | None = None,
+    fecha_desde: date | None = None,
+    fecha_hasta: date | None = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: str | None = None,
+    stream: bool = False,
+    db: Session = Depends(get_db),
+    current_user=Depends(require_supervisor_or_admin),
+):
+    """
+    Lista piezas con filtros opcionales:
+    - status
+    - tipo_pieza
+    - lote
+    - rango de fechas (fecha_creacion entre fecha_desde y fecha_hasta)
+    Paginación por cursor (keyset sobre id): se devuelven hasta `limit` piezas
+    y `next_cursor` para pedir la siguiente página.
+    Con stream=true se devuelven todas las piezas (desde el cursor) como NDJSON,
+    leyendo con un cursor del lado del servidor.
+    Permitido para SUPERVISOR o ADMIN.
+    """
+    query = filter_parts(
+        db.query(*PART_COLUMNS), status, tipo_pieza, lote, fecha_desde, fecha_hasta
+    )
+
+    # --- Keyset: continuar después del último id visto ---
+    if cursor:
+        query = query.filter(Part.id > decode_cursor(cursor))
+
+    query = query.order_by(Part.id)
+
+    if stream:
+        def generate():
+            rows = query.yield_per(STREAM_CHUNK_SIZE)
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= STREAM_CHUNK_SIZE:
+                    yield ndjson_lines(model_rows(batch, PartOut))
+                    batch = []
+            if batch:
+                yield ndjson_lines(model_rows(batch, PartOut))
+
+        return ndjson_response(generate())
+
+    # Se pide una fila extra para saber si existe otra página
+    parts = query.limit(limit + 1).all()
+    next_cursor = encode_cursor(parts[limit - 1].id) if len(parts) > limit else None
+
+    return json_response({"items": model_rows(parts[:limit], PartOut), "next_cursor": next_cursor})
 
 
 
@@ -143,11 +207,15 @@ def update_part(
                 detail="Ya existe otra pieza con ese serial.",
             )
 
+    if "status" in data and data["status"] != part.status:
+        change_feed.queue_part_status(db, part.id, data["status"])
+
     for field, value in data.items():
         setattr(part, field, value)
 
     db.add(part)
     db.commit()
+    invalidate_for("parts")
     db.refresh(part)
     return part
 
@@ -172,4 +240,5 @@ def delete_part(
 
     db.delete(part)
     db.commit()
+    invalidate_for("parts")
     return None
@@ -4,10 +4,15 @@ from sqlalchemy.orm import Session
 from app.db.session import get_db
 from app.models.station import Station
 from app.schemas.station import StationCreate, StationOut, StationUpdate
+from app.services.metrics_cache import invalidate_for
+from app.core.serialization import json_response, model_columns, model_rows
 from app.core.roles import require_admin, require_supervisor_or_admin, require_user
 
 router = APIRouter(prefix="/stations", tags=["stations"])
 
+# Columnas del listado: se leen como filas y se serializan sin pasar por StationOut
+STATION_COLUMNS = model_columns(StationOut, Station)
+
 # ------------------ CREAR ESTACIÓN (SOLO ADMIN) ------------------ #
 @router.post("/", response_model=StationOut)
 def create_station(
@@ -31,6 +36,7 @@ def create_station(
     station = Station(**station_in.model_dump())
     db.add(station)
     db.commit()
+    invalidate_for("stations")
     db.refresh(station)
     return station
 
@@ -44,7 +50,8 @@ def list_stations(
     Lista todas las estaciones.
     Permitido para SUPERVISOR o ADMIN.
     """
-    return db.query(Station).order_by(Station.id).all()
+    rows = db.query(*STATION_COLUMNS).order_by(Station.id).all()
+    return json_response(model_rows(rows, StationOut))
 
 # ------------------ OBTENER ESTACIÓN POR ID ------------------ #
 @router.get("/{station_id}", response_model=StationOut)
@@ -91,6 +98,7 @@ def update_station(
 
     db.add(station)
     db.commit()
+    invalidate_for("stations")
     db.refresh(station)
     return station
 
@@ -114,6 +122,7 @@ def delete_station(
 
     db.delete(station)
     db.commit()
+    invalidate_for("stations")
     return None
 
 # ------------------ RUTA PRIVADA (CUALQUIER ROL) ------------------ #
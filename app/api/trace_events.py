@@ -1,132 +1,188 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import time
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, insert, select, update
+from datetime import datetime, timezone
 
-from app.db.session import get_db
+from app.db.session import get_db, get_async_db
 from app.models.trace_event import TraceEvent
 from app.models.part import Part
 from app.models.station import Station
-from app.schemas.trace_event import TraceEventCreate, TraceEventOut
+from app.models.part_risk_state import PartRiskState
+from app.models.trace_archive import TraceArchiveFile
+from app.models.change_feed import ChangeFeedEntry
+from app.schemas.trace_event import (
+    TraceEventCreate,
+    TraceEventOut,
+    TraceEventBulkItemResult,
+    TraceEventBulkOut,
+    ChangeOut,
+    ChangePage,
+)
+from app.core.config import settings
+from app.core.etag import etag_matches, make_etag
 from app.core.roles import require_user, require_supervisor_or_admin
+from app.core.serialization import json_response, model_columns, model_rows
+from app.core.streaming import ndjson_lines, ndjson_response
+from app.services import change_feed, event_archive, risk_state
+from app.services.risk_engine import RiskInputs, evaluate
+from app.services.metrics_cache import invalidate_for
+from app.services.trace_hooks import EventSnapshot, record_event_change, record_event_changes
 
 router = APIRouter(prefix="/trace-events", tags=["trace_events"])
 
+RESULTADOS_VALIDOS = {"OK", "SCRAP", "RETRABAJO"}
+
+# Límite de eventos por petición en la carga masiva
+MAX_BULK_EVENTS = 5000
+
+# Filas que se leen por viaje al servidor en el historial en streaming
+STREAM_CHUNK_SIZE = 1000
+
+# Feed de cambios: máximo de filas por página y de segundos de long-poll
+MAX_CHANGES_LIMIT = 1000
+MAX_CHANGES_WAIT = 30
+CHANGE_COLUMNS = model_columns(ChangeOut, ChangeFeedEntry)
+
 
 # ======================== FUNCIÓN AUXILIAR PARA CALCULAR RISK SCORE ========================
-def calculate_risk_score_for_part(part_id: int, db: Session) -> dict:
+async def calculate_risk_score_for_part(part_id: int, db: AsyncSession) -> dict:
     """
     Función auxiliar para calcular el risk score de una pieza
     Retorna un diccionario con el riesgo, nivel y razones
+    Lee los totales de part_risk_state (una búsqueda por clave primaria);
+    el llamador es responsable de validar que la pieza exista.
     """
-    part = db.query(Part).filter(Part.id == part_id).first()
-    if not part:
-        return None
-    
-    # Obtener todos los eventos de la pieza
-    events = db.query(TraceEvent).filter(TraceEvent.part_id == part_id).all()
-    
-    if not events:
+    state = await db.get(PartRiskState, part_id)
+    if state is None:
+        return build_risk_score(0.0, 0, 0, 0)
+
+    return build_risk_score(
+        state.tiempo_total_segundos,
+        state.eventos_totales,
+        state.scrap_count,
+        state.retrabajo_count,
+    )
+
+
+def build_risk_score(
+    total_time: float,
+    eventos_totales: int,
+    scrap_count: int,
+    retrabajo_count: int,
+) -> dict:
+    """
+    Aplica el motor de reglas sobre los totales ya agregados de una pieza.
+    Compartida por el cálculo individual y por el cálculo en lote.
+    """
+    if not eventos_totales:
         return {
             "riesgo": 0.0,
             "nivel": "BAJO",
             "razones": ["Sin eventos registrados"],
             "detalles": {
-                "tiempo_total_segundos": 0,
-                "tiempo_total_minutos": 0,
+                "tiempo_total_segundos": 0.0,
+                "tiempo_total_minutos": 0.0,
                 "eventos_totales": 0,
                 "scrap_count": 0,
                 "retrabajo_count": 0
             }
         }
-    
-    # Calcular tiempo total
-    total_time = 0
-    eventos_con_tiempo = 0
-    for ev in events:
-        if ev.timestamp_entrada and ev.timestamp_salida:
-            delta = (ev.timestamp_salida - ev.timestamp_entrada).total_seconds()
-            total_time += delta
-            eventos_con_tiempo += 1
-    
-    # Contar resultados
-    scrap_count = sum(1 for ev in events if ev.resultado == "SCRAP")
-    retrabajo_count = sum(1 for ev in events if ev.resultado == "RETRABAJO")
-    
-    # Inicializar riesgo
-    riesgo = 0.0
-    razones = []
-    
-    # Factor 1: Evaluación de tiempo total
-    if total_time > 900:  # Más de 15 minutos
-        riesgo += 0.4
-        razones.append(f"Tiempo total elevado ({round(total_time/60, 1)} min > 15 min)")
-    elif total_time > 600:  # Más de 10 minutos
-        riesgo += 0.2
-        razones.append(f"Tiempo sobre promedio ({round(total_time/60, 1)} min > 10 min)")
-    
-    # Factor 2: Evaluación de SCRAP
-    if scrap_count > 0:
-        riesgo += 0.4
-        razones.append(f"Historial de SCRAP ({scrap_count} evento{'s' if scrap_count > 1 else ''})")
-    
-    # Factor 3: Evaluación de retrabajos
-    if retrabajo_count >= 2:
-        riesgo += 0.2
-        razones.append(f"Múltiples retrabajos ({retrabajo_count} eventos)")
-    elif retrabajo_count == 1:
-        riesgo += 0.1
-        razones.append("Un retrabajo registrado")
-    
-    # Limitar riesgo entre 0 y 1
-    riesgo = min(riesgo, 1.0)
-    
-    # Determinar nivel de riesgo
-    if riesgo >= 0.7:
-        nivel = "ALTO"
-    elif riesgo >= 0.4:
-        nivel = "MEDIO"
-    else:
-        nivel = "BAJO"
-    
-    # Si no hay razones, significa que está todo bien
-    if not razones:
-        razones.append("Sin factores de riesgo detectados")
+
+    result = evaluate(RiskInputs(total_time, scrap_count, retrabajo_count))
     
     return {
-        "riesgo": round(riesgo, 2),
-        "nivel": nivel,
-        "razones": razones,
+        "riesgo": result.riesgo,
+        "nivel": result.nivel,
+        "razones": result.razones,
         "detalles": {
             "tiempo_total_segundos": round(total_time, 2),
             "tiempo_total_minutos": round(total_time / 60, 2),
-            "eventos_totales": len(events),
+            "eventos_totales": eventos_totales,
             "scrap_count": scrap_count,
             "retrabajo_count": retrabajo_count
         }
     }
 
 
+async def risk_score_after_write(part_id: int, risk_totals: dict, db: AsyncSession) -> dict:
+    """
+    Risk score de una pieza recién escrita: usa los totales que devolvió
+    record_event_changes y solo lee part_risk_state si la pieza no está ahí.
+    """
+    if part_id in risk_totals:
+        return _risk_score_from_totals(risk_totals[part_id])
+    return await calculate_risk_score_for_part(part_id, db)
+
+
+# ======================== RISK SCORE EN LOTE (UNA SOLA CONSULTA) ========================
+def calculate_risk_scores_for_parts(part_ids, db: Session) -> dict:
+    """
+    Calcula el risk score de varias piezas con una sola consulta a part_risk_state.
+    Retorna un diccionario {part_id: risk_score}.
+    """
+    ids = set(part_ids)
+    if not ids:
+        return {}
+
+    states = db.query(PartRiskState).filter(PartRiskState.part_id.in_(ids)).all()
+    scores = {
+        st.part_id: build_risk_score(
+            st.tiempo_total_segundos,
+            st.eventos_totales,
+            st.scrap_count,
+            st.retrabajo_count,
+        )
+        for st in states
+    }
+    # Piezas sin eventos
+    for part_id in ids - scores.keys():
+        scores[part_id] = build_risk_score(0.0, 0, 0, 0)
+    return scores
+
+
+def _salida_utc(value: datetime | None) -> datetime | None:
+    """timestamp_salida recibido, con las fechas sin zona tomadas como UTC (como en trace_hooks)."""
+    if value is None or value.tzinfo is not None:
+        return value
+    return value.replace(tzinfo=timezone.utc)
+
+
+SALIDA_ANTERIOR = "timestamp_salida no puede ser anterior a la entrada del evento."
+
+
 # ======================== CREAR EVENTO DE TRAZA ========================
 @router.post("/", response_model=TraceEventOut)
-def create_trace_event(
+async def create_trace_event(
     event_in: TraceEventCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user=Depends(require_user),
 ):
     """
     Crea un nuevo evento de traza para una pieza.
     Calcula automáticamente el risk score después de crear el evento.
     """
+    # timestamp_entrada lo pone la BD (now()): una salida en el pasado daría
+    # una duración negativa
+    event_in.timestamp_salida = _salida_utc(event_in.timestamp_salida)
+    if event_in.timestamp_salida and event_in.timestamp_salida < datetime.now(timezone.utc):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=SALIDA_ANTERIOR,
+        )
+
     # Validar que existan la pieza y la estación
-    part = db.query(Part).get(event_in.part_id)
+    part = await db.get(Part, event_in.part_id)
     if not part:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Pieza no encontrada.",
         )
 
-    station = db.query(Station).get(event_in.station_id)
+    station = await db.get(Station, event_in.station_id)
     if not station:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -144,25 +200,35 @@ def create_trace_event(
 
     # Actualizar el estado de la pieza si el resultado es válido
     if event_in.resultado in {"OK", "SCRAP", "RETRABAJO"}:
+        if part.status != event_in.resultado:
+            change_feed.queue_part_status(db, part.id, event_in.resultado)
         part.status = event_in.resultado
         db.add(part)
         
         # Si es SCRAP o RETRABAJO, establecer timestamp_salida automáticamente si no existe
         if event_in.resultado in {"SCRAP", "RETRABAJO"} and not event_in.timestamp_salida:
-            event_in.timestamp_salida = datetime.utcnow()
+            event_in.timestamp_salida = datetime.now(timezone.utc)
 
-    # Crear el evento de traza
-    event = TraceEvent(**event_in.model_dump())
-    db.add(event)
+    # Crear el evento de traza: INSERT ... RETURNING trae id y timestamp_entrada
+    # (default del servidor) sin un refresh aparte
+    event = (await db.scalars(
+        insert(TraceEvent).values(**event_in.model_dump()).returning(TraceEvent)
+    )).one()
+
+    # Actualizar los agregados en la misma transacción (los servicios son síncronos)
+    risk_totals = await db.run_sync(
+        record_event_change, None, EventSnapshot.from_event(event, part.tipo_pieza)
+    )
     
     # Guardar en la base de datos
-    db.commit()
-    db.refresh(event)
+    await db.commit()
+    invalidate_for("trace_events")
     
-    # IMPORTANTE: Calcular el risk score DESPUÉS de crear el evento
-    risk_score = calculate_risk_score_for_part(event_in.part_id, db)
+    # Risk score con los totales que dejó el evento (ya leídos del upsert)
+    risk_score = await risk_score_after_write(event.part_id, risk_totals, db)
     
-    # Crear un diccionario con el evento y el risk score
+    # Crear un diccionario con el evento y el risk score (mismos campos que
+    # TraceEventOut; se serializa directo, sin volver a validarlo)
     event_dict = {
         "id": event.id,
         "part_id": event.part_id,
@@ -175,78 +241,421 @@ def create_trace_event(
         "risk_score": risk_score  # Agregar risk score a la respuesta
     }
     
-    return event_dict
+    return json_response(event_dict)
+
+
+# ======================== CARGA MASIVA DE EVENTOS ========================
+@router.post("/bulk", response_model=TraceEventBulkOut)
+def create_trace_events_bulk(
+    events_in: list[TraceEventCreate],
+    db: Session = Depends(get_db),
+    current_user=Depends(require_user),
+):
+    """
+    Registra varios eventos de traza en una sola transacción.
+    Valida piezas y estaciones con consultas por conjunto, inserta todos los
+    eventos con un solo executemany y devuelve el resultado de cada elemento
+    junto con el risk score (calculado en lote) de las piezas afectadas.
+    """
+    if not events_in:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="La lista de eventos está vacía.",
+        )
+    if len(events_in) > MAX_BULK_EVENTS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Máximo {MAX_BULK_EVENTS} eventos por petición.",
+        )
+
+    # Validar existencia de piezas y estaciones con una consulta por tabla
+    part_ids = {ev.part_id for ev in events_in}
+    station_ids = {ev.station_id for ev in events_in}
+    part_tipos = {}
+    part_current_status = {}
+    for pid, tipo, current in db.query(Part.id, Part.tipo_pieza, Part.status).filter(
+        Part.id.in_(part_ids)
+    ):
+        part_tipos[pid] = tipo
+        part_current_status[pid] = current
+    existing_stations = {
+        sid for (sid,) in db.query(Station.id).filter(Station.id.in_(station_ids))
+    }
+
+    # Posterior al now() de la transacción, que será el timestamp_entrada de las filas
+    now = datetime.now(timezone.utc)
+    resultados: list[TraceEventBulkItemResult | None] = [None] * len(events_in)
+    rows = []
+    row_index = []
+    part_status = {}
+
+    for i, ev in enumerate(events_in):
+        if ev.part_id not in part_tipos:
+            resultados[i] = TraceEventBulkItemResult(
+                index=i, ok=False, part_id=ev.part_id, error="Pieza no encontrada."
+            )
+            continue
+        if ev.station_id not in existing_stations:
+            resultados[i] = TraceEventBulkItemResult(
+                index=i, ok=False, part_id=ev.part_id, error="Estación no encontrada."
+            )
+            continue
+
+        data = ev.model_dump()
+        data["timestamp_salida"] = _salida_utc(data["timestamp_salida"])
+        if data["timestamp_salida"] and data["timestamp_salida"] < now:
+            resultados[i] = TraceEventBulkItemResult(
+                index=i, ok=False, part_id=ev.part_id, error=SALIDA_ANTERIOR
+            )
+            continue
+
+        if ev.resultado in RESULTADOS_VALIDOS:
+            # El último evento de la petición define el estado, igual que en orden secuencial
+            part_status[ev.part_id] = ev.resultado
+            if ev.resultado in {"SCRAP", "RETRABAJO"} and not data["timestamp_salida"]:
+                data["timestamp_salida"] = now
+
+        rows.append(data)
+        row_index.append(i)
+
+    risk_totals = {}
+    if rows:
+        # Un solo INSERT ... RETURNING con executemany, en el mismo orden de entrada
+        inserted = db.execute(
+            insert(TraceEvent).returning(
+                TraceEvent.id,
+                TraceEvent.timestamp_entrada,
+                sort_by_parameter_order=True,
+            ),
+            rows,
+        ).all()
+
+        changes = []
+        for i, data, (event_id, entrada) in zip(row_index, rows, inserted):
+            resultados[i] = TraceEventBulkItemResult(
+                index=i, ok=True, event_id=event_id, part_id=data["part_id"]
+            )
+            changes.append(
+                (None, EventSnapshot.from_mapping(
+                    {**data, "id": event_id, "timestamp_entrada": entrada},
+                    part_tipos[data["part_id"]],
+                ))
+            )
+        risk_totals = record_event_changes(db, changes)
+
+        # Actualización por clave primaria (executemany) solo de los estados que cambian
+        changed_status = {
+            pid: st for pid, st in part_status.items() if st != part_current_status[pid]
+        }
+        if changed_status:
+            db.execute(
+                update(Part),
+                [{"id": pid, "status": st} for pid, st in changed_status.items()],
+            )
+            for pid, st in changed_status.items():
+                change_feed.queue_part_status(db, pid, st)
+
+    # Risk score de las piezas afectadas con los totales del upsert; solo se
+    # consulta part_risk_state para las que no cambiaron
+    affected = {events_in[i].part_id for i in row_index}
+    risk_scores = {pid: _risk_score_from_totals(risk_totals[pid]) for pid in affected & risk_totals.keys()}
+    if affected - risk_scores.keys():
+        risk_scores.update(calculate_risk_scores_for_parts(affected - risk_scores.keys(), db))
+    db.commit()
+    invalidate_for("trace_events")
+
+    return TraceEventBulkOut(
+        total=len(events_in),
+        insertados=len(rows),
+        rechazados=len(events_in) - len(rows),
+        resultados=resultados,
+        risk_scores=risk_scores,
+    )
+
+
+# ======================== FEED DE CAMBIOS ========================
+@router.get("/changes", response_model=ChangePage)
+async def list_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=MAX_CHANGES_LIMIT),
+    wait: float = Query(0, ge=0, le=MAX_CHANGES_WAIT),
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(require_supervisor_or_admin),
+):
+    """
+    Cambios con seq > since, en orden: inserción y cierre de eventos de traza
+    y cambios de status de piezas, cada uno con el estado nuevo en data.
+    El consumidor guarda next_since y lo manda en la siguiente lectura;
+    has_more indica que hay otra página disponible ya.
+
+    Con wait > 0 (long-poll), si no hay cambios espera hasta wait segundos a
+    que aparezcan. Mientras espera no retiene la conexión a la BD: se despierta
+    con los commits de este proceso y consulta cada CHANGE_FEED_POLL_SECONDS
+    para ver los de otros workers.
+    """
+    deadline = time.monotonic() + wait
+    while True:
+        version = change_feed.local_version()
+        rows = (await db.execute(change_feed.changes_query(since, limit, CHANGE_COLUMNS))).all()
+        now = time.monotonic()
+        if rows or now >= deadline:
+            break
+        # Devuelve la conexión al pool mientras espera
+        await db.rollback()
+        await change_feed.wait_for_local_change(
+            version, min(deadline, now + settings.CHANGE_FEED_POLL_SECONDS)
+        )
+
+    page = rows[:limit]
+    return json_response({
+        "changes": model_rows(page, ChangeOut),
+        "next_since": page[-1].seq if page else since,
+        "has_more": len(rows) > limit,
+    })
 
 
 # ======================== HISTORIAL COMPLETO DE UNA PIEZA ========================
+# Columnas del historial: se leen como filas, sin pasar por el identity map
+HISTORY_COLUMNS = (
+    TraceEvent.id,
+    TraceEvent.part_id,
+    TraceEvent.station_id,
+    TraceEvent.timestamp_entrada,
+    TraceEvent.timestamp_salida,
+    TraceEvent.resultado,
+    TraceEvent.operador_id,
+    TraceEvent.observaciones,
+)
+
+# El cliente puede guardar el historial, pero debe revalidarlo con If-None-Match
+HISTORY_CACHE_HEADERS = {"Cache-Control": "private, no-cache"}
+
+
+def _event_dict(e) -> dict:
+    return {
+        "id": e.id,
+        "part_id": e.part_id,
+        "station_id": e.station_id,
+        "timestamp_entrada": _isoformat(e.timestamp_entrada),
+        "timestamp_salida": _isoformat(e.timestamp_salida),
+        "resultado": e.resultado,
+        "operador_id": e.operador_id,
+        "observaciones": e.observaciones,
+    }
+
+
+def _isoformat(value: datetime | None) -> str | None:
+    return value.isoformat() if value is not None else None
+
+
+def _risk_score_from_totals(totals: dict) -> dict:
+    return build_risk_score(
+        totals["tiempo_total_segundos"],
+        totals["eventos_totales"],
+        totals["scrap_count"],
+        totals["retrabajo_count"],
+    )
+
+
+def _history_etag(
+    part: Part, variant: str, count: int, last_id: int | None, last_change, archive_version: int | None,
+) -> str:
+    """
+    Versión del historial: datos de la pieza + número de eventos vivos, último id
+    y último cambio (salida o, si sigue abierto, entrada), más el último archivo
+    del manifiesto. Cerrar un evento cambia su salida, y archivar un mes agrega
+    un archivo, así que ambos cambian el ETag. Los eventos archivados no cambian.
+    """
+    return make_etag(
+        variant, part.id, part.tipo_pieza, part.lote, part.status, part.fecha_creacion,
+        count, last_id, last_change, archive_version,
+    )
+
+
+async def _archive_version(db: AsyncSession, part: Part) -> int | None:
+    """Último archivo del manifiesto, solo para piezas que pueden tener eventos archivados."""
+    if not event_archive.may_have_archived_events(part):
+        return None
+    return await db.scalar(select(func.max(TraceArchiveFile.id)))
+
+
+async def _archived_history(db: AsyncSession, part: Part, archive_version: int | None) -> list:
+    """Eventos archivados de la pieza (lectura de Parquet fuera del event loop)."""
+    if archive_version is None:
+        return []
+    desde = part.fecha_creacion.astimezone(timezone.utc).date() if part.fecha_creacion else None
+    paths = (await db.scalars(event_archive.manifest_query(desde))).all()
+    if not paths:
+        return []
+    return await run_in_threadpool(event_archive.read_part_history, paths, part.id)
+
+
+def _history_sort_key(e) -> tuple:
+    return e.timestamp_entrada, e.id
+
+
+def _history_version(part_id: int):
+    """(eventos, último id, último cambio) del historial, sin leer los eventos."""
+    return select(
+        func.count(TraceEvent.id),
+        func.max(TraceEvent.id),
+        func.max(func.coalesce(TraceEvent.timestamp_salida, TraceEvent.timestamp_entrada)),
+    ).where(TraceEvent.part_id == part_id)
+
+
+def _history_query(part_id: int):
+    return (
+        select(*HISTORY_COLUMNS)
+        .where(TraceEvent.part_id == part_id)
+        .order_by(TraceEvent.timestamp_entrada.asc(), TraceEvent.id.asc())
+    )
+
+
+def _part_header(part: Part) -> dict:
+    return {
+        "part_id": part.id,
+        "tipo_pieza": part.tipo_pieza,
+        "lote": part.lote,
+        "status": part.status,
+        "fecha_creacion": _isoformat(part.fecha_creacion),
+    }
+
+
 @router.get("/part/{part_id}")
-def list_trace_events_for_part(
+async def list_trace_events_for_part(
     part_id: int,
-    db: Session = Depends(get_db),
+    stream: bool = False,
+    if_none_match: str | None = Header(None),
+    db: AsyncSession = Depends(get_async_db),
     current_user=Depends(require_supervisor_or_admin),
 ):
     """
     Obtiene el historial completo de eventos de una pieza.
-    Incluye el risk score actual de la pieza.
+    Incluye el risk score actual de la pieza, calculado con los mismos eventos
+    que se devuelven (una sola lectura).
+
+    Responde con ETag; si If-None-Match coincide devuelve 304 sin cuerpo
+    (solo se consulta la versión del historial, no los eventos).
+
+    Con stream=true devuelve NDJSON leyendo con un cursor del lado del servidor
+    (para historiales muy largos): primera línea con los datos de la pieza,
+    una línea por evento y una última línea con total_eventos y risk_score.
+
+    Incluye los eventos movidos al archivo Parquet (app.services.event_archive);
+    solo se consulta el archivo para piezas creadas antes del horizonte.
     """
     # Verificar que la pieza existe
-    part = db.query(Part).filter(Part.id == part_id).first()
+    part = await db.get(Part, part_id)
     if not part:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Pieza no encontrada.",
         )
-    
-    # Obtener eventos ordenados por fecha
-    events = (
-        db.query(TraceEvent)
-        .filter(TraceEvent.part_id == part_id)
-        .order_by(TraceEvent.timestamp_entrada.asc())
-        .all()
-    )
-    
+
+    variant = "ndjson" if stream else "json"
+    archive_version = await _archive_version(db, part)
+
+    # En streaming las cabeceras salen antes de leer los eventos, así que el
+    # ETag se calcula con la consulta de versión; igual con If-None-Match,
+    # para responder 304 sin leer el historial.
+    if stream or if_none_match:
+        count, last_id, last_change = (await db.execute(_history_version(part_id))).one()
+        archived = None
+        if not count:
+            archived = await _archived_history(db, part, archive_version)
+            if not archived:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="No hay eventos para esa pieza.",
+                )
+        etag = _history_etag(part, variant, count, last_id, last_change, archive_version)
+        headers = {"ETag": etag, **HISTORY_CACHE_HEADERS}
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        if stream:
+            if archived is None:
+                archived = await _archived_history(db, part, archive_version)
+            return ndjson_response(_stream_history(db, part, archived), headers=headers)
+
+    # Obtener eventos ordenados por fecha (los archivados primero, si los hay)
+    live = (await db.execute(_history_query(part_id))).all()
+    archived = await _archived_history(db, part, archive_version)
+    events = sorted([*archived, *live], key=_history_sort_key) if archived else live
+
     if not events:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No hay eventos para esa pieza.",
         )
-    
-    # Calcular el risk score actual
-    risk_score = calculate_risk_score_for_part(part_id, db)
-    
-    # Formatear eventos para la respuesta
-    events_list = [
-        {
-            "id": e.id,
-            "part_id": e.part_id,
-            "station_id": e.station_id,
-            "timestamp_entrada": e.timestamp_entrada,
-            "timestamp_salida": e.timestamp_salida,
-            "resultado": e.resultado,
-            "operador_id": e.operador_id,
-            "observaciones": e.observaciones
-        }
-        for e in events
-    ]
-    
+
+    # Risk score desde los eventos ya cargados; ETag solo con los vivos,
+    # igual que la consulta de versión
+    totals = risk_state.Totals()
+    for e in events:
+        totals.add(EventSnapshot.from_event(e))
+    etag = _history_etag(
+        part,
+        variant,
+        len(live),
+        max((e.id for e in live), default=None),
+        max((e.timestamp_salida or e.timestamp_entrada for e in live), default=None),
+        archive_version,
+    )
+
     # Retornar historial completo con risk score
-    return {
-        "part_id": part_id,
-        "tipo_pieza": part.tipo_pieza,
-        "lote": part.lote,
-        "status": part.status,
-        "fecha_creacion": part.fecha_creacion,
-        "total_eventos": len(events),
-        "eventos": events_list,
-        "risk_score": risk_score  # Incluir risk score en la respuesta
-    }
+    return json_response(
+        {
+            **_part_header(part),
+            "total_eventos": len(events),
+            "eventos": [_event_dict(e) for e in events],
+            "risk_score": _risk_score_from_totals(totals.as_dict()),
+        },
+        headers={"ETag": etag, **HISTORY_CACHE_HEADERS},
+    )
+
+
+async def _stream_history(db: AsyncSession, part: Part, archived: list):
+    """
+    Bloques NDJSON del historial: cabecera, eventos y risk score al final.
+    Los eventos archivados (ya en memoria) se intercalan en orden con los del cursor.
+    """
+    yield ndjson_lines([_part_header(part)])
+
+    totals = risk_state.Totals()
+    pending = iter(archived)
+    next_archived = next(pending, None)
+    result = await db.stream(
+        _history_query(part.id).execution_options(yield_per=STREAM_CHUNK_SIZE)
+    )
+    async for rows in result.partitions():
+        chunk = []
+        for e in rows:
+            while next_archived is not None and _history_sort_key(next_archived) < _history_sort_key(e):
+                chunk.append(next_archived)
+                next_archived = next(pending, None)
+            chunk.append(e)
+        for e in chunk:
+            totals.add(EventSnapshot.from_event(e))
+        yield ndjson_lines(_event_dict(e) for e in chunk)
+
+    rest = [next_archived, *pending] if next_archived is not None else []
+    if rest:
+        for e in rest:
+            totals.add(EventSnapshot.from_event(e))
+        yield ndjson_lines(_event_dict(e) for e in rest)
+
+    summary = totals.as_dict()
+    yield ndjson_lines([{
+        "total_eventos": summary["eventos_totales"],
+        "risk_score": _risk_score_from_totals(summary),
+    }])
 
 
 # ======================== OBTENER RISK SCORE DE UNA PIEZA ========================
 @router.get("/part/{part_id}/risk-score")
-def get_part_risk_score(
+async def get_part_risk_score(
     part_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user=Depends(require_user),
 ):
     """
@@ -254,7 +663,7 @@ def get_part_risk_score(
     Útil para consultas rápidas sin obtener todo el historial.
     """
     # Verificar que la pieza existe
-    part = db.query(Part).filter(Part.id == part_id).first()
+    part = await db.get(Part, part_id)
     if not part:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -262,7 +671,7 @@ def get_part_risk_score(
         )
     
     # Calcular risk score
-    risk_score = calculate_risk_score_for_part(part_id, db)
+    risk_score = await calculate_risk_score_for_part(part_id, db)
     
     return {
         "part_id": part_id,
@@ -275,11 +684,11 @@ def get_part_risk_score(
 
 # ======================== CERRAR/ACTUALIZAR UN EVENTO ========================
 @router.put("/{event_id}/close")
-def close_trace_event(
+async def close_trace_event(
     event_id: int,
     resultado: str,
     observaciones: str = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user=Depends(require_user)
 ):
     """
@@ -294,42 +703,52 @@ def close_trace_event(
         )
     
     # Buscar el evento
-    event = db.query(TraceEvent).filter(TraceEvent.id == event_id).first()
+    event = await db.get(TraceEvent, event_id)
     if not event:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Evento no encontrado"
         )
     
+    part = await db.get(Part, event.part_id)
+    tipo_pieza = part.tipo_pieza if part else None
+
+    # Foto del evento antes del cierre, para ajustar los agregados
+    before = EventSnapshot.from_event(event, tipo_pieza)
+
     # Actualizar evento
-    event.timestamp_salida = datetime.utcnow()
+    event.timestamp_salida = datetime.now(timezone.utc)
     event.resultado = resultado
     if observaciones:
         event.observaciones = observaciones
     
     # Actualizar estado de la pieza
-    part = db.query(Part).filter(Part.id == event.part_id).first()
     if part:
+        if part.status != resultado:
+            change_feed.queue_part_status(db, part.id, resultado)
         part.status = resultado
         db.add(part)
     
     db.add(event)
-    db.commit()
-    db.refresh(event)
+    risk_totals = await db.run_sync(
+        record_event_change, before, EventSnapshot.from_event(event, tipo_pieza)
+    )
+    await db.commit()
+    invalidate_for("trace_events")
     
-    # Recalcular risk score
-    risk_score = calculate_risk_score_for_part(event.part_id, db)
+    # Risk score con los totales que dejó el cierre (ya leídos del upsert)
+    risk_score = await risk_score_after_write(event.part_id, risk_totals, db)
     
-    return {
+    return json_response({
         "message": "Evento cerrado exitosamente",
         "event": {
             "id": event.id,
             "part_id": event.part_id,
             "station_id": event.station_id,
-            "timestamp_entrada": event.timestamp_entrada,
-            "timestamp_salida": event.timestamp_salida,
+            "timestamp_entrada": _isoformat(event.timestamp_entrada),
+            "timestamp_salida": _isoformat(event.timestamp_salida),
             "resultado": event.resultado,
             "observaciones": event.observaciones
         },
         "risk_score": risk_score
-    }
\ No newline at end of file
+    })
\ No newline at end of file
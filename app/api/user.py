@@ -1,14 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import func, true
 from sqlalchemy.orm import Session
 
 from app.db.session import get_db
 from app.models.user import User
 from app.schemas.user import UserOut, UserCreate, UserUpdate
 from app.core.roles import require_admin
+from app.core.serialization import json_response, model_columns, model_rows
 from app.api.auth import get_current_user
+from app.services.user_cache import Principal, invalidate_user
 
 router = APIRouter(prefix="/users", tags=["users"])
 
+# Columnas del listado: se leen como filas y se serializan sin pasar por UserOut.
+# activo admite NULL en la tabla; UserOut lo trata como True por defecto
+USER_COLUMNS = model_columns(UserOut, User, activo=func.coalesce(User.activo, true()))
+
 #------------------ FUNCION PARA REQUERIR ADMIN ------------------ #
 """
 def require_admin(user: User = Depends(get_current_user)):
@@ -25,7 +32,7 @@ def require_admin(user: User = Depends(get_current_user)):
 def create_user(
     user_in: UserCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_admin),  
+    current_user: Principal = Depends(require_admin),  
 ):
     """
     Solo ADMIN puede crear usuarios.
@@ -48,12 +55,13 @@ def create_user(
 @router.get("/", response_model=list[UserOut])
 def list_users(
     db: Session = Depends(get_db),
-    admin: User = Depends(require_admin),
+    admin: Principal = Depends(require_admin),
 ):
     """
     Solo ADMIN puede listar los usuarios.
     """
-    return db.query(User).order_by(User.id).all()
+    rows = db.query(*USER_COLUMNS).order_by(User.id).all()
+    return json_response(model_rows(rows, UserOut))
 
 
 # -------------------- OBTENER USUARIO POR ID (ADMIN) -------------------- #
@@ -61,7 +69,7 @@ def list_users(
 def get_user(
     user_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_admin),
+    current_user: Principal = Depends(require_admin),
 ):
     """
     Solo ADMIN puede ver un usuario por su ID.
@@ -81,7 +89,7 @@ def update_user(
     user_id: int,
     user_in: UserUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_admin),
+    current_user: Principal = Depends(require_admin),
 ):
     """
     Solo ADMIN puede actualizar usuarios.
@@ -108,6 +116,7 @@ def update_user(
 
     db.add(user)
     db.commit()
+    invalidate_user(user_id)
     db.refresh(user)
     return user
 
@@ -118,7 +127,7 @@ def update_user(
 def delete_user(
     user_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_admin),
+    current_user: Principal = Depends(require_admin),
 ):
     """
     Solo ADMIN puede eliminar usuarios.
@@ -132,4 +141,5 @@ def delete_user(
 
     db.delete(user)
     db.commit()
+    invalidate_user(user_id)
     return {"message": "Usuario eliminado correctamente"}
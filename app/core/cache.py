@@ -0,0 +1,130 @@
+"""
+Caché en memoria de proceso: LRU acotado con TTL por entrada.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+class TTLCache:
+    """
+    Caché LRU con tamaño máximo y expiración por entrada.
+    Las claves pertenecen a un namespace (el primer elemento de la tupla)
+    que se puede invalidar completo. Segura para uso entre hilos.
+
+    Invalidar no recorre las entradas: cada entrada guarda la marca del reloj
+    de invalidaciones con la que se calculó, y get() descarta las anteriores a
+    la última invalidación de su namespace (el resto las saca el LRU). La
+    marca de un namespace se olvida cuando ya no le quedan entradas, así que
+    no crece con el número de namespaces distintos (uno por usuario).
+    """
+
+    def __init__(self, maxsize: int = 512):
+        self.maxsize = maxsize
+        # clave -> (expira, marca del reloj al empezar el cálculo, valor)
+        self._data: OrderedDict[Hashable, tuple[float, int, Any]] = OrderedDict()
+        # Reloj de invalidaciones: cada invalidate() lo avanza
+        self._clock = 0
+        # Última invalidación de cada namespace que todavía tiene entradas
+        self._invalidated_at: dict[str, int] = {}
+        # Entradas por namespace, para saber cuándo olvidar su invalidación
+        self._live: dict[str, int] = {}
+        # Mayor invalidación olvidada: un cálculo que empezó antes no se guarda
+        # en un namespace sin marca (pudo ser uno de los olvidados)
+        self._forgotten = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _release(self, namespace: str) -> None:
+        # Llamar con el lock tomado, después de quitar una entrada de _data
+        remaining = self._live[namespace] - 1
+        if remaining:
+            self._live[namespace] = remaining
+            return
+        del self._live[namespace]
+        invalidated_at = self._invalidated_at.pop(namespace, None)
+        if invalidated_at is not None and invalidated_at > self._forgotten:
+            self._forgotten = invalidated_at
+
+    def get(self, key: Hashable) -> tuple[bool, Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, generation, value = entry
+                if expires_at > now and generation >= self._invalidated_at.get(key[0], 0):
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._data[key]
+                self._release(key[0])
+            self.misses += 1
+            return False, None
+
+    def set(self, key: Hashable, value: Any, ttl: float, generation: int | None = None) -> None:
+        namespace = key[0]
+        with self._lock:
+            if generation is None:
+                generation = self._clock
+            # Si hubo una invalidación mientras se calculaba, el valor ya es viejo
+            elif generation < self._invalidated_at.get(namespace, self._forgotten):
+                return
+            if key in self._data:
+                self._data.move_to_end(key)
+            else:
+                self._live[namespace] = self._live.get(namespace, 0) + 1
+            self._data[key] = (time.monotonic() + ttl, generation, value)
+            while len(self._data) > self.maxsize:
+                old_key, _ = self._data.popitem(last=False)
+                self._release(old_key[0])
+                self.evictions += 1
+
+    def generation(self, namespace: str) -> int:
+        """Marca a pasar a set() con el valor calculado a partir de ahora."""
+        with self._lock:
+            return self._clock
+
+    def get_or_compute(self, key: tuple, ttl: float, compute: Callable[[], Any]) -> Any:
+        found, value = self.get(key)
+        if found:
+            return value
+        generation = self.generation(key[0])
+        value = compute()
+        self.set(key, value, ttl, generation)
+        return value
+
+    def invalidate(self, *namespaces: str) -> None:
+        """Invalida todas las entradas de los namespaces indicados."""
+        with self._lock:
+            self._clock += 1
+            for namespace in namespaces:
+                if namespace in self._live:
+                    self._invalidated_at[namespace] = self._clock
+                else:
+                    # Sin entradas: solo hay que descartar los cálculos en curso
+                    self._forgotten = self._clock
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._live.clear()
+            self._invalidated_at.clear()
+            self._forgotten = self._clock
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
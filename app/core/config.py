@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -6,6 +8,59 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 1000
 
+    # Pool de conexiones (se aplica al engine síncrono y al asíncrono)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = -1
+    DB_POOL_PRE_PING: bool = False
+
+    # Caché de métricas (entradas máximas en memoria por proceso)
+    METRICS_CACHE_MAX_ENTRIES: int = 512
+
+    # Caché de usuarios autenticados (get_current_user)
+    USER_CACHE_MAX_ENTRIES: int = 1024
+    USER_CACHE_TTL_SECONDS: int = 60
+
+    # Pool de hash/verificación de contraseñas (0 workers = un hilo)
+    PASSWORD_POOL_WORKERS: int = 2
+    PASSWORD_POOL_MAX_PENDING: int = 64
+    PASSWORD_POOL_RETRY_AFTER_SECONDS: int = 2
+
+    # Detección de anomalías: |z| mínimo y muestras previas necesarias
+    ANOMALY_Z_THRESHOLD: float = 3.0
+    ANOMALY_MIN_SAMPLES: int = 30
+
+    # Particionado mensual de trace_events: meses que se crean por adelantado y
+    # duración máxima supuesta de un evento (recálculos por rango de salida)
+    TRACE_EVENT_PARTITIONS_AHEAD: int = 3
+    TRACE_EVENT_MAX_DURATION_DAYS: int = 31
+
+    # Archivo de eventos fríos (Parquet): directorio local y meses que se
+    # conservan en trace_events antes de archivar los eventos cerrados
+    TRACE_ARCHIVE_DIR: str = "archive/trace_events"
+    TRACE_ARCHIVE_HORIZON_MONTHS: int = 6
+
+    # Origen de /metrics/throughput y /metrics/station-cycle-time: "tables"
+    # (tablas agregadas) o "snapshot" (copia columnar en memoria por worker)
+    METRICS_SOURCE: Literal["tables", "snapshot"] = "tables"
+    TRACE_SNAPSHOT_REFRESH_SECONDS: float = 2.0
+    TRACE_SNAPSHOT_FULL_RELOAD_SECONDS: float = 3600.0
+
+    # Canal en vivo (/live): intervalo de agrupación de cambios, recálculo
+    # periódico (escrituras de otros workers), cola por cliente y días de throughput
+    LIVE_TICK_SECONDS: float = 1.0
+    LIVE_POLL_SECONDS: float = 5.0
+    LIVE_QUEUE_SIZE: int = 64
+    LIVE_THROUGHPUT_DAYS: int = 7
+    LIVE_KEEPALIVE_SECONDS: float = 15.0
+
+    # Long-poll de GET /trace-events/changes: cada cuánto se consulta la BD
+    # (los commits del mismo proceso despiertan antes)
+    CHANGE_FEED_POLL_SECONDS: float = 1.0
+    # Días que se conservan en change_feed (app.jobs.prune_change_feed)
+    CHANGE_FEED_RETENTION_DAYS: int = 7
+
     class Config:
         env_file = ".env"
 
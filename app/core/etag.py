@@ -0,0 +1,19 @@
+"""
+ETags para GET condicionales (If-None-Match -> 304 sin cuerpo).
+"""
+import hashlib
+
+
+def make_etag(*parts) -> str:
+    """ETag fuerte a partir de los valores que identifican una versión del recurso."""
+    raw = "|".join("" if p is None else str(p) for p in parts)
+    return '"' + hashlib.blake2b(raw.encode(), digest_size=12).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """True si la cabecera If-None-Match incluye el ETag (o es "*")."""
+    if not if_none_match:
+        return False
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    # Comparación débil, como pide RFC 9110 para If-None-Match
+    return "*" in candidates or etag in (c.removeprefix("W/") for c in candidates)
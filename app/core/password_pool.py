@@ -0,0 +1,138 @@
+"""
+Pool acotado para hashear y verificar contraseñas fuera del event loop.
+
+sha256_crypt hace miles de rondas en Python y retiene el GIL; si se ejecuta en
+el threadpool del servidor, una ráfaga de logins (inicio de turno) lo ocupa y
+retrasa al resto de endpoints. Aquí el trabajo va a procesos dedicados y la
+cola tiene un límite: si está llena se responde 503 de inmediato en lugar de
+acumular peticiones.
+"""
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from fastapi import HTTPException, status
+
+from app.core.config import settings
+from app.core import security
+
+
+class PasswordPoolBusy(Exception):
+    """La cola del pool de contraseñas está llena."""
+
+
+class PasswordPool:
+    """
+    Ejecuta hash/verify en un executor con un máximo de trabajos pendientes
+    (en ejecución + en cola). Con workers=0 usa un hilo, útil para comparar.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor: Executor | None = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.restarts = 0
+
+    def _get_executor(self) -> Executor:
+        # Se crea al primer uso. Con "spawn" los procesos no heredan el socket
+        # del servidor ni las conexiones abiertas del engine
+        with self._lock:
+            if self._executor is None:
+                if self.workers > 0:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=1)
+            return self._executor
+
+    def _discard_executor(self, executor: Executor) -> None:
+        """Descarta un executor roto; el siguiente uso crea uno nuevo."""
+        with self._lock:
+            if self._executor is not executor:
+                # Otra petición ya lo reemplazó
+                return
+            self._executor = None
+            self.restarts += 1
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise PasswordPoolBusy()
+            self._pending += 1
+        ok = False
+        try:
+            loop = asyncio.get_running_loop()
+            for attempt in range(2):
+                executor = self._get_executor()
+                try:
+                    result = await loop.run_in_executor(executor, fn, *args)
+                except BrokenProcessPool as exc:
+                    # Un worker murió (OOM, kill): el executor no se recupera solo.
+                    # Se reintenta una vez con procesos nuevos; si vuelve a fallar, 503
+                    self._discard_executor(executor)
+                    if attempt:
+                        raise PasswordPoolBusy() from exc
+                    continue
+                ok = True
+                return result
+        finally:
+            with self._lock:
+                self._pending -= 1
+                if ok:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+
+    async def hash(self, password: str) -> str:
+        # La validación de contraseña vacía no necesita ir al pool
+        if not password or not password.strip():
+            raise ValueError("La contraseña no puede estar vacía")
+        return await self._run(security.hash_password, password)
+
+    async def verify(self, plain: str, hashed: str) -> bool:
+        if not plain or not hashed:
+            return False
+        return await self._run(security.verify_password, plain, hashed)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self._pending,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "restarts": self.restarts,
+            }
+
+
+password_pool = PasswordPool(
+    workers=settings.PASSWORD_POOL_WORKERS,
+    max_pending=settings.PASSWORD_POOL_MAX_PENDING,
+)
+
+
+def busy_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Servicio de autenticación saturado, intenta de nuevo en unos segundos.",
+        headers={"Retry-After": str(settings.PASSWORD_POOL_RETRY_AFTER_SECONDS)},
+    )
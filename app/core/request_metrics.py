@@ -0,0 +1,217 @@
+"""
+Métricas por endpoint en formato Prometheus.
+
+Un middleware ASGI mide cada petición (latencia, tamaño de respuesta, status)
+y los hooks before/after_cursor_execute de SQLAlchemy suman las consultas y el
+tiempo en BD a la petición en curso, que viaja en un ContextVar (se copia al
+threadpool y a run_sync, así que también cuenta las consultas de endpoints
+síncronos). Se agrupa por plantilla de ruta (/parts/{part_id}), no por URL,
+para que el número de series no crezca con los IDs.
+"""
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Límites (segundos) del histograma de latencia
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Límites del histograma de consultas por petición (para detectar N+1)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class RequestStats:
+    """Consultas y tiempo en BD de la petición en curso."""
+
+    __slots__ = ("queries", "db_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+_current: ContextVar[RequestStats | None] = ContextVar("request_stats", default=None)
+
+
+class _Series:
+    __slots__ = ("latency_buckets", "latency_sum", "count", "query_buckets", "queries",
+                 "db_seconds", "response_bytes", "statuses")
+
+    def __init__(self):
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.count = 0
+        self.query_buckets = [0] * (len(QUERY_BUCKETS) + 1)
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.response_bytes = 0
+        self.statuses: dict[int, int] = {}
+
+
+class RequestMetrics:
+    """Acumula series por (método, plantilla de ruta). Segura para uso entre hilos."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series: dict[tuple[str, str], _Series] = {}
+
+    def observe(self, method: str, route: str, status: int, seconds: float,
+                response_bytes: int, stats: RequestStats) -> None:
+        latency_idx = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+        query_idx = bisect.bisect_left(QUERY_BUCKETS, stats.queries)
+        with self._lock:
+            series = self._series.get((method, route))
+            if series is None:
+                series = self._series[(method, route)] = _Series()
+            series.latency_buckets[latency_idx] += 1
+            series.latency_sum += seconds
+            series.count += 1
+            series.query_buckets[query_idx] += 1
+            series.queries += stats.queries
+            series.db_seconds += stats.db_seconds
+            series.response_bytes += response_bytes
+            series.statuses[status] = series.statuses.get(status, 0) + 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def render(self) -> str:
+        """Texto en formato de exposición de Prometheus (versión 0.0.4)."""
+        with self._lock:
+            items = sorted(
+                (key, _copy(series)) for key, series in self._series.items()
+            )
+
+        lines = []
+
+        def header(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        header("http_request_duration_seconds", "histogram", "Latencia de las peticiones HTTP.")
+        for (method, route), s in items:
+            _histogram(lines, "http_request_duration_seconds", method, route,
+                       LATENCY_BUCKETS, s.latency_buckets, s.latency_sum, s.count)
+
+        header("http_requests_total", "counter", "Peticiones HTTP por status.")
+        for (method, route), s in items:
+            for status, count in sorted(s.statuses.items()):
+                lines.append(
+                    f'http_requests_total{{{_labels(method, route)},status="{status}"}} {count}'
+                )
+
+        header("http_db_queries_per_request", "histogram", "Consultas SQL por petición.")
+        for (method, route), s in items:
+            _histogram(lines, "http_db_queries_per_request", method, route,
+                       QUERY_BUCKETS, s.query_buckets, s.queries, s.count)
+
+        header("http_db_duration_seconds_total", "counter", "Tiempo total en consultas SQL.")
+        for (method, route), s in items:
+            lines.append(f"http_db_duration_seconds_total{{{_labels(method, route)}}} {s.db_seconds:.6f}")
+
+        header("http_response_size_bytes_total", "counter", "Bytes enviados en el cuerpo de las respuestas.")
+        for (method, route), s in items:
+            lines.append(f"http_response_size_bytes_total{{{_labels(method, route)}}} {s.response_bytes}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _copy(series: _Series) -> _Series:
+    copy = _Series()
+    copy.latency_buckets = list(series.latency_buckets)
+    copy.latency_sum = series.latency_sum
+    copy.count = series.count
+    copy.query_buckets = list(series.query_buckets)
+    copy.queries = series.queries
+    copy.db_seconds = series.db_seconds
+    copy.response_bytes = series.response_bytes
+    copy.statuses = dict(series.statuses)
+    return copy
+
+
+def _labels(method: str, route: str) -> str:
+    route = route.replace("\\", "\\\\").replace('"', '\\"')
+    return f'method="{method}",route="{route}"'
+
+
+def _histogram(lines, name, method, route, bounds, buckets, total, count):
+    labels = _labels(method, route)
+    cumulative = 0
+    for bound, n in zip(bounds, buckets):
+        cumulative += n
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {count}')
+    lines.append(f"{name}_sum{{{labels}}} {total}")
+    lines.append(f"{name}_count{{{labels}}} {count}")
+
+
+request_metrics = RequestMetrics()
+
+
+# ---------------------- HOOKS DE SQLALCHEMY ---------------------- #
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is None:
+        return
+    starts = conn.info.get("query_start")
+    if starts:
+        stats.db_seconds += time.perf_counter() - starts.pop()
+    stats.queries += 1
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Registra los hooks de consultas en un engine (para el async, su sync_engine)."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# ---------------------- MIDDLEWARE ---------------------- #
+class RequestMetricsMiddleware:
+    """Middleware ASGI puro (sin BaseHTTPMiddleware, que agrega una tarea por petición)."""
+
+    def __init__(self, app, metrics: RequestMetrics = request_metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        status_code = 500
+        response_bytes = 0
+
+        async def send_wrapper(message):
+            nonlocal status_code, response_bytes
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            route = scope.get("route")
+            self.metrics.observe(
+                scope["method"],
+                getattr(route, "path", UNMATCHED_ROUTE),
+                status_code,
+                time.perf_counter() - start,
+                response_bytes,
+                stats,
+            )
@@ -1,17 +1,19 @@
 from fastapi import Depends, HTTPException, status
 from app.api.auth import get_current_user
-from app.models.user import User
+from app.services.user_cache import Principal
 
 Permited_roles = {"OPERADOR","SUPERVISOR", "ADMIN"}
 
-def require_user(current_user: User = Depends(get_current_user)) -> User:
+async def require_user(current_user: Principal = Depends(get_current_user)) -> Principal:
     """
     Solo exige que el usuario esté autenticado.
+    Las validaciones de rol usan el principal en caché; no abren sesión.
+    Son async def para no pasar por el threadpool en cada petición.
     """
     return current_user
 
 
-def require_admin(current_user: User = Depends(get_current_user)) -> User:
+async def require_admin(current_user: Principal = Depends(get_current_user)) -> Principal:
     """
     Solo permite usuarios con rol ADMIN.
     """
@@ -23,9 +25,9 @@ def require_admin(current_user: User = Depends(get_current_user)) -> User:
     return current_user
 
 
-def require_supervisor_or_admin(
-    current_user: User = Depends(get_current_user),
-) -> User:
+async def require_supervisor_or_admin(
+    current_user: Principal = Depends(get_current_user),
+) -> Principal:
     """
     Permite SUPERVISOR o ADMIN.
     """
@@ -37,9 +39,9 @@ def require_supervisor_or_admin(
     return current_user
 
 
-def require_operator_or_admin(
-    current_user: User = Depends(get_current_user),
-) -> User:
+async def require_operator_or_admin(
+    current_user: Principal = Depends(get_current_user),
+) -> Principal:
     """
     Permite OPERADOR o ADMIN.
     """
@@ -0,0 +1,54 @@
+"""
+Serialización JSON con orjson.
+
+La app usa ORJSONResponse como clase de respuesta por defecto (main.py): FastAPI
+sigue validando contra response_model y solo cambia el json.dumps final.
+
+Los listados (piezas, estaciones, usuarios, historiales, feed de cambios) y
+las altas y cierres de eventos se saltan además la validación: leen columnas
+en lugar de objetos ORM, arman los dicts con model_rows y devuelven los bytes
+con json_response, sin pasar por model_validate ni jsonable_encoder. El
+response_model del decorador queda solo para la documentación OpenAPI, así
+que las columnas nullable que el schema no admite como None se resuelven en
+el SELECT (ver model_columns).
+
+Las fechas salen como las serializa Pydantic (UTC como "Z").
+"""
+from typing import Any
+
+import orjson
+from fastapi import Response
+from pydantic import BaseModel
+
+JSON_MEDIA_TYPE = "application/json"
+
+_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_UTC_Z
+
+
+def dumps(content: Any) -> bytes:
+    """JSON compacto en UTF-8; lo que orjson no conoce (Decimal, etc.) se pasa a str."""
+    return orjson.dumps(content, default=str, option=_OPTIONS)
+
+
+def json_response(content: Any, status_code: int = 200, headers: dict | None = None) -> Response:
+    """Respuesta JSON ya serializada (FastAPI no la valida ni la vuelve a codificar)."""
+    return Response(dumps(content), status_code=status_code, headers=headers, media_type=JSON_MEDIA_TYPE)
+
+
+def model_columns(schema: type[BaseModel], model, **overrides) -> tuple:
+    """
+    Columnas del modelo ORM con los campos del schema de salida, en el mismo orden.
+    overrides reemplaza la columna de un campo por otra expresión, p. ej.
+    activo=func.coalesce(User.activo, true()) cuando la columna admite NULL y
+    el schema no.
+    """
+    return tuple(
+        overrides[name].label(name) if name in overrides else getattr(model, name)
+        for name in schema.model_fields
+    )
+
+
+def model_rows(rows, schema: type[BaseModel]) -> list[dict]:
+    """Filas leídas con model_columns(schema, ...) como dicts con las claves del schema."""
+    keys = tuple(schema.model_fields)
+    return [dict(zip(keys, row)) for row in rows]
@@ -0,0 +1,23 @@
+"""
+Utilidades para respuestas en streaming NDJSON (un objeto JSON por línea).
+"""
+from typing import Iterable
+
+from fastapi.responses import StreamingResponse
+
+from app.core.serialization import dumps
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def ndjson_lines(records: Iterable[dict]) -> bytes:
+    """Serializa varios registros como un bloque de líneas NDJSON."""
+    return b"".join(dumps(r) + b"\n" for r in records)
+
+
+def ndjson_response(chunks: Iterable[bytes], headers: dict | None = None) -> StreamingResponse:
+    """
+    Envuelve un generador de bloques NDJSON en una StreamingResponse.
+    Cada bloque debe terminar en salto de línea.
+    """
+    return StreamingResponse(chunks, media_type=NDJSON_MEDIA_TYPE, headers=headers)
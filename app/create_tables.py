@@ -1,6 +1,6 @@
 from app.db.session import engine
-from app.db.base import Base
+from app.db.maintenance import ensure_schema
 
 print("Creando tablas en la base de datos...")
-Base.metadata.create_all(bind=engine)
+ensure_schema(engine)
 print("Tablas creadas correctamente.")
@@ -0,0 +1,58 @@
+"""
+Creación y actualización del esquema al arrancar.
+"""
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+from app.db import partitions
+from app.db.base import Base
+
+# Registrar todos los modelos en Base.metadata
+from app.models import (  # noqa: F401
+    part,
+    station,
+    trace_event,
+    user,
+    part_risk_state,
+    throughput_rollup,
+    station_cycle_sketch,
+    anomaly,
+    trace_archive,
+    change_feed,
+)
+
+
+def ensure_schema(bind: Engine) -> None:
+    """
+    Crea las tablas que falten y también los índices nuevos de tablas existentes,
+    que create_all no agrega por sí solo.
+    En tablas grandes conviene crear los índices fuera de horario (bloquean escrituras).
+    """
+    Base.metadata.create_all(bind=bind)
+    _dedupe_anomalies(bind)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=bind, checkfirst=True)
+
+    # trace_events particionada: mes actual + los siguientes y la DEFAULT.
+    # Una tabla existente sin particionar se migra con
+    # python -m app.jobs.trace_event_partitions --migrate
+    with bind.begin() as conn:
+        if partitions.is_partitioned(conn):
+            partitions.ensure_upcoming(conn)
+
+
+def _dedupe_anomalies(bind: Engine) -> None:
+    """
+    Antes de crear el índice único (event_id, scope) en una tabla existente,
+    borra las anomalías repetidas que dejaban los cierres repetidos de un
+    evento, conservando la primera.
+    """
+    with bind.begin() as conn:
+        indexes = {ix["name"] for ix in inspect(conn).get_indexes("anomalies")}
+        if "ux_anomalies_event_scope" in indexes:
+            return
+        conn.execute(text(
+            "DELETE FROM anomalies a USING anomalies b "
+            "WHERE a.event_id = b.event_id AND a.scope = b.scope AND a.id > b.id"
+        ))
@@ -0,0 +1,201 @@
+"""
+Particionado mensual de trace_events por rango de timestamp_entrada.
+
+Una partición por mes UTC (trace_events_y2026m01 = [2026-01-01, 2026-02-01))
+más una partición DEFAULT que recibe lo que no tenga mes creado (p. ej. una
+carga con fechas antiguas), para que un INSERT nunca falle. El job
+app.jobs.trace_event_partitions crea los meses por adelantado y mueve a su
+mes lo que haya caído en la DEFAULT.
+
+Las consultas que filtran por timestamp_entrada con comparaciones simples
+(>=, <) solo leen las particiones del rango (partition pruning).
+"""
+from datetime import date, datetime, time, timedelta, timezone
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from app.core.config import settings
+from app.models.trace_event import TraceEvent
+
+PARENT = TraceEvent.__tablename__
+DEFAULT_PARTITION = f"{PARENT}_default"
+
+
+# ---------------------- FECHAS ---------------------- #
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(month: date, n: int) -> date:
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARENT}_y{month.year:04d}m{month.month:02d}"
+
+
+def _utc(day: date) -> datetime:
+    return datetime.combine(day, time.min, tzinfo=timezone.utc)
+
+
+def month_range(month: date) -> tuple[datetime, datetime]:
+    """[inicio, fin) del mes en UTC."""
+    return _utc(month), _utc(add_months(month, 1))
+
+
+def entrada_window(desde: datetime | None, hasta: datetime | None) -> list:
+    """
+    Condiciones sobre timestamp_entrada equivalentes a un rango de timestamp_salida,
+    para que los recálculos por rango de salida puedan podar particiones.
+    salida >= entrada, así que entrada < hasta siempre es exacto. Hacia atrás se
+    asume que ningún evento dura más de TRACE_EVENT_MAX_DURATION_DAYS.
+    """
+    conditions = []
+    if desde is not None:
+        lookback = timedelta(days=settings.TRACE_EVENT_MAX_DURATION_DAYS)
+        conditions.append(TraceEvent.timestamp_entrada >= desde - lookback)
+    if hasta is not None:
+        conditions.append(TraceEvent.timestamp_entrada < hasta)
+    return conditions
+
+
+# ---------------------- CATÁLOGO ---------------------- #
+def is_partitioned(conn: Connection) -> bool:
+    relkind = conn.scalar(
+        text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:name)"),
+        {"name": PARENT},
+    )
+    return relkind == "p"
+
+
+def existing_partitions(conn: Connection) -> set[str]:
+    rows = conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:name)"
+        ),
+        {"name": PARENT},
+    )
+    return {name for (name,) in rows}
+
+
+def default_months(conn: Connection) -> list[date]:
+    """Meses con filas en la partición DEFAULT (deberían tener su propia partición)."""
+    rows = conn.execute(text(
+        f"SELECT DISTINCT date_trunc('month', timestamp_entrada AT TIME ZONE 'UTC')::date "
+        f"FROM {DEFAULT_PARTITION} ORDER BY 1"
+    ))
+    return [month for (month,) in rows]
+
+
+# ---------------------- DDL ---------------------- #
+def ensure_default_partition(conn: Connection) -> bool:
+    if DEFAULT_PARTITION in existing_partitions(conn):
+        return False
+    conn.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {PARENT} DEFAULT"))
+    return True
+
+
+def create_partition(conn: Connection, month: date) -> bool:
+    """
+    Crea la partición del mes si no existe. Si la DEFAULT ya tiene filas de ese
+    mes, se crea la tabla suelta, se mueven las filas y luego se adjunta
+    (Postgres no permite crear la partición mientras la DEFAULT las contenga).
+    Retorna True si la creó.
+    """
+    name = partition_name(month)
+    if name in existing_partitions(conn):
+        return False
+
+    lower, upper = (bound.isoformat() for bound in month_range(month))
+    bounds = f"FOR VALUES FROM ('{lower}') TO ('{upper}')"
+    in_month = f"timestamp_entrada >= '{lower}' AND timestamp_entrada < '{upper}'"
+
+    has_default = DEFAULT_PARTITION in existing_partitions(conn)
+    if has_default and conn.scalar(text(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE {in_month})")):
+        conn.execute(text(
+            f"CREATE TABLE {name} (LIKE {PARENT} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        ))
+        conn.execute(text(
+            f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE {in_month} RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved"
+        ))
+        conn.execute(text(f"ALTER TABLE {PARENT} ATTACH PARTITION {name} {bounds}"))
+    else:
+        conn.execute(text(f"CREATE TABLE {name} PARTITION OF {PARENT} {bounds}"))
+    return True
+
+
+def ensure_partitions(conn: Connection, desde: date, hasta: date) -> list[str]:
+    """Crea las particiones de los meses entre desde y hasta (ambos incluidos) y la DEFAULT."""
+    # Serializa a los procesos que arrancan a la vez (varios workers de uvicorn)
+    conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": PARENT + "_partitions"})
+    created = []
+    if ensure_default_partition(conn):
+        created.append(DEFAULT_PARTITION)
+    month, last = month_start(desde), month_start(hasta)
+    while month <= last:
+        if create_partition(conn, month):
+            created.append(partition_name(month))
+        month = add_months(month, 1)
+    return created
+
+
+def ensure_upcoming(conn: Connection, months_ahead: int | None = None) -> list[str]:
+    """Mes actual y los siguientes months_ahead (por defecto TRACE_EVENT_PARTITIONS_AHEAD)."""
+    if months_ahead is None:
+        months_ahead = settings.TRACE_EVENT_PARTITIONS_AHEAD
+    current = month_start(datetime.now(timezone.utc).date())
+    return ensure_partitions(conn, current, add_months(current, months_ahead))
+
+
+# ---------------------- MIGRACIÓN ---------------------- #
+def migrate_to_partitioned(conn: Connection, keep_legacy: bool = False) -> int:
+    """
+    Convierte una trace_events sin particionar en particionada, en la transacción
+    de conn: renombra la tabla vieja (con sus índices y secuencia), crea la nueva
+    desde el modelo, crea los meses del histórico, copia las filas y ajusta la
+    secuencia. Bloquea la tabla mientras dura. Retorna las filas copiadas.
+    """
+    legacy = f"{PARENT}_legacy"
+    conn.execute(text(f"LOCK TABLE {PARENT} IN ACCESS EXCLUSIVE MODE"))
+    # La clave de partición no admite NULL
+    conn.execute(text(
+        f"UPDATE {PARENT} SET timestamp_entrada = coalesce(timestamp_salida, now()) "
+        f"WHERE timestamp_entrada IS NULL"
+    ))
+
+    sequence = conn.scalar(text(f"SELECT pg_get_serial_sequence('{PARENT}', 'id')"))
+    conn.execute(text(f"ALTER TABLE {PARENT} RENAME TO {legacy}"))
+    indexes = conn.execute(
+        text("SELECT indexname FROM pg_indexes WHERE tablename = :t"), {"t": legacy}
+    ).scalars().all()
+    for index in indexes:
+        conn.execute(text(f'ALTER INDEX "{index}" RENAME TO "{index}_legacy"'))
+    if sequence:
+        conn.execute(text(f"ALTER SEQUENCE {sequence} RENAME TO {PARENT}_id_seq_legacy"))
+
+    TraceEvent.__table__.create(conn)
+
+    first, last = conn.execute(text(
+        f"SELECT min(timestamp_entrada AT TIME ZONE 'UTC')::date, "
+        f"max(timestamp_entrada AT TIME ZONE 'UTC')::date FROM {legacy}"
+    )).one()
+    today = datetime.now(timezone.utc).date()
+    upcoming = add_months(month_start(today), settings.TRACE_EVENT_PARTITIONS_AHEAD)
+    ensure_partitions(conn, first or today, max(last or today, upcoming))
+
+    columns = ", ".join(c.name for c in TraceEvent.__table__.columns)
+    copied = conn.execute(text(
+        f"INSERT INTO {PARENT} ({columns}) SELECT {columns} FROM {legacy}"
+    )).rowcount
+    conn.execute(text(
+        f"SELECT setval(pg_get_serial_sequence('{PARENT}', 'id'), "
+        f"(SELECT coalesce(max(id), 1) FROM {PARENT}))"
+    ))
+    if not keep_legacy:
+        conn.execute(text(f"DROP TABLE {legacy}"))
+    return copied
@@ -0,0 +1,133 @@
+"""
+Instrumentación del pool de conexiones.
+
+Los eventos del pool (checkout, checkin, connect, invalidate) se cuentan con
+listeners de SQLAlchemy. El tiempo de espera por una conexión y los timeouts
+no tienen evento propio, así que se miden en una subclase del pool.
+Los números se exponen en /internal/pool-stats para dimensionar el pool
+según el número de workers.
+"""
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Esperas por encima de este valor se cuentan como "espera real" (pool agotado)
+SLOW_WAIT_SECONDS = 0.005
+
+
+class PoolStats:
+    """Contadores de un pool. Seguros para uso entre hilos."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.slow_waits = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.peak_checked_out = 0
+        self.peak_overflow = 0
+
+    def record_wait(self, seconds: float, checked_out: int, overflow: int) -> None:
+        with self._lock:
+            self.wait_seconds_total += seconds
+            if seconds > self.wait_seconds_max:
+                self.wait_seconds_max = seconds
+            if seconds > SLOW_WAIT_SECONDS:
+                self.slow_waits += 1
+            if checked_out > self.peak_checked_out:
+                self.peak_checked_out = checked_out
+            if overflow > self.peak_overflow:
+                self.peak_overflow = overflow
+
+    def record_timeout(self, seconds: float) -> None:
+        with self._lock:
+            self.timeouts += 1
+            self.wait_seconds_total += seconds
+            if seconds > self.wait_seconds_max:
+                self.wait_seconds_max = seconds
+
+    def incr(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            attempts = self.checkouts + self.timeouts
+            return {
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "slow_waits": self.slow_waits,
+                "wait_ms_avg": round(self.wait_seconds_total / attempts * 1000, 3)
+                if attempts else 0.0,
+                "wait_ms_max": round(self.wait_seconds_max * 1000, 3),
+                "peak_checked_out": self.peak_checked_out,
+                "peak_overflow": self.peak_overflow,
+            }
+
+
+class _TimedGetMixin:
+    """Mide cuánto tarda _do_get (espera en la cola + abrir conexión si hace falta)."""
+
+    stats: PoolStats
+
+    def __init__(self, *args, max_overflow: int = 10, **kw):
+        # QueuePool no expone max_overflow: se guarda al construir (también en recreate())
+        self.max_overflow = max_overflow
+        super().__init__(*args, max_overflow=max_overflow, **kw)
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record_timeout(time.perf_counter() - start)
+            raise
+        self.stats.record_wait(time.perf_counter() - start, self.checkedout(), max(self.overflow(), 0))
+        return conn
+
+
+class InstrumentedQueuePool(_TimedGetMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncPool(_TimedGetMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_class(base: type, stats: PoolStats) -> type:
+    """
+    Subclase con las estadísticas como atributo de clase: pool.recreate()
+    (p. ej. en engine.dispose()) crea el nuevo pool con la misma clase.
+    """
+    return type(base.__name__, (base,), {"stats": stats})
+
+
+def attach_listeners(engine: Engine, stats: PoolStats) -> None:
+    event.listen(engine, "checkout", lambda *args: stats.incr("checkouts"))
+    event.listen(engine, "checkin", lambda *args: stats.incr("checkins"))
+    event.listen(engine, "connect", lambda *args: stats.incr("connects"))
+    event.listen(engine, "invalidate", lambda *args: stats.incr("invalidations"))
+
+
+def describe(engine: Engine, stats: PoolStats) -> dict:
+    """Configuración, estado actual y contadores de un pool."""
+    pool = engine.pool
+    return {
+        "pool_size": pool.size(),
+        "max_overflow": pool.max_overflow,
+        "timeout": pool.timeout(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        **stats.snapshot(),
+    }
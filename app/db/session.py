@@ -1,12 +1,36 @@
-from typing import Generator
+from typing import AsyncGenerator, Generator
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session
 from app.core.config import settings
+from app.db.pool_stats import (
+    InstrumentedAsyncPool,
+    InstrumentedQueuePool,
+    PoolStats,
+    attach_listeners,
+    pool_class,
+)
+
+# Mismos parámetros para el pool síncrono y el asíncrono (cada uno tiene el suyo)
+POOL_OPTIONS = {
+    "pool_size": settings.DB_POOL_SIZE,
+    "max_overflow": settings.DB_MAX_OVERFLOW,
+    "pool_timeout": settings.DB_POOL_TIMEOUT,
+    "pool_recycle": settings.DB_POOL_RECYCLE,
+    "pool_pre_ping": settings.DB_POOL_PRE_PING,
+}
+
+sync_pool_stats = PoolStats()
+async_pool_stats = PoolStats()
 
 engine = create_engine(
     settings.DATABASE_URL,
     future=True,
+    poolclass=pool_class(InstrumentedQueuePool, sync_pool_stats),
+    **POOL_OPTIONS,
 )
+attach_listeners(engine, sync_pool_stats)
 
 SessionLocal = sessionmaker(
     autocommit=False,
@@ -14,6 +38,34 @@ SessionLocal = sessionmaker(
     bind=engine,
 )
 
+
+def _async_url(url: str):
+    """
+    Misma base de datos con el driver asíncrono de psycopg 3.
+    Acepta URLs postgresql://, postgresql+psycopg:// o postgresql+psycopg2://.
+    """
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "postgresql":
+        return parsed.set(drivername="postgresql+psycopg_async")
+    return parsed
+
+
+async_engine = create_async_engine(
+    _async_url(settings.DATABASE_URL),
+    poolclass=pool_class(InstrumentedAsyncPool, async_pool_stats),
+    **POOL_OPTIONS,
+)
+attach_listeners(async_engine.sync_engine, async_pool_stats)
+
+# expire_on_commit=False: tras el commit no se puede hacer lazy-load en async,
+# así que los objetos conservan los valores ya cargados
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+
 def get_db() -> Generator[Session, None, None]:
     """
     Dependencia para FastAPI.
@@ -24,3 +76,12 @@ def get_db() -> Generator[Session, None, None]:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependencia para endpoints async def.
+    La petición no ocupa un hilo del threadpool mientras espera a Postgres.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
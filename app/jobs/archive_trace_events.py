@@ -0,0 +1,68 @@
+"""
+Archiva en Parquet los eventos cerrados de los meses anteriores al horizonte
+(TRACE_ARCHIVE_HORIZON_MONTHS) y los borra de trace_events. Un mes por
+transacción: si se corta, lo ya confirmado queda archivado y el resto se
+retoma en la siguiente corrida. Conviene correrlo a diario o mensual (cron).
+
+Los agregados de métricas no cambian al archivar; sus recálculos
+(app.jobs.rebuild_*) leen también el archivo.
+
+Uso:
+    python -m app.jobs.archive_trace_events
+    python -m app.jobs.archive_trace_events --dry-run
+"""
+import argparse
+import sys
+import time
+
+from sqlalchemy import text
+
+from app.db.maintenance import ensure_schema
+from app.db.session import SessionLocal, engine
+from app.services import event_archive
+
+LOCK_KEY = "archive_trace_events"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="Solo listar los meses a archivar")
+    args = parser.parse_args()
+
+    ensure_schema(engine)
+
+    # Lock de sesión en una conexión aparte: la sesión de trabajo hace commit por mes
+    with engine.connect() as lock_conn:
+        if not lock_conn.scalar(text("SELECT pg_try_advisory_lock(hashtext(:key))"), {"key": LOCK_KEY}):
+            print("Otro proceso está archivando; nada que hacer.")
+            return 1
+
+        db = SessionLocal()
+        try:
+            removed = event_archive.remove_orphans(db)
+            if removed:
+                print(f"Archivos huérfanos borrados: {len(removed)}.")
+
+            cutoff = event_archive.archive_cutoff()
+            months = event_archive.archivable_months(db, cutoff)
+            db.rollback()
+            if not months:
+                print(f"Nada que archivar antes de {cutoff:%Y-%m}.")
+                return 0
+            print(f"Meses a archivar: {', '.join(f'{m:%Y-%m}' for m in months)}")
+            if args.dry_run:
+                return 0
+
+            for month in months:
+                start = time.perf_counter()
+                rows = event_archive.archive_month(db, month)
+                db.commit()
+                print(f"{month:%Y-%m}: {rows} eventos archivados en {time.perf_counter() - start:.1f}s.")
+            return 0
+        finally:
+            db.close()
+            lock_conn.execute(text("SELECT pg_advisory_unlock(hashtext(:key))"), {"key": LOCK_KEY})
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+"""
+Borra de change_feed las filas más viejas que CHANGE_FEED_RETENTION_DAYS.
+Un consumidor que lleve más tiempo sin leer debe resincronizar completo
+(su since queda antes del primer seq disponible). Correrlo a diario (cron).
+
+Uso:
+    python -m app.jobs.prune_change_feed
+"""
+import sys
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, func, select
+
+from app.core.config import settings
+from app.db.maintenance import ensure_schema
+from app.db.session import SessionLocal, engine
+from app.models.change_feed import ChangeFeedEntry
+
+# Filas por transacción, para no retener locks en tablas grandes
+BATCH_SIZE = 50_000
+
+
+def main() -> int:
+    ensure_schema(engine)
+    cutoff = datetime.now(timezone.utc) - timedelta(days=settings.CHANGE_FEED_RETENTION_DAYS)
+
+    db = SessionLocal()
+    try:
+        # seq y created_at crecen juntos: se borra por rango de seq
+        last_seq = db.scalar(select(func.max(ChangeFeedEntry.seq)).where(ChangeFeedEntry.created_at < cutoff))
+        if last_seq is None:
+            print(f"Nada que borrar antes de {cutoff:%Y-%m-%d %H:%M}.")
+            return 0
+
+        total = 0
+        while True:
+            batch = (
+                select(ChangeFeedEntry.seq)
+                .where(ChangeFeedEntry.seq <= last_seq)
+                .order_by(ChangeFeedEntry.seq)
+                .limit(BATCH_SIZE)
+                .scalar_subquery()
+            )
+            result = db.execute(delete(ChangeFeedEntry).where(ChangeFeedEntry.seq.in_(batch)))
+            db.commit()
+            total += result.rowcount
+            if result.rowcount < BATCH_SIZE:
+                break
+        print(f"Cambios borrados: {total} (hasta seq {last_seq}).")
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+"""
+Recalcula las estadísticas de tiempo de ciclo (cycle_time_stats) que usa el
+detector de anomalías. El histórico de la tabla anomalies no se modifica.
+
+Uso:
+    python -m app.jobs.rebuild_anomaly_stats
+    python -m app.jobs.rebuild_anomaly_stats --desde 2025-01-01   # solo eventos recientes
+"""
+import argparse
+import sys
+from datetime import datetime, timezone
+
+from app.db.maintenance import ensure_schema
+from app.db.session import SessionLocal, engine
+from app.services import anomaly_detector
+
+
+def _parse_date(value: str) -> datetime:
+    return datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--desde", type=_parse_date, help="Entrada desde (YYYY-MM-DD, UTC, incluido)")
+    parser.add_argument("--hasta", type=_parse_date, help="Entrada hasta (YYYY-MM-DD, UTC, excluido)")
+    args = parser.parse_args()
+
+    ensure_schema(engine)
+    db = SessionLocal()
+    try:
+        print("Reconstruyendo cycle_time_stats...")
+        count = anomaly_detector.rebuild_stats(db, args.desde, args.hasta)
+        db.commit()
+        print(f"cycle_time_stats reconstruida ({count} filas).")
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
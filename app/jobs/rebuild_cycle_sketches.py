@@ -0,0 +1,36 @@
+"""
+Reconstruye los sketches de tiempo de ciclo (station_cycle_sketch) desde trace_events.
+
+Uso:
+    python -m app.jobs.rebuild_cycle_sketches
+    python -m app.jobs.rebuild_cycle_sketches --desde 2025-01-01 --hasta 2025-02-01
+"""
+import argparse
+import sys
+from datetime import date
+
+from app.db.maintenance import ensure_schema
+from app.db.session import SessionLocal, engine
+from app.services import cycle_sketches
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--desde", type=date.fromisoformat, help="Primer día (UTC, incluido)")
+    parser.add_argument("--hasta", type=date.fromisoformat, help="Último día (UTC, excluido)")
+    args = parser.parse_args()
+
+    ensure_schema(engine)
+    db = SessionLocal()
+    try:
+        print("Reconstruyendo station_cycle_sketch...")
+        count = cycle_sketches.rebuild(db, args.desde, args.hasta)
+        db.commit()
+        print(f"station_cycle_sketch reconstruida ({count} filas).")
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,42 @@
+"""
+Reconstruye (o verifica) la tabla part_risk_state desde trace_events.
+
+Uso:
+    python -m app.jobs.rebuild_risk_state           # backfill completo
+    python -m app.jobs.rebuild_risk_state --check   # solo reporta diferencias
+"""
+import argparse
+import sys
+
+from app.db.maintenance import ensure_schema
+from app.db.session import SessionLocal, engine
+from app.services import risk_state
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--check", action="store_true", help="Solo verificar consistencia")
+    parser.add_argument("--limit", type=int, default=100, help="Máximo de diferencias a mostrar")
+    args = parser.parse_args()
+
+    ensure_schema(engine)
+    db = SessionLocal()
+    try:
+        if args.check:
+            diffs = risk_state.find_inconsistencies(db, limit=args.limit)
+            for row in diffs:
+                print(row)
+            print(f"Piezas con diferencias: {len(diffs)}")
+            return 1 if diffs else 0
+
+        print("Reconstruyendo part_risk_state...")
+        count = risk_state.rebuild(db)
+        db.commit()
+        print(f"part_risk_state reconstruida ({count} piezas).")
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+"""
+Reconstruye la tabla throughput_rollup desde trace_events (backfill).
+
+Uso:
+    python -m app.jobs.rebuild_throughput
+    python -m app.jobs.rebuild_throughput --desde 2025-01-01 --hasta 2025-02-01
+"""
+import argparse
+import sys
+from datetime import datetime, timezone
+
+from app.db.maintenance import ensure_schema
+from app.db.session import SessionLocal, engine
+from app.services import throughput_rollup
+
+
+def _parse_date(value: str) -> datetime:
+    return datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--desde", type=_parse_date, help="Inicio (YYYY-MM-DD, UTC, incluido)")
+    parser.add_argument("--hasta", type=_parse_date, help="Fin (YYYY-MM-DD, UTC, excluido)")
+    args = parser.parse_args()
+
+    ensure_schema(engine)
+    db = SessionLocal()
+    try:
+        print("Reconstruyendo throughput_rollup...")
+        count = throughput_rollup.rebuild(db, args.desde, args.hasta)
+        db.commit()
+        print(f"throughput_rollup reconstruida ({count} filas).")
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,365 @@
+"""
+Genera datos sintéticos (usuarios, estaciones, piezas y eventos de traza) con
+distribuciones parecidas a las de la planta y los carga con COPY.
+
+- Cada tipo de pieza sigue una ruta de tipos de estación en su línea.
+- El tiempo de ciclo es lognormal alrededor de la media del tipo de estación,
+  con un factor propio por estación.
+- Las tasas de SCRAP y RETRABAJO dependen del tipo de pieza y del lote (hay
+  lotes malos). Un RETRABAJO repite la misma estación (máximo 2 veces) y un
+  SCRAP termina la ruta. Las piezas que no terminan antes de --hasta quedan
+  con el último evento abierto (EN_PROCESO).
+
+La salida es determinista para la misma --seed y los mismos argumentos
+(incluido --hasta). Los IDs se asignan explícitamente a partir del máximo
+actual de cada tabla; con --reset la carga es idéntica en cada corrida.
+COPY no pasa por los hooks de la API, así que al final se reconstruyen las
+tablas derivadas (throughput, sketches, riesgo, estadísticas de anomalías).
+
+Uso:
+    python -m app.jobs.seed --parts 100000
+    python -m app.jobs.seed --reset --parts 2000000 --seed 7   # ~10M eventos
+"""
+import argparse
+import io
+import sys
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+from sqlalchemy import text
+
+from app.core.security import hash_password
+from app.db import partitions
+from app.db.base import Base
+from app.db.maintenance import ensure_schema
+from app.db.session import SessionLocal, engine
+from app.services import anomaly_detector, cycle_sketches, risk_state, throughput_rollup
+
+# Tiempo de ciclo medio (segundos) por tipo de estación
+STATION_TYPES = {
+    "corte": 90.0,
+    "soldadura": 240.0,
+    "maquinado": 300.0,
+    "ensamble": 420.0,
+    "pintura": 600.0,
+    "prueba": 180.0,
+    "inspeccion": 120.0,
+}
+
+
+@dataclass(frozen=True)
+class TipoPieza:
+    ruta: tuple[str, ...]
+    scrap: float       # probabilidad de SCRAP por estación
+    retrabajo: float   # probabilidad de RETRABAJO por estación
+    peso: float        # fracción de la producción
+
+
+TIPOS_PIEZA = {
+    "CHASIS": TipoPieza(("corte", "soldadura", "pintura", "inspeccion"), 0.020, 0.060, 0.25),
+    "PUERTA": TipoPieza(("corte", "soldadura", "ensamble", "pintura", "inspeccion"), 0.015, 0.050, 0.25),
+    "MOTOR": TipoPieza(("maquinado", "ensamble", "prueba", "inspeccion"), 0.010, 0.080, 0.15),
+    "ARNES": TipoPieza(("corte", "ensamble", "prueba"), 0.005, 0.030, 0.20),
+    "TABLERO": TipoPieza(("maquinado", "ensamble", "pintura", "prueba", "inspeccion"), 0.012, 0.040, 0.15),
+}
+
+OBSERVACIONES = (
+    "Rebaba en el borde",
+    "Porosidad en soldadura",
+    "Medida fuera de tolerancia",
+    "Falla en prueba eléctrica",
+    "Escurrimiento de pintura",
+)
+
+CYCLE_SIGMA = 0.35          # dispersión lognormal del tiempo de ciclo
+TRANSFER_MEAN = 180.0       # espera media entre estaciones (s)
+MAX_RETRABAJOS = 2
+CHUNK_PARTS = 100_000       # piezas por bloque (acota la memoria)
+SEED_PASSWORD = "seed-password"
+
+RESULTADOS = np.array(["OK", "RETRABAJO", "SCRAP", "EN_PROCESO"])
+OK, RETRABAJO, SCRAP, EN_PROCESO = range(4)
+
+
+# ---------------------- UTILIDADES ---------------------- #
+def _timestamps(seconds: np.ndarray) -> np.ndarray:
+    """Segundos desde epoch -> texto ISO en UTC para COPY."""
+    micros = (seconds * 1e6).astype("int64").astype("datetime64[us]")
+    return np.char.add(np.datetime_as_string(micros, unit="us"), "+00")
+
+
+def _copy(cursor, table: str, columns: tuple[str, ...], rows) -> None:
+    """COPY en formato texto; rows son líneas ya separadas por tabuladores."""
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write(row)
+        buffer.write("\n")
+    with cursor.copy(f"COPY {table} ({', '.join(columns)}) FROM STDIN") as copy:
+        copy.write(buffer.getvalue())
+
+
+def _max_id(cursor, table: str) -> int:
+    cursor.execute(f"SELECT coalesce(max(id), 0) FROM {table}")
+    return cursor.fetchone()[0]
+
+
+def _sync_sequence(cursor, table: str) -> None:
+    cursor.execute(
+        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+        f"(SELECT coalesce(max(id), 1) FROM {table}))"
+    )
+
+
+# ---------------------- GENERADOR ---------------------- #
+class Generator:
+    def __init__(self, args):
+        self.args = args
+        self.end = datetime.combine(args.hasta, datetime.min.time(), tzinfo=timezone.utc).timestamp()
+        self.start = self.end - args.days * 86400
+        rng = np.random.default_rng([args.seed, 0])
+
+        self.tipos = list(TIPOS_PIEZA)
+        self.type_names = list(STATION_TYPES)
+        self.cycle_mean = np.array(list(STATION_TYPES.values()))
+        # Factor por estación (línea, tipo): unas estaciones son más lentas que otras
+        self.station_factor = rng.lognormal(0.0, 0.15, (args.lines, len(self.type_names)))
+
+        # Rutas como matriz (tipo de pieza, paso) -> tipo de estación, -1 al terminar
+        max_len = max(len(t.ruta) for t in TIPOS_PIEZA.values())
+        self.routes = np.full((len(self.tipos), max_len), -1)
+        for i, tipo in enumerate(TIPOS_PIEZA.values()):
+            self.routes[i, :len(tipo.ruta)] = [self.type_names.index(s) for s in tipo.ruta]
+        self.route_len = (self.routes >= 0).sum(axis=1)
+        self.p_scrap = np.array([t.scrap for t in TIPOS_PIEZA.values()])
+        self.p_retrabajo = np.array([t.retrabajo for t in TIPOS_PIEZA.values()])
+        self.weights = np.array([t.peso for t in TIPOS_PIEZA.values()])
+        self.weights /= self.weights.sum()
+
+        # Calidad por lote: multiplicador lognormal de las tasas (lotes malos)
+        max_lotes = args.parts // args.lote_size + 2
+        self.lote_quality = rng.lognormal(0.0, 0.5, (len(self.tipos), max_lotes))
+        self.lote_counter = np.zeros(len(self.tipos), dtype=np.int64)
+
+    def users(self, first_id: int, password_hash: str) -> list[str]:
+        n = self.args.users
+        n_admin = max(1, n // 20)
+        n_supervisor = max(1, n * 3 // 20)
+        rows = []
+        for i in range(n):
+            rol = "ADMIN" if i < n_admin else "SUPERVISOR" if i < n_admin + n_supervisor else "OPERADOR"
+            rows.append(
+                f"{first_id + i}\tUsuario {i}\t{rol.lower()}{i}.s{self.args.seed}@example.com\t"
+                f"{password_hash}\t{rol}\tt\t{datetime.fromtimestamp(self.start, timezone.utc):%Y-%m-%d %H:%M:%S}"
+            )
+        self.operator_ids = np.arange(first_id + n_admin + n_supervisor, first_id + n)
+        return rows
+
+    def stations(self, first_id: int) -> list[str]:
+        rows = []
+        self.station_ids = np.zeros((self.args.lines, len(self.type_names)), dtype=np.int64)
+        for line in range(self.args.lines):
+            for j, tipo in enumerate(self.type_names):
+                station_id = first_id + line * len(self.type_names) + j
+                self.station_ids[line, j] = station_id
+                rows.append(f"{station_id}\t{tipo.upper()}-L{line + 1}\t{tipo}\tLINEA-{line + 1}")
+        return rows
+
+    def chunk(self, chunk_no: int, first_part: int, first_event: int):
+        """Piezas y eventos de un bloque. Retorna (filas de parts, filas de eventos)."""
+        args = self.args
+        rng = np.random.default_rng([args.seed, 1, chunk_no])
+        lo = chunk_no * CHUNK_PARTS
+        n = min(CHUNK_PARTS, args.parts - lo)
+        index = np.arange(lo, lo + n)
+
+        # Las piezas se crean en orden a lo largo del periodo
+        created = self.start + (index + rng.random(n)) / args.parts * (self.end - self.start)
+        tipo = rng.choice(len(self.tipos), n, p=self.weights)
+        line = rng.integers(0, args.lines, n)
+
+        # Lote: bloques consecutivos de lote_size piezas del mismo tipo
+        lote = np.empty(n, dtype=np.int64)
+        for t in range(len(self.tipos)):
+            mask = tipo == t
+            count = int(mask.sum())
+            lote[mask] = (self.lote_counter[t] + np.arange(count)) // args.lote_size
+            self.lote_counter[t] += count
+        quality = self.lote_quality[tipo, lote]
+        p_scrap = np.minimum(self.p_scrap[tipo] * quality, 0.5)
+        p_retrabajo = np.minimum(self.p_retrabajo[tipo] * quality, 0.5)
+
+        # Recorrido de la ruta, vectorizado por paso
+        step = np.zeros(n, dtype=np.int64)
+        retries = np.zeros(n, dtype=np.int64)
+        clock = created.copy()
+        status = np.full(n, EN_PROCESO)
+        active = np.arange(n)
+        events = []  # (pieza, estación, entrada, salida, resultado)
+        while active.size:
+            stype = self.routes[tipo[active], step[active]]
+            station = self.station_ids[line[active], stype]
+            mean = self.cycle_mean[stype] * self.station_factor[line[active], stype]
+            duration = mean * rng.lognormal(-CYCLE_SIGMA ** 2 / 2, CYCLE_SIGMA, active.size)
+            entrada = clock[active]
+            salida = entrada + duration
+
+            roll = rng.random(active.size)
+            result = np.full(active.size, OK)
+            can_retry = retries[active] < MAX_RETRABAJOS
+            result[(roll < p_scrap[active] + p_retrabajo[active]) & can_retry] = RETRABAJO
+            result[roll < p_scrap[active]] = SCRAP
+            open_ = salida >= self.end
+            result[open_] = EN_PROCESO
+            events.append((active, station, entrada, np.where(open_, np.nan, salida), result))
+            status[active] = result
+
+            retries[active] = np.where(result == RETRABAJO, retries[active] + 1, 0)
+            step[active] += result == OK
+            clock[active] = salida + rng.exponential(TRANSFER_MEAN, active.size)
+            keep = (
+                ((result == OK) | (result == RETRABAJO))
+                & (step[active] < self.route_len[tipo[active]])
+                & (clock[active] < self.end)
+            )
+            active = active[keep]
+
+        part_idx, station, entrada, salida, result = (np.concatenate(cols) for cols in zip(*events))
+        # IDs de eventos en orden cronológico, como llegarían por la API
+        order = np.argsort(entrada, kind="stable")
+        part_idx, station, entrada, salida, result = (
+            part_idx[order], station[order], entrada[order], salida[order], result[order]
+        )
+        n_events = part_idx.size
+        operator = self.operator_ids[
+            (line[part_idx] + args.lines * rng.integers(0, len(self.operator_ids), n_events))
+            % len(self.operator_ids)
+        ]
+        observaciones = np.where(
+            (result == SCRAP) | (result == RETRABAJO),
+            np.array(OBSERVACIONES)[rng.integers(0, len(OBSERVACIONES), n_events)],
+            "\\N",
+        )
+        salida_txt = np.where(np.isnan(salida), "\\N", _timestamps(np.nan_to_num(salida)))
+
+        part_rows = [
+            f"{first_part + i}\tP{args.seed}-{lo + i:09d}\t{self.tipos[t]}\t"
+            f"L{args.seed}-{self.tipos[t]}-{l:05d}\t{RESULTADOS[s]}\t{c}"
+            for i, (t, l, s, c) in enumerate(zip(
+                tipo.tolist(), lote.tolist(), status.tolist(), _timestamps(created).tolist()
+            ))
+        ]
+        event_rows = [
+            f"{first_event + i}\t{first_part + p}\t{st}\t{op}\t{e}\t{s}\t{r}\t{o}"
+            for i, (p, st, op, e, s, r, o) in enumerate(zip(
+                part_idx.tolist(), station.tolist(), operator.tolist(),
+                _timestamps(entrada).tolist(), salida_txt.tolist(),
+                RESULTADOS[result].tolist(), observaciones.tolist(),
+            ))
+        ]
+        return part_rows, event_rows
+
+
+# ---------------------- CARGA ---------------------- #
+def load(args) -> dict:
+    gen = Generator(args)
+    counts = {"users": 0, "stations": 0, "parts": 0, "trace_events": 0}
+    raw = engine.raw_connection()
+    try:
+        with raw.driver_connection.cursor() as cur:
+            if args.reset:
+                tables = ", ".join(t.name for t in Base.metadata.sorted_tables)
+                cur.execute(f"TRUNCATE {tables} RESTART IDENTITY CASCADE")
+
+            users = gen.users(_max_id(cur, "users") + 1, hash_password(SEED_PASSWORD))
+            _copy(cur, "users", ("id", "nombre", "email", "password_hash", "rol", "activo", "fecha_registro"), users)
+            stations = gen.stations(_max_id(cur, "stations") + 1)
+            _copy(cur, "stations", ("id", "nombre", "tipo", "linea"), stations)
+            counts["users"], counts["stations"] = len(users), len(stations)
+
+            next_part = _max_id(cur, "parts") + 1
+            next_event = _max_id(cur, "trace_events") + 1
+            for chunk_no in range((args.parts + CHUNK_PARTS - 1) // CHUNK_PARTS):
+                parts, events = gen.chunk(chunk_no, next_part, next_event)
+                _copy(cur, "parts", ("id", "serial", "tipo_pieza", "lote", "status", "fecha_creacion"), parts)
+                _copy(
+                    cur,
+                    "trace_events",
+                    ("id", "part_id", "station_id", "operador_id", "timestamp_entrada",
+                     "timestamp_salida", "resultado", "observaciones"),
+                    events,
+                )
+                next_part += len(parts)
+                next_event += len(events)
+                counts["parts"] += len(parts)
+                counts["trace_events"] += len(events)
+                print(f"  bloque {chunk_no}: {counts['parts']} piezas, {counts['trace_events']} eventos")
+
+            for table in counts:
+                _sync_sequence(cur, table)
+        raw.commit()
+    finally:
+        raw.close()
+    return counts
+
+
+def rebuild_derived() -> None:
+    db = SessionLocal()
+    try:
+        for name, rebuild in (
+            ("throughput_rollup", throughput_rollup.rebuild),
+            ("station_cycle_sketch", cycle_sketches.rebuild),
+            ("part_risk_state", risk_state.rebuild),
+            ("cycle_time_stats", anomaly_detector.rebuild_stats),
+        ):
+            start = time.perf_counter()
+            count = rebuild(db)
+            db.commit()
+            print(f"{name} reconstruida ({count} filas, {time.perf_counter() - start:.1f}s).")
+    finally:
+        db.close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--parts", type=int, default=100_000)
+    parser.add_argument("--users", type=int, default=60)
+    parser.add_argument("--lines", type=int, default=3, help="Líneas de producción (una estación por tipo en cada una)")
+    parser.add_argument("--lote-size", type=int, default=500, help="Piezas por lote")
+    parser.add_argument("--days", type=int, default=90, help="Días de historia antes de --hasta")
+    parser.add_argument("--hasta", type=date.fromisoformat, default=datetime.now(timezone.utc).date(),
+                        help="Fin del periodo (YYYY-MM-DD, UTC, excluido)")
+    parser.add_argument("--reset", action="store_true", help="Vaciar TODAS las tablas antes de cargar")
+    parser.add_argument("--skip-rebuild", action="store_true", help="No reconstruir las tablas derivadas")
+    args = parser.parse_args()
+    if args.users < 3:
+        parser.error("--users debe ser al menos 3 (admin, supervisor y operador)")
+
+    ensure_schema(engine)
+    with engine.begin() as conn:
+        if partitions.is_partitioned(conn):
+            partitions.ensure_partitions(conn, args.hasta - timedelta(days=args.days), args.hasta)
+
+    start = time.perf_counter()
+    print(f"Generando datos (seed={args.seed}, hasta={args.hasta})...")
+    counts = load(args)
+    elapsed = time.perf_counter() - start
+    print(
+        f"Cargados {counts['users']} usuarios, {counts['stations']} estaciones, "
+        f"{counts['parts']} piezas y {counts['trace_events']} eventos en {elapsed:.1f}s "
+        f"({counts['trace_events'] / elapsed:,.0f} eventos/s)."
+    )
+
+    with engine.begin() as conn:
+        for table in counts:
+            conn.execute(text(f"ANALYZE {table}"))
+
+    if not args.skip_rebuild:
+        rebuild_derived()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
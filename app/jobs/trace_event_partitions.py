@@ -0,0 +1,64 @@
+"""
+Particiones mensuales de trace_events.
+
+Sin opciones crea el mes actual y los siguientes (--ahead, por defecto
+TRACE_EVENT_PARTITIONS_AHEAD) y mueve a su propia partición los meses que
+hayan caído en la partición DEFAULT. Conviene correrlo a diario (cron).
+
+--migrate convierte una trace_events existente sin particionar. Copia la
+tabla completa y la bloquea mientras tanto: correr fuera de horario.
+
+Uso:
+    python -m app.jobs.trace_event_partitions
+    python -m app.jobs.trace_event_partitions --ahead 6
+    python -m app.jobs.trace_event_partitions --migrate [--keep-legacy]
+"""
+import argparse
+import sys
+import time
+
+from sqlalchemy import text
+
+from app.db import partitions
+from app.db.maintenance import ensure_schema
+from app.db.session import engine
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ahead", type=int, help="Meses a crear por adelantado")
+    parser.add_argument("--migrate", action="store_true", help="Migrar la tabla existente sin particionar")
+    parser.add_argument("--keep-legacy", action="store_true", help="Con --migrate, conservar trace_events_legacy")
+    args = parser.parse_args()
+
+    ensure_schema(engine)
+
+    if args.migrate:
+        with engine.begin() as conn:
+            if partitions.is_partitioned(conn):
+                print("trace_events ya está particionada.")
+            else:
+                print("Migrando trace_events a particiones mensuales...")
+                start = time.perf_counter()
+                copied = partitions.migrate_to_partitioned(conn, keep_legacy=args.keep_legacy)
+                print(f"{copied} eventos copiados en {time.perf_counter() - start:.1f}s.")
+        with engine.begin() as conn:
+            conn.execute(text(f"ANALYZE {partitions.PARENT}"))
+
+    with engine.begin() as conn:
+        if not partitions.is_partitioned(conn):
+            print("trace_events no está particionada; usar --migrate.")
+            return 1
+        created = partitions.ensure_upcoming(conn, args.ahead)
+        for month in partitions.default_months(conn):
+            if partitions.create_partition(conn, month):
+                created.append(partitions.partition_name(month))
+        names = sorted(partitions.existing_partitions(conn))
+
+    print(f"Particiones creadas: {', '.join(created) if created else 'ninguna'}.")
+    print(f"Particiones existentes ({len(names)}): {', '.join(names)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,24 @@
+import threading
+
 from fastapi import FastAPI
-from app.db.base import Base
-from app.db.session import engine
-from app.api import auth, parts, stations, trace_events, metrics, ai, user
+from fastapi.responses import ORJSONResponse
+from app.core.config import settings
+from app.db.session import engine, async_engine
+from app.db.maintenance import ensure_schema
+from app.core.password_pool import password_pool
+from app.core.request_metrics import RequestMetricsMiddleware, instrument_engine
+from app.services.trace_snapshot import trace_snapshot
+from app.api import auth, parts, stations, trace_events, metrics, ai, user, internal, live
+
+ensure_schema(engine)
 
-Base.metadata.create_all(bind=engine)
+# orjson para todas las respuestas; los listados grandes serializan directo (app.core.serialization)
+app = FastAPI(title="Trace API", default_response_class=ORJSONResponse)
 
-app = FastAPI(title="Trace API")
+# Latencia, consultas SQL y tamaño de respuesta por ruta (/internal/metrics)
+instrument_engine(engine)
+instrument_engine(async_engine.sync_engine)
+app.add_middleware(RequestMetricsMiddleware)
 
 app.include_router(auth.router)
 app.include_router(parts.router)
@@ -14,6 +27,25 @@ app.include_router(trace_events.router)
 app.include_router(metrics.router)
 app.include_router(ai.router)
 app.include_router(user.router)
+app.include_router(internal.router)
+app.include_router(live.router)
+
+
+@app.on_event("startup")
+def warm_trace_snapshot():
+    # La carga completa puede tardar; se hace en segundo plano al arrancar
+    if settings.METRICS_SOURCE == "snapshot":
+        threading.Thread(target=trace_snapshot.columns, name="trace-snapshot", daemon=True).start()
+
+
+@app.on_event("shutdown")
+def shutdown_password_pool():
+    password_pool.shutdown()
+
+
+@app.on_event("shutdown")
+async def dispose_async_engine():
+    await async_engine.dispose()
 
 
 @app.get("/")
@@ -0,0 +1,57 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func
+from app.db.base import Base
+
+
+class CycleTimeStats(Base):
+    """
+    Media y varianza acumuladas (Welford) del tiempo de ciclo por estación
+    o por tipo de pieza. scope = "station" | "tipo_pieza"; key = id o nombre.
+    """
+    __tablename__ = "cycle_time_stats"
+
+    scope = Column(String(20), primary_key=True)
+    key = Column(String(50), primary_key=True)
+
+    n = Column(Integer, nullable=False, default=0)
+    mean = Column(Float, nullable=False, default=0.0)
+    # Suma de cuadrados de las diferencias respecto a la media
+    m2 = Column(Float, nullable=False, default=0.0)
+
+    updated_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        nullable=False,
+    )
+
+
+class Anomaly(Base):
+    """
+    Evento cuyo tiempo de ciclo quedó fuera de rango (|z| >= umbral)
+    respecto a su estación o a su tipo de pieza al momento de cerrarse.
+    """
+    __tablename__ = "anomalies"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # Sin FK: trace_events puede archivarse o particionarse sin afectar el histórico
+    event_id = Column(Integer, nullable=False, index=True)
+    part_id = Column(Integer, ForeignKey("parts.id", ondelete="CASCADE"), nullable=False)
+    station_id = Column(Integer, nullable=False)
+    tipo_pieza = Column(String(50), nullable=True)
+
+    scope = Column(String(20), nullable=False)
+    key = Column(String(50), nullable=False)
+
+    duracion_segundos = Column(Float, nullable=False)
+    media_segundos = Column(Float, nullable=False)
+    desviacion_segundos = Column(Float, nullable=False)
+    z_score = Column(Float, nullable=False)
+
+    detected_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index("ix_anomalies_scope_key_id", "scope", "key", "id"),
+        # Una anomalía por evento y scope: volver a cerrar un evento no la duplica
+        Index("ux_anomalies_event_scope", "event_id", "scope", unique=True),
+    )
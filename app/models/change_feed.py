@@ -0,0 +1,23 @@
+from sqlalchemy import BigInteger, Column, DateTime, Integer, String
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.sql import func
+
+from app.db.base import Base
+
+
+class ChangeFeedEntry(Base):
+    """
+    Feed de cambios de trace_events y del status de parts (ver
+    app.services.change_feed). seq crece en el mismo orden en que se
+    confirman las transacciones, así que leer seq > último visto no pierde cambios.
+    """
+    __tablename__ = "change_feed"
+
+    seq = Column(BigInteger, primary_key=True, autoincrement=True)
+    # "trace_event" (op insert / close) o "part" (op status)
+    entity = Column(String(20), nullable=False)
+    op = Column(String(20), nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    # Estado del registro después del cambio
+    data = Column(JSONB, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), index=True)
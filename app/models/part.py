@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, Index
 from sqlalchemy.sql import func
 from app.db.base import Base
 
@@ -15,3 +15,16 @@ class Part(Base):
     # EN_PROCESO, OK, SCRAP, RETRABAJO
     status = Column(String(20), nullable=False, default="EN_PROCESO")
     fecha_creacion = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Índices de expresión que coinciden con los filtros case-insensitive de GET /parts
+    # (func.upper(col) == valor). Incluyen id para servir también el orden por keyset.
+    __table_args__ = (
+        Index("ix_parts_upper_status_id", func.upper(status), id),
+        Index("ix_parts_upper_lote_id", func.upper(lote), id),
+        Index(
+            "ix_parts_upper_tipo_lote_fecha",
+            func.upper(tipo_pieza),
+            func.upper(lote),
+            fecha_creacion,
+        ),
+    )
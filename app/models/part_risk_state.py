@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from app.db.base import Base
+
+
+class PartRiskState(Base):
+    """
+    Totales acumulados de los eventos de una pieza.
+    Se actualiza en la misma transacción que crea o cierra cada evento,
+    así el risk score se lee con una sola búsqueda por clave primaria.
+    """
+    __tablename__ = "part_risk_state"
+
+    part_id = Column(
+        Integer,
+        ForeignKey("parts.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+
+    # Suma de (timestamp_salida - timestamp_entrada) de los eventos con ambos timestamps
+    tiempo_total_segundos = Column(Float, nullable=False, default=0.0)
+    eventos_con_tiempo = Column(Integer, nullable=False, default=0)
+
+    scrap_count = Column(Integer, nullable=False, default=0)
+    retrabajo_count = Column(Integer, nullable=False, default=0)
+    eventos_totales = Column(Integer, nullable=False, default=0)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, Float, Date, LargeBinary, ForeignKey
+from app.db.base import Base
+
+
+class StationCycleSketch(Base):
+    """
+    Sketch de cuantiles (DDSketch) del tiempo de ciclo por estación y día (UTC).
+    Se actualiza al cerrar eventos; GET /metrics/station-cycle-time une los días
+    de la ventana pedida sin recorrer trace_events.
+    """
+    __tablename__ = "station_cycle_sketch"
+
+    station_id = Column(
+        Integer,
+        ForeignKey("stations.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    bucket = Column(Date, primary_key=True)
+
+    count = Column(Integer, nullable=False, default=0)
+    total_seconds = Column(Float, nullable=False, default=0.0)
+    # DDSketch serializado (ver app.services.ddsketch)
+    sketch = Column(LargeBinary, nullable=False)
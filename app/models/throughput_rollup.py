@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from app.db.base import Base
+
+
+class ThroughputRollup(Base):
+    """
+    Piezas OK por hora, estación y tipo de pieza.
+    Se mantiene de forma incremental al crear/cerrar eventos y alimenta
+    GET /metrics/throughput sin recorrer trace_events.
+    """
+    __tablename__ = "throughput_rollup"
+
+    # Inicio de la hora (UTC) de timestamp_salida
+    bucket = Column(DateTime(timezone=True), primary_key=True)
+    station_id = Column(
+        Integer,
+        ForeignKey("stations.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    tipo_pieza = Column(String(50), primary_key=True)
+
+    ok_count = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,23 @@
+from sqlalchemy import BigInteger, Column, Date, DateTime, Integer, String
+from sqlalchemy.sql import func
+
+from app.db.base import Base
+
+
+class TraceArchiveFile(Base):
+    """
+    Manifiesto de los archivos Parquet con eventos archivados (ver
+    app.services.event_archive). Solo se leen los archivos registrados aquí;
+    la fila se inserta en la misma transacción que borra los eventos de trace_events.
+    """
+    __tablename__ = "trace_archive_files"
+
+    id = Column(Integer, primary_key=True)
+    # Mes (UTC) de timestamp_entrada de los eventos del archivo
+    month = Column(Date, nullable=False, index=True)
+    # Ruta relativa a TRACE_ARCHIVE_DIR
+    path = Column(String(500), nullable=False, unique=True)
+    rows = Column(Integer, nullable=False)
+    min_event_id = Column(BigInteger, nullable=False)
+    max_event_id = Column(BigInteger, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.base import Base
@@ -6,12 +6,16 @@ from app.db.base import Base
 class TraceEvent(Base):
     __tablename__ = "trace_events"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     part_id = Column(Integer, ForeignKey("parts.id"), nullable=False) 
     station_id = Column(Integer, ForeignKey("stations.id"), nullable=False)
     operador_id = Column(Integer, ForeignKey("users.id"), nullable=True)
 
-    timestamp_entrada = Column(DateTime(timezone=True), server_default=func.now())
+    # Clave de partición (particiones mensuales, ver app/db/partitions.py):
+    # forma parte de la clave primaria de la tabla y no admite NULL
+    timestamp_entrada = Column(
+        DateTime(timezone=True), primary_key=True, nullable=False, server_default=func.now()
+    )
     timestamp_salida = Column(DateTime(timezone=True), nullable=True)
 
     resultado = Column(String(20), nullable=False)  # OK, SCRAP, RETRABAJO
@@ -20,3 +24,12 @@ class TraceEvent(Base):
     part = relationship("Part")
     station = relationship("Station")
     operador = relationship("User")
+
+    # Historial por pieza (GET /trace-events/part/{part_id}) y su versión para el ETag
+    __table_args__ = (
+        Index("ix_trace_events_part_entrada", part_id, timestamp_entrada),
+        {"postgresql_partition_by": "RANGE (timestamp_entrada)"},
+    )
+    # Para el ORM la identidad sigue siendo solo id (único por la secuencia),
+    # así db.get(TraceEvent, event_id) funciona sin conocer la fecha
+    __mapper_args__ = {"primary_key": [id]}
@@ -1,4 +1,5 @@
-from pydantic import BaseModel
+from datetime import date, datetime
+from pydantic import BaseModel, ConfigDict, model_validator
 from typing import List
 
 
@@ -23,3 +24,49 @@ class PartRiskScore(BaseModel):
     retrabajos: int
     riesgo: float
     razones: List[str]
+
+
+class RiskBatchRequest(BaseModel):
+    """
+    Selección de piezas para el risk score en lote.
+    Se puede mandar una lista de IDs, filtros, o ambos (se combinan con AND).
+    """
+    part_ids: List[int] | None = None
+    lote: str | None = None
+    tipo_pieza: str | None = None
+    fecha_desde: date | None = None
+    fecha_hasta: date | None = None
+
+    @model_validator(mode="after")
+    def validate_selection(self):
+        if not any([
+            self.part_ids,
+            self.lote,
+            self.tipo_pieza,
+            self.fecha_desde,
+            self.fecha_hasta,
+        ]):
+            raise ValueError("Debe indicar part_ids o al menos un filtro (lote, tipo_pieza, fechas).")
+        return self
+
+
+class AnomalyOut(BaseModel):
+    id: int
+    event_id: int
+    part_id: int
+    station_id: int
+    tipo_pieza: str | None
+    scope: str
+    key: str
+    duracion_segundos: float
+    media_segundos: float
+    desviacion_segundos: float
+    z_score: float
+    detected_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class AnomalyPage(BaseModel):
+    items: List[AnomalyOut]
+    next_cursor: str | None = None
@@ -31,10 +31,19 @@ class PartCreate(PartBase):
 class PartOut(PartBase):
     id: int
     fecha_creacion: datetime
+    # La columna admite NULL (piezas viejas, PATCH con lote=None)
+    lote: str | None
 
     model_config = ConfigDict(from_attributes=True)  # permite partir de modelos SQLAlchemy
 
 
+# ----- PÁGINA DE PIEZAS (PAGINACIÓN POR CURSOR) -----
+class PartPage(BaseModel):
+    items: list[PartOut]
+    # None cuando no hay más resultados
+    next_cursor: str | None = None
+
+
 # ----- PARA ACTUALIZAR PIEZA (PATCH) -----
 class PartUpdate(BaseModel):
     """
@@ -46,4 +46,43 @@ class TraceEventOut(TraceEventBase):
     timestamp_entrada: datetime
     risk_score: Optional[RiskScoreData] = None  # ← NUEVO: Campo agregado para el risk score
 
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+
+# ========== Schemas para carga masiva ==========
+class TraceEventBulkItemResult(BaseModel):
+    """Resultado de un evento dentro de una carga masiva"""
+    index: int
+    ok: bool
+    part_id: int
+    event_id: int | None = None
+    error: str | None = None
+
+
+class TraceEventBulkOut(BaseModel):
+    """Respuesta de la carga masiva de eventos"""
+    total: int
+    insertados: int
+    rechazados: int
+    resultados: list[TraceEventBulkItemResult]
+    risk_scores: dict[int, RiskScoreData] = {}
+
+
+# ========== Schemas del feed de cambios ==========
+class ChangeOut(BaseModel):
+    """Un cambio del feed: inserción o cierre de un evento, o cambio de status de una pieza"""
+    seq: int
+    entity: str
+    op: str
+    entity_id: int
+    data: dict
+    created_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ChangePage(BaseModel):
+    """Página del feed; la siguiente lectura usa since=next_since"""
+    changes: list[ChangeOut]
+    next_since: int
+    has_more: bool
@@ -0,0 +1,213 @@
+"""
+Detección de anomalías en línea por estación y por tipo de pieza.
+
+Mantiene media y varianza con el algoritmo de Welford (una fila por estación
+y por tipo de pieza), así que cada evento cerrado se evalúa en tiempo constante:
+se calcula su z-score contra las estadísticas previas, se registra como anomalía
+si |z| supera el umbral y luego se incorpora a las estadísticas.
+"""
+import math
+from collections import defaultdict
+from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.compute as pc
+from sqlalchemy import String, cast, func, select, delete, insert, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.anomaly import Anomaly, CycleTimeStats
+from app.models.part import Part
+from app.models.station import Station
+from app.models.trace_event import TraceEvent
+from app.services import event_archive
+
+SCOPES = ("station", "tipo_pieza")
+
+
+def _keys(snapshot) -> list[tuple[str, str]]:
+    keys = [("station", str(snapshot.station_id))]
+    if snapshot.tipo_pieza:
+        keys.append(("tipo_pieza", snapshot.tipo_pieza.strip().upper()))
+    return keys
+
+
+def _welford_add(n: int, mean: float, m2: float, x: float) -> tuple[int, float, float]:
+    n += 1
+    delta = x - mean
+    mean += delta / n
+    m2 += delta * (x - mean)
+    return n, mean, m2
+
+
+def _welford_remove(n: int, mean: float, m2: float, x: float) -> tuple[int, float, float]:
+    if n <= 1:
+        return 0, 0.0, 0.0
+    n_new = n - 1
+    mean_new = (n * mean - x) / n_new
+    m2 = max(m2 - (x - mean_new) * (x - mean), 0.0)
+    return n_new, mean_new, m2
+
+
+def _welford_merge(a: tuple[int, float, float], b: tuple[int, float, float]) -> tuple[int, float, float]:
+    """Combina dos (n, media, m2) calculados sobre muestras disjuntas (Chan et al.)."""
+    n_a, mean_a, m2_a = a
+    n_b, mean_b, m2_b = b
+    n = n_a + n_b
+    if n == 0:
+        return 0, 0.0, 0.0
+    delta = mean_b - mean_a
+    return n, mean_a + delta * n_b / n, m2_a + m2_b + delta * delta * n_a * n_b / n
+
+
+def apply_changes(db: Session, changes) -> None:
+    """
+    Actualiza las estadísticas con los eventos que ganan (o cambian) su duración
+    y registra los que resulten anómalos. Las filas se crean si faltan y se
+    bloquean con un solo upsert (ON CONFLICT DO UPDATE sin cambios, con
+    RETURNING); luego un UPDATE con los valores nuevos.
+    """
+    # (scope, key) -> lista de (peso, duración, snapshot)
+    samples = defaultdict(list)
+    for old, new in changes:
+        before = old.duration if old is not None else None
+        after = new.duration
+        if before == after:
+            continue
+        if before is not None:
+            for key in _keys(old):
+                samples[key].append((-1, before, old))
+        if after is not None:
+            for key in _keys(new):
+                samples[key].append((1, after, new))
+    if not samples:
+        return
+
+    keys = sorted(samples)
+    # Las filas se insertan/bloquean en el orden de VALUES (ordenado)
+    stmt = pg_insert(CycleTimeStats).values(
+        [{"scope": s, "key": k, "n": 0, "mean": 0.0, "m2": 0.0} for s, k in keys]
+    )
+    rows = db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[CycleTimeStats.scope, CycleTimeStats.key],
+            set_={"n": CycleTimeStats.n},
+        ).returning(CycleTimeStats.scope, CycleTimeStats.key, CycleTimeStats.n,
+                    CycleTimeStats.mean, CycleTimeStats.m2)
+    ).all()
+
+    threshold = settings.ANOMALY_Z_THRESHOLD
+    min_samples = settings.ANOMALY_MIN_SAMPLES
+    updates = []
+    anomalies = []
+    for scope, key, n, mean, m2 in rows:
+        for weight, x, snap in samples[(scope, key)]:
+            if weight < 0:
+                n, mean, m2 = _welford_remove(n, mean, m2, x)
+                continue
+            if n >= min_samples and snap.event_id is not None:
+                std = math.sqrt(m2 / (n - 1))
+                if std > 0:
+                    z = (x - mean) / std
+                    if abs(z) >= threshold:
+                        anomalies.append({
+                            "event_id": snap.event_id,
+                            "part_id": snap.part_id,
+                            "station_id": snap.station_id,
+                            "tipo_pieza": snap.tipo_pieza,
+                            "scope": scope,
+                            "key": key,
+                            "duracion_segundos": x,
+                            "media_segundos": mean,
+                            "desviacion_segundos": std,
+                            "z_score": z,
+                        })
+            n, mean, m2 = _welford_add(n, mean, m2, x)
+        updates.append({"scope": scope, "key": key, "n": n, "mean": mean, "m2": m2})
+
+    db.execute(update(CycleTimeStats), updates)
+    if anomalies:
+        # Un evento ya registrado (p. ej. cerrado dos veces) conserva su primera anomalía
+        db.execute(
+            pg_insert(Anomaly).on_conflict_do_nothing(index_elements=[Anomaly.event_id, Anomaly.scope]),
+            anomalies,
+        )
+
+
+def rebuild_stats(db: Session, desde: datetime | None = None, hasta: datetime | None = None) -> int:
+    """
+    Recalcula cycle_time_stats desde trace_events y el archivo (no regenera el histórico de anomalías),
+    con todo el histórico o solo con los eventos que entraron en [desde, hasta).
+    El rango es sobre timestamp_entrada (clave de partición): solo se leen esos meses.
+    Retorna el número de filas escritas. No hace commit.
+    """
+    db.execute(text("LOCK TABLE cycle_time_stats IN EXCLUSIVE MODE"))
+    duration = func.extract("epoch", TraceEvent.timestamp_salida - TraceEvent.timestamp_entrada)
+    base = (
+        select(
+            func.count(duration).label("n"),
+            func.avg(duration).label("mean"),
+            (func.coalesce(func.var_pop(duration), 0) * func.count(duration)).label("m2"),
+        )
+        .where(TraceEvent.timestamp_salida.isnot(None))
+        .where(TraceEvent.timestamp_entrada.isnot(None))
+    )
+    if desde:
+        base = base.where(TraceEvent.timestamp_entrada >= desde)
+    if hasta:
+        base = base.where(TraceEvent.timestamp_entrada < hasta)
+    station_key = cast(TraceEvent.station_id, String)
+    by_station = base.add_columns(station_key.label("key")).group_by(TraceEvent.station_id)
+    tipo_key = func.upper(func.trim(Part.tipo_pieza))
+    by_tipo = (
+        base.add_columns(tipo_key.label("key"))
+        .join(Part, Part.id == TraceEvent.part_id)
+        .where(func.coalesce(tipo_key, "") != "")
+        .group_by(tipo_key)
+    )
+
+    stats = {}
+    for scope, query in (("station", by_station), ("tipo_pieza", by_tipo)):
+        for row in db.execute(query).mappings():
+            stats[(scope, row["key"])] = (row["n"], float(row["mean"] or 0.0), float(row["m2"] or 0.0))
+    for key, archived in _archived_stats(db, desde, hasta).items():
+        stats[key] = _welford_merge(stats.get(key, (0, 0.0, 0.0)), archived)
+
+    db.execute(delete(CycleTimeStats))
+    values = [
+        {"scope": scope, "key": key, "n": n, "mean": mean, "m2": m2}
+        for (scope, key), (n, mean, m2) in stats.items()
+    ]
+    if values:
+        db.execute(insert(CycleTimeStats), values)
+    return len(values)
+
+
+def _archived_stats(db: Session, desde: datetime | None, hasta: datetime | None) -> dict:
+    """(scope, key) -> (n, media, m2) de los eventos archivados que entraron en [desde, hasta)."""
+    stations = {str(station_id) for station_id in db.scalars(select(Station.id))}
+    columns = ["station_id", "tipo_pieza", "timestamp_entrada", "timestamp_salida"]
+    stats = {}
+    for table in event_archive.archived_tables(db, columns, desde, hasta, on="timestamp_entrada"):
+        table = pa.table({
+            "station": pc.cast(table["station_id"], pa.string()),
+            "tipo_pieza": pc.utf8_upper(pc.utf8_trim_whitespace(table["tipo_pieza"])),
+            "segundos": event_archive.durations(table),
+        })
+        for scope, column in (("station", "station"), ("tipo_pieza", "tipo_pieza")):
+            grouped = table.group_by(column).aggregate([
+                ("segundos", "count"),
+                ("segundos", "mean"),
+                ("segundos", "variance", pc.VarianceOptions(ddof=0)),
+            ])
+            for key, n, mean, variance in zip(*(grouped[name].to_pylist() for name in (
+                column, "segundos_count", "segundos_mean", "segundos_variance",
+            ))):
+                # Mismos descartes que el recálculo en SQL
+                if not key or (scope == "station" and key not in stations):
+                    continue
+                stats[(scope, key)] = _welford_merge(
+                    stats.get((scope, key), (0, 0.0, 0.0)), (n, mean, variance * n)
+                )
+    return stats
@@ -0,0 +1,161 @@
+"""
+Feed de cambios secuenciado para consumidores externos (MES, BI).
+
+Cada inserción y cierre de un evento de traza y cada cambio de status de una
+pieza agrega una fila a change_feed con un seq creciente. Los routers y
+trace_hooks solo encolan los cambios en la sesión (session.info); las filas
+se insertan justo antes del commit, con un advisory lock de transacción que
+se libera al confirmar. Así dos transacciones nunca se intercalan: si un
+consumidor ya vio el seq N, todo cambio que aparezca después tiene seq > N
+y leer con seq > último visto no se salta nada.
+
+El lock serializa solo ese último tramo (una sentencia y el commit) entre
+escrituras concurrentes.
+"""
+import asyncio
+import threading
+import time
+from datetime import datetime
+from typing import Iterable
+
+from sqlalchemy import bindparam, event, select, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Session
+
+from app.models.change_feed import ChangeFeedEntry
+
+_PENDING = "change_feed_pending"
+_WRITTEN = "change_feed_written"
+_LOCK_KEY = "change_feed"
+
+# Commits con cambios en este proceso, para despertar a los long-poll sin ir a la BD
+_local_version = 0
+# Long-poll esperando en este proceso: (event loop, evento que lo despierta).
+# El commit puede ocurrir en otro hilo (sesiones síncronas en el threadpool)
+_waiters: set[tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+_waiters_lock = threading.Lock()
+
+
+def _isoformat(value: datetime | None) -> str | None:
+    return value.isoformat() if value is not None else None
+
+
+def _pending(db) -> list[dict]:
+    return db.info.setdefault(_PENDING, [])
+
+
+def queue_event_changes(db, changes: Iterable[tuple]) -> None:
+    """Encola los cambios (antes, después) de eventos; antes es None en una inserción."""
+    pending = _pending(db)
+    for old, new in changes:
+        if old == new:
+            continue
+        if old is None:
+            op = "insert"
+        elif old.timestamp_salida is None and new.timestamp_salida is not None:
+            op = "close"
+        else:
+            op = "update"
+        pending.append({
+            "entity": "trace_event",
+            "op": op,
+            "entity_id": new.event_id,
+            "data": {
+                "id": new.event_id,
+                "part_id": new.part_id,
+                "station_id": new.station_id,
+                "timestamp_entrada": _isoformat(new.timestamp_entrada),
+                "timestamp_salida": _isoformat(new.timestamp_salida),
+                "resultado": new.resultado,
+            },
+        })
+
+
+def queue_part_status(db, part_id: int, status: str | None) -> None:
+    """Encola el status nuevo de una pieza (llamar solo si cambió o si la pieza es nueva)."""
+    _pending(db).append({
+        "entity": "part",
+        "op": "status",
+        "entity_id": part_id,
+        "data": {"id": part_id, "status": status},
+    })
+
+
+# Lock e inserción en una sola sentencia: el tramo serializado es solo esto y el commit.
+# El lock se toma antes de producir la primera fila, es decir, antes de pedir
+# cualquier seq; el orden dentro de la transacción es el de encolado.
+_INSERT = text(f"""
+    WITH feed_lock AS MATERIALIZED (SELECT pg_advisory_xact_lock(hashtext(:key)))
+    INSERT INTO {ChangeFeedEntry.__tablename__} (entity, op, entity_id, data)
+    SELECT e.row->>'entity', e.row->>'op', (e.row->>'entity_id')::int, e.row->'data'
+    FROM feed_lock, jsonb_array_elements(:rows) WITH ORDINALITY AS e(row, n)
+    ORDER BY e.n
+""").bindparams(bindparam("rows", type_=JSONB))
+
+
+@event.listens_for(Session, "before_commit")
+def _write_pending(session: Session) -> None:
+    rows = session.info.pop(_PENDING, None)
+    if not rows:
+        return
+    session.execute(_INSERT, {"key": _LOCK_KEY, "rows": rows})
+    session.info[_WRITTEN] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _committed(session: Session) -> None:
+    global _local_version
+    if not session.info.pop(_WRITTEN, False):
+        return
+    with _waiters_lock:
+        _local_version += 1
+        waiters = list(_waiters)
+    for loop, ready in waiters:
+        try:
+            loop.call_soon_threadsafe(ready.set)
+        except RuntimeError:
+            # Loop ya cerrado: su espera terminó con él
+            pass
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session: Session) -> None:
+    session.info.pop(_PENDING, None)
+    session.info.pop(_WRITTEN, None)
+
+
+# ---------------------- LECTURA ---------------------- #
+def changes_query(since: int, limit: int, columns: tuple = (ChangeFeedEntry,)):
+    """Lectura por clave (seq > since); pide una fila de más para saber si hay otra página."""
+    return (
+        select(*columns)
+        .where(ChangeFeedEntry.seq > since)
+        .order_by(ChangeFeedEntry.seq)
+        .limit(limit + 1)
+    )
+
+
+def local_version() -> int:
+    return _local_version
+
+
+async def wait_for_local_change(version: int, until: float) -> None:
+    """
+    Espera hasta que este proceso confirme cambios posteriores a version o
+    hasta until (monotonic). No hace polling: el after_commit despierta el evento.
+    """
+    timeout = until - time.monotonic()
+    if timeout <= 0:
+        return
+    waiter = (asyncio.get_running_loop(), asyncio.Event())
+    with _waiters_lock:
+        if _local_version != version:
+            return
+        _waiters.add(waiter)
+    try:
+        await asyncio.wait_for(waiter[1].wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        with _waiters_lock:
+            _waiters.discard(waiter)
@@ -0,0 +1,213 @@
+"""
+Mantenimiento de los sketches de tiempo de ciclo por estación y día.
+"""
+from collections import defaultdict
+from datetime import date, datetime, time, timezone
+
+import pyarrow as pa
+import pyarrow.compute as pc
+from sqlalchemy import func, select, delete, insert, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.db import partitions
+from app.models.station import Station
+from app.models.station_cycle_sketch import StationCycleSketch
+from app.models.trace_event import TraceEvent
+from app.services import event_archive
+from app.services.ddsketch import DDSketch, quantiles_from_payloads
+
+QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+
+def _sample(snapshot) -> tuple | None:
+    """((estación, día), duración) con la que aporta el evento, o None."""
+    if snapshot is None:
+        return None
+    duration = snapshot.duration
+    if duration is None:
+        return None
+    return (snapshot.station_id, snapshot.timestamp_salida.date()), duration
+
+
+def apply_changes(db: Session, changes) -> None:
+    """
+    Agrega (y retira, si el evento ya tenía duración) cada tiempo de ciclo
+    al sketch de su estación y día. Las filas afectadas se bloquean en orden
+    para evitar interbloqueos entre escrituras concurrentes.
+
+    Dos sentencias: un upsert que crea las filas que falten y bloquea y
+    devuelve todas (ON CONFLICT DO UPDATE sin cambios, con RETURNING), y el
+    UPDATE con los sketches combinados en Python.
+    """
+    samples = defaultdict(list)
+    for old, new in changes:
+        before, after = _sample(old), _sample(new)
+        if before == after:
+            continue
+        if before:
+            samples[before[0]].append((before[1], -1))
+        if after:
+            samples[after[0]].append((after[1], 1))
+    if not samples:
+        return
+
+    keys = sorted(samples)
+    empty = DDSketch().to_bytes()
+    # Las filas se insertan/bloquean en el orden de VALUES (ordenado)
+    stmt = pg_insert(StationCycleSketch).values([
+        {"station_id": s, "bucket": b, "count": 0, "total_seconds": 0.0, "sketch": empty}
+        for s, b in keys
+    ])
+    rows = db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[StationCycleSketch.station_id, StationCycleSketch.bucket],
+            set_={"count": StationCycleSketch.count},
+        ).returning(
+            StationCycleSketch.station_id,
+            StationCycleSketch.bucket,
+            StationCycleSketch.count,
+            StationCycleSketch.total_seconds,
+            StationCycleSketch.sketch,
+        )
+    ).all()
+
+    updates = []
+    for station_id, bucket, count, total_seconds, payload in rows:
+        sketch = DDSketch.from_bytes(payload)
+        for value, weight in samples[(station_id, bucket)]:
+            sketch.add(value, weight)
+            count += weight
+            total_seconds += value * weight
+        updates.append({
+            "station_id": station_id,
+            "bucket": bucket,
+            "count": count,
+            "total_seconds": total_seconds,
+            "sketch": sketch.to_bytes(),
+        })
+    db.execute(update(StationCycleSketch), updates)
+
+
+def station_quantiles(
+    db: Session,
+    desde: date | None = None,
+    hasta: date | None = None,
+    station_id: int | None = None,
+) -> list[dict]:
+    """Cuantiles, conteo y promedio por estación para los días [desde, hasta]."""
+    query = select(
+        StationCycleSketch.station_id,
+        StationCycleSketch.count,
+        StationCycleSketch.total_seconds,
+        StationCycleSketch.sketch,
+    ).where(StationCycleSketch.count != 0)
+    if desde:
+        query = query.where(StationCycleSketch.bucket >= desde)
+    if hasta:
+        query = query.where(StationCycleSketch.bucket <= hasta)
+    if station_id is not None:
+        query = query.where(StationCycleSketch.station_id == station_id)
+
+    grouped = defaultdict(lambda: [0, 0.0, []])
+    for sid, count, total_seconds, payload in db.execute(query):
+        acc = grouped[sid]
+        acc[0] += count
+        acc[1] += total_seconds
+        acc[2].append(payload)
+
+    result = []
+    for sid in sorted(grouped):
+        count, total_seconds, payloads = grouped[sid]
+        if count <= 0:
+            continue
+        p50, p90, p95, p99 = quantiles_from_payloads(payloads, QUANTILES)
+        result.append({
+            "station_id": sid,
+            "eventos": count,
+            "tiempo_promedio_segundos": total_seconds / count,
+            "p50": p50,
+            "p90": p90,
+            "p95": p95,
+            "p99": p99,
+        })
+    return result
+
+
+def rebuild(db: Session, desde: date | None = None, hasta: date | None = None) -> int:
+    """
+    Recalcula los sketches desde trace_events, completos o solo para los días
+    [desde, hasta). Retorna el número de filas escritas. No hace commit.
+    """
+    db.execute(text("LOCK TABLE station_cycle_sketch IN EXCLUSIVE MODE"))
+
+    day = func.date(func.timezone("UTC", TraceEvent.timestamp_salida))
+    duration = func.extract("epoch", TraceEvent.timestamp_salida - TraceEvent.timestamp_entrada)
+    source = (
+        select(TraceEvent.station_id, day, duration)
+        .where(TraceEvent.timestamp_salida.isnot(None))
+        .where(TraceEvent.timestamp_entrada.isnot(None))
+    )
+    cleanup = delete(StationCycleSketch)
+    if desde:
+        source = source.where(TraceEvent.timestamp_salida >= _utc_midnight(desde))
+        cleanup = cleanup.where(StationCycleSketch.bucket >= desde)
+    if hasta:
+        source = source.where(TraceEvent.timestamp_salida < _utc_midnight(hasta))
+        cleanup = cleanup.where(StationCycleSketch.bucket < hasta)
+    # Rango equivalente sobre la clave de partición, para leer solo esos meses
+    source = source.where(*partitions.entrada_window(
+        _utc_midnight(desde) if desde else None,
+        _utc_midnight(hasta) if hasta else None,
+    ))
+
+    sketches = defaultdict(lambda: [DDSketch(), 0, 0.0])
+    for station_id, bucket, seconds in db.execute(source.execution_options(yield_per=50_000)):
+        acc = sketches[(station_id, bucket)]
+        seconds = float(seconds)
+        acc[0].add(seconds)
+        acc[1] += 1
+        acc[2] += seconds
+    _add_archived(db, sketches, desde, hasta)
+
+    db.execute(cleanup)
+    values = [
+        {
+            "station_id": station_id,
+            "bucket": bucket,
+            "count": count,
+            "total_seconds": total_seconds,
+            "sketch": sketch.to_bytes(),
+        }
+        for (station_id, bucket), (sketch, count, total_seconds) in sketches.items()
+    ]
+    if values:
+        db.execute(insert(StationCycleSketch), values)
+    return len(values)
+
+
+def _add_archived(db: Session, sketches, desde: date | None, hasta: date | None) -> None:
+    """Agrega a sketches los tiempos de ciclo del archivo Parquet."""
+    stations = set(db.scalars(select(Station.id)))
+    columns = ["station_id", "timestamp_entrada", "timestamp_salida"]
+    for table in event_archive.archived_tables(
+        db,
+        columns,
+        _utc_midnight(desde) if desde else None,
+        _utc_midnight(hasta) if hasta else None,
+    ):
+        days = pc.cast(table["timestamp_salida"], pa.date32())
+        for station_id, bucket, seconds in zip(
+            table["station_id"].to_pylist(), days.to_pylist(), event_archive.durations(table).to_pylist()
+        ):
+            # Estaciones borradas después de archivar no tienen fila posible (FK)
+            if station_id not in stations:
+                continue
+            acc = sketches[(station_id, bucket)]
+            acc[0].add(seconds)
+            acc[1] += 1
+            acc[2] += seconds
+
+
+def _utc_midnight(day: date) -> datetime:
+    return datetime.combine(day, time.min, tzinfo=timezone.utc)
@@ -0,0 +1,125 @@
+"""
+DDSketch mínimo para tiempos de ciclo (segundos).
+
+Cada valor cae en un bin logarítmico; cualquier cuantil se estima con error
+relativo <= RELATIVE_ACCURACY. Los sketches se combinan sumando bins, así que
+se pueden guardar por estación y día y unirse para cualquier ventana de tiempo.
+Los pesos negativos permiten retirar un valor agregado antes (evento re-cerrado).
+"""
+import math
+import struct
+
+import numpy as np
+
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_INV_LOG_GAMMA = 1.0 / math.log(GAMMA)
+
+# Valores menores (incluye 0 y negativos) se cuentan en zero_count
+MIN_INDEXABLE = 1e-3
+
+# version, relleno, zero_count, número de bins -> 12 bytes (alineado a 4)
+_HEADER = struct.Struct("<BxxxiI")
+_VERSION = 1
+
+
+def bin_key(value: float) -> int:
+    return math.ceil(math.log(value) * _INV_LOG_GAMMA)
+
+
+def bin_value(key):
+    """Valor representativo de un bin (funciona con escalares y arreglos)."""
+    return 2.0 * np.power(GAMMA, key) / (GAMMA + 1.0)
+
+
+class DDSketch:
+    __slots__ = ("bins", "zero_count")
+
+    def __init__(self):
+        self.bins: dict[int, int] = {}
+        self.zero_count = 0
+
+    def add(self, value: float, weight: int = 1) -> None:
+        if value < MIN_INDEXABLE:
+            self.zero_count += weight
+            return
+        key = bin_key(value)
+        count = self.bins.get(key, 0) + weight
+        if count:
+            self.bins[key] = count
+        else:
+            self.bins.pop(key, None)
+
+    @property
+    def count(self) -> int:
+        return self.zero_count + sum(self.bins.values())
+
+    def quantile(self, q: float) -> float | None:
+        return quantiles_from_payloads([self.to_bytes()], [q])[0]
+
+    def to_bytes(self) -> bytes:
+        keys = sorted(self.bins)
+        n = len(keys)
+        return (
+            _HEADER.pack(_VERSION, self.zero_count, n)
+            + struct.pack(f"<{n}i", *keys)
+            + struct.pack(f"<{n}i", *(self.bins[k] for k in keys))
+        )
+
+    @classmethod
+    def from_bytes(cls, payload: bytes | None) -> "DDSketch":
+        sketch = cls()
+        if not payload:
+            return sketch
+        _, sketch.zero_count, n = _HEADER.unpack_from(payload)
+        keys = struct.unpack_from(f"<{n}i", payload, _HEADER.size)
+        counts = struct.unpack_from(f"<{n}i", payload, _HEADER.size + 4 * n)
+        sketch.bins = dict(zip(keys, counts))
+        return sketch
+
+
+def quantiles_from_payloads(payloads, qs) -> list[float | None]:
+    """
+    Une muchos sketches serializados y estima los cuantiles qs (0-1).
+    La unión se hace con NumPy (concatenar bins y sumarlos con bincount).
+    """
+    zero = 0
+    all_keys = []
+    all_counts = []
+    for payload in payloads:
+        if not payload:
+            continue
+        _, zero_count, n = _HEADER.unpack_from(payload)
+        zero += zero_count
+        if n:
+            all_keys.append(np.frombuffer(payload, dtype="<i4", count=n, offset=_HEADER.size))
+            all_counts.append(
+                np.frombuffer(payload, dtype="<i4", count=n, offset=_HEADER.size + 4 * n)
+            )
+
+    if all_keys:
+        keys = np.concatenate(all_keys)
+        counts = np.concatenate(all_counts).astype(np.int64)
+        offset = keys.min()
+        merged = np.bincount(keys - offset, weights=counts)
+        present = np.nonzero(merged > 0)[0]
+        bin_keys = present + offset
+        cumulative = np.cumsum(merged[present])
+    else:
+        bin_keys = np.empty(0, dtype=np.int64)
+        cumulative = np.empty(0)
+
+    total = zero + (cumulative[-1] if len(cumulative) else 0)
+    if total <= 0:
+        return [None for _ in qs]
+
+    result = []
+    for q in qs:
+        rank = q * (total - 1)
+        if rank < zero:
+            result.append(0.0)
+            continue
+        idx = int(np.searchsorted(cumulative, rank - zero, side="right"))
+        idx = min(idx, len(bin_keys) - 1)
+        result.append(float(bin_value(bin_keys[idx])))
+    return result
@@ -0,0 +1,271 @@
+"""
+Archivo de eventos fríos en Parquet.
+
+Los eventos cerrados de los meses anteriores al horizonte
+(TRACE_ARCHIVE_HORIZON_MONTHS) se mueven de trace_events a archivos Parquet
+comprimidos (zstd) en disco local, por mes:
+{TRACE_ARCHIVE_DIR}/month=YYYY-MM/events-<primer id>-<último id>.parquet.
+
+Cada archivo se registra en trace_archive_files en la misma transacción que
+borra los eventos; un archivo sin fila en el manifiesto (corte a mitad de
+camino) no se lee y se borra en la siguiente corrida.
+
+Las filas de cada archivo van ordenadas por part_id, así que las estadísticas
+de cada row group permiten leer el historial de una pieza sin recorrer el
+archivo completo. Las lecturas usan memory-map.
+
+Los agregados (throughput_rollup, station_cycle_sketch, part_risk_state,
+cycle_time_stats) no se tocan al archivar, y sus recálculos combinan
+trace_events con el archivo: los endpoints de métricas siguen viendo todo
+el histórico.
+"""
+import os
+import time
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterator, NamedTuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from sqlalchemy import BigInteger, any_, bindparam, delete, exists, select, text
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import partitions
+from app.models.part import Part
+from app.models.trace_archive import TraceArchiveFile
+from app.models.trace_event import TraceEvent
+
+# Filas por row group (y por lectura del cursor al archivar)
+ROW_GROUP_SIZE = 50_000
+
+SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("part_id", pa.int64()),
+    ("station_id", pa.int64()),
+    ("operador_id", pa.int64()),
+    ("timestamp_entrada", pa.timestamp("us", tz="UTC")),
+    ("timestamp_salida", pa.timestamp("us", tz="UTC")),
+    ("resultado", pa.string()),
+    ("observaciones", pa.string()),
+    # Copia de parts.tipo_pieza al archivar (los recálculos no hacen join)
+    ("tipo_pieza", pa.string()),
+])
+
+_COLUMNS = (
+    TraceEvent.id,
+    TraceEvent.part_id,
+    TraceEvent.station_id,
+    TraceEvent.operador_id,
+    TraceEvent.timestamp_entrada,
+    TraceEvent.timestamp_salida,
+    TraceEvent.resultado,
+    TraceEvent.observaciones,
+    Part.tipo_pieza,
+)
+
+
+class ArchivedEvent(NamedTuple):
+    """Evento leído del archivo, con los mismos atributos que una fila del historial."""
+    id: int
+    part_id: int
+    station_id: int
+    operador_id: int | None
+    timestamp_entrada: datetime
+    timestamp_salida: datetime | None
+    resultado: str
+    observaciones: str | None
+
+
+def archive_dir() -> Path:
+    return Path(settings.TRACE_ARCHIVE_DIR)
+
+
+def archive_cutoff(today: date | None = None) -> date:
+    """Primer mes que se conserva en trace_events; los anteriores se archivan."""
+    today = today or datetime.now(timezone.utc).date()
+    return partitions.add_months(partitions.month_start(today), -settings.TRACE_ARCHIVE_HORIZON_MONTHS)
+
+
+# ---------------------- ESCRITURA ---------------------- #
+def archivable_months(db: Session, cutoff: date) -> list[date]:
+    """Meses anteriores a cutoff con eventos cerrados en trace_events."""
+    lower = db.scalar(
+        select(TraceEvent.timestamp_entrada)
+        .where(TraceEvent.timestamp_entrada < partitions.month_range(cutoff)[0])
+        .order_by(TraceEvent.timestamp_entrada)
+        .limit(1)
+    )
+    months = []
+    month = partitions.month_start(lower.astimezone(timezone.utc).date()) if lower else cutoff
+    while month < cutoff:
+        start, end = partitions.month_range(month)
+        if db.scalar(select(exists().where(
+            TraceEvent.timestamp_entrada >= start,
+            TraceEvent.timestamp_entrada < end,
+            TraceEvent.timestamp_salida.isnot(None),
+        ))):
+            months.append(month)
+        month = partitions.add_months(month, 1)
+    return months
+
+
+def archive_month(db: Session, month: date) -> int:
+    """
+    Mueve los eventos cerrados del mes a un archivo Parquet y los borra de
+    trace_events. Si la tabla está particionada y el mes no tiene eventos
+    abiertos, se elimina la partición completa en lugar de borrar fila a fila.
+    Retorna los eventos archivados. No hace commit: el archivo solo cuenta
+    cuando la fila del manifiesto se confirma.
+    """
+    start, end = partitions.month_range(month)
+    in_month = (TraceEvent.timestamp_entrada >= start, TraceEvent.timestamp_entrada < end)
+
+    partition = partitions.partition_name(month)
+    conn = db.connection()
+    drop_partition = False
+    if partitions.is_partitioned(conn) and partition in partitions.existing_partitions(conn):
+        # Bloquea escrituras solo en ese mes, para que nada cambie entre leer y borrar
+        db.execute(text(f"LOCK TABLE {partition} IN EXCLUSIVE MODE"))
+        drop_partition = not db.scalar(
+            select(exists().where(*in_month, TraceEvent.timestamp_salida.is_(None)))
+        )
+
+    query = (
+        select(*_COLUMNS)
+        .outerjoin(Part, Part.id == TraceEvent.part_id)
+        .where(*in_month, TraceEvent.timestamp_salida.isnot(None))
+        .order_by(TraceEvent.part_id, TraceEvent.timestamp_entrada, TraceEvent.id)
+        .execution_options(yield_per=ROW_GROUP_SIZE)
+    )
+
+    folder = archive_dir() / f"month={month:%Y-%m}"
+    folder.mkdir(parents=True, exist_ok=True)
+    tmp = folder / f".tmp-{os.getpid()}-{time.time_ns()}.parquet"
+    ids: list[int] = []
+    try:
+        with pq.ParquetWriter(tmp, SCHEMA, compression="zstd") as writer:
+            for rows in db.execute(query).partitions():
+                columns = list(zip(*rows))
+                ids.extend(columns[0])
+                writer.write_batch(pa.record_batch(
+                    [pa.array(col, type=field.type) for col, field in zip(columns, SCHEMA)],
+                    schema=SCHEMA,
+                ))
+        if not ids:
+            tmp.unlink()
+            return 0
+        with open(tmp, "rb") as f:
+            os.fsync(f.fileno())
+        final = folder / f"events-{min(ids)}-{max(ids)}.parquet"
+        os.replace(tmp, final)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+    db.add(TraceArchiveFile(
+        month=month,
+        path=str(final.relative_to(archive_dir())),
+        rows=len(ids),
+        min_event_id=min(ids),
+        max_event_id=max(ids),
+    ))
+    if drop_partition:
+        db.execute(text(f"DROP TABLE {partition}"))
+    else:
+        id_list = bindparam("ids", type_=ARRAY(BigInteger))
+        for i in range(0, len(ids), ROW_GROUP_SIZE):
+            db.execute(
+                delete(TraceEvent)
+                .where(*in_month, TraceEvent.id == any_(id_list))
+                .execution_options(synchronize_session=False),
+                {"ids": ids[i:i + ROW_GROUP_SIZE]},
+            )
+    db.flush()
+    return len(ids)
+
+
+def remove_orphans(db: Session) -> list[Path]:
+    """Borra los archivos que no están en el manifiesto (escrituras interrumpidas)."""
+    root = archive_dir()
+    if not root.exists():
+        return []
+    known = set(db.scalars(select(TraceArchiveFile.path)))
+    removed = []
+    # Incluye los .tmp-* que dejó una escritura cortada
+    for path in root.glob("month=*/*.parquet"):
+        if str(path.relative_to(root)) not in known:
+            path.unlink()
+            removed.append(path)
+    return removed
+
+
+# ---------------------- LECTURA ---------------------- #
+def manifest_query(desde: date | None = None, hasta: date | None = None):
+    """Rutas de los archivos cuyo mes está entre desde y hasta (ambos incluidos)."""
+    query = select(TraceArchiveFile.path).order_by(TraceArchiveFile.month, TraceArchiveFile.id)
+    if desde:
+        query = query.where(TraceArchiveFile.month >= partitions.month_start(desde))
+    if hasta:
+        query = query.where(TraceArchiveFile.month <= partitions.month_start(hasta))
+    return query
+
+
+def read_tables(paths, columns: list[str], filters=None) -> Iterator[pa.Table]:
+    """Un pa.Table por archivo, leído con memory-map."""
+    root = archive_dir()
+    for path in paths:
+        yield pq.read_table(root / path, columns=columns, filters=filters, memory_map=True)
+
+
+def archived_tables(
+    db: Session,
+    columns: list[str],
+    desde: datetime | None = None,
+    hasta: datetime | None = None,
+    on: str = "timestamp_salida",
+) -> Iterator[pa.Table]:
+    """
+    Eventos archivados con la columna `on` en [desde, hasta).
+    Solo abre los meses que pueden contenerlos: los archivos van por mes de
+    entrada, así que para rangos de salida se usa la misma ventana que en
+    trace_events (partitions.entrada_window).
+    """
+    lookback = timedelta(days=settings.TRACE_EVENT_MAX_DURATION_DAYS if on == "timestamp_salida" else 0)
+    paths = db.scalars(manifest_query(
+        (desde - lookback).date() if desde else None,
+        (hasta - timedelta(microseconds=1)).date() if hasta else None,
+    )).all()
+    filters = []
+    if desde:
+        filters.append((on, ">=", desde))
+    if hasta:
+        filters.append((on, "<", hasta))
+    return read_tables(paths, columns, filters or None)
+
+
+def durations(table: pa.Table) -> pa.Array:
+    """Segundos entre timestamp_entrada y timestamp_salida de cada fila."""
+    micros = pc.cast(pc.subtract(table["timestamp_salida"], table["timestamp_entrada"]), pa.int64())
+    return pc.divide(pc.cast(micros, pa.float64()), 1_000_000.0)
+
+
+def may_have_archived_events(part: Part) -> bool:
+    """
+    Los eventos de una pieza no son anteriores a su creación, así que una pieza
+    creada después del horizonte no tiene nada archivado (sin consultar el manifiesto).
+    """
+    if part.fecha_creacion is None:
+        return True
+    return part.fecha_creacion < partitions.month_range(archive_cutoff())[0]
+
+
+def read_part_history(paths, part_id: int) -> list[ArchivedEvent]:
+    """Eventos archivados de una pieza, ordenados por entrada (código bloqueante)."""
+    events = []
+    for table in read_tables(paths, list(ArchivedEvent._fields), [("part_id", "=", part_id)]):
+        events.extend(ArchivedEvent(**row) for row in table.to_pylist())
+    events.sort(key=lambda e: (e.timestamp_entrada, e.id))
+    return events
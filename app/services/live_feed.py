@@ -0,0 +1,222 @@
+"""
+Canal de actualizaciones en vivo para dashboards (/live/events y /live/ws).
+
+En lugar de que cada pantalla consulte /metrics/parts-by-status,
+/metrics/throughput y /ai/anomalies, un solo ciclo por proceso calcula el
+estado y reparte el mismo mensaje a todos los suscriptores:
+
+- Al conectarse, el cliente recibe un "snapshot" con el estado completo.
+- Las escrituras en trace_events y parts (después del commit) marcan el estado
+  como sucio; en el siguiente tick (LIVE_TICK_SECONDS) se recalcula una vez y
+  se envía un "delta" con lo que cambió: conteos por status, piezas OK por
+  día de los últimos LIVE_THROUGHPUT_DAYS días y las anomalías nuevas. Varias
+  escrituras dentro del mismo tick salen en un solo mensaje.
+- Con varios workers, cada uno solo ve sus propias escrituras; por eso además
+  se recalcula cada LIVE_POLL_SECONDS mientras haya suscriptores.
+
+Un cliente que no consume (cola llena) no frena a los demás: se le descartan
+los mensajes pendientes y recibe un snapshot nuevo.
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple
+
+from sqlalchemy import func, select
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.serialization import dumps
+from app.db.session import SessionLocal
+from app.models.anomaly import Anomaly
+from app.models.part import Part
+from app.models.throughput_rollup import ThroughputRollup
+from app.schemas.ai import AnomalyOut
+from app.services.throughput_rollup import UTC_DAY, utc_midnight
+
+# Anomalías que se envían en el snapshot inicial y como máximo por delta
+ANOMALIES_LIMIT = 50
+
+
+class LiveMessage(NamedTuple):
+    seq: int
+    event: str   # "snapshot" o "delta"
+    data: str    # JSON, serializado una sola vez para todos los suscriptores
+
+
+class LiveState(NamedTuple):
+    parts_by_status: dict[str, int]
+    throughput: dict[str, int]
+    last_anomaly_id: int
+
+
+def _dumps(payload: dict) -> str:
+    return dumps(payload).decode()
+
+
+def _compute(last_anomaly_id: int | None) -> tuple[LiveState, list[dict]]:
+    """Estado actual y anomalías posteriores a last_anomaly_id (código bloqueante)."""
+    since = datetime.now(timezone.utc).date() - timedelta(days=settings.LIVE_THROUGHPUT_DAYS - 1)
+    db = SessionLocal()
+    try:
+        parts_by_status = dict(db.execute(select(Part.status, func.count(Part.id)).group_by(Part.status)).all())
+        throughput = {
+            str(d): int(n)
+            for d, n in db.execute(
+                select(UTC_DAY, func.sum(ThroughputRollup.ok_count))
+                .where(ThroughputRollup.bucket >= utc_midnight(since))
+                .group_by(UTC_DAY)
+            )
+        }
+        query = select(Anomaly)
+        if last_anomaly_id is None:
+            # Primer cálculo: las más recientes, en orden cronológico
+            rows = db.scalars(query.order_by(Anomaly.id.desc()).limit(ANOMALIES_LIMIT)).all()[::-1]
+        else:
+            rows = db.scalars(
+                query.where(Anomaly.id > last_anomaly_id).order_by(Anomaly.id).limit(ANOMALIES_LIMIT)
+            ).all()
+        anomalies = [AnomalyOut.model_validate(row).model_dump(mode="json") for row in rows]
+    finally:
+        db.close()
+
+    last_id = anomalies[-1]["id"] if anomalies else (last_anomaly_id or 0)
+    return LiveState(parts_by_status, throughput, last_id), anomalies
+
+
+def _changed(before: dict, after: dict) -> dict:
+    """Claves con valor distinto (las que desaparecen pasan a 0)."""
+    keys = before.keys() | after.keys()
+    return {k: after.get(k, 0) for k in sorted(keys, key=str) if before.get(k, 0) != after.get(k, 0)}
+
+
+class Subscriber:
+    """Cola acotada de mensajes de un cliente conectado."""
+
+    def __init__(self, feed: "LiveFeed"):
+        self.feed = feed
+        self.queue: asyncio.Queue[LiveMessage] = asyncio.Queue(maxsize=settings.LIVE_QUEUE_SIZE)
+
+    def offer(self, message: LiveMessage) -> None:
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Cliente lento: se descarta lo pendiente y se reenvía el estado completo
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(self.feed.snapshot_message())
+            self.feed.resyncs += 1
+
+    async def get(self) -> LiveMessage:
+        return await self.queue.get()
+
+
+class LiveFeed:
+    """Estado en vivo de este proceso y sus suscriptores (usar desde el event loop)."""
+
+    def __init__(self):
+        self._subscribers: set[Subscriber] = set()
+        self._state: LiveState | None = None
+        self._recent: list[dict] = []
+        self._dirty = False
+        self._computed_at = 0.0
+        self._seq = 0
+        self._task: asyncio.Task | None = None
+        self._lock = asyncio.Lock()
+        self.computations = 0
+        self.messages = 0
+        self.resyncs = 0
+        self.errors = 0
+
+    def notify(self) -> None:
+        """Hubo una escritura: recalcular en el próximo tick. Se puede llamar desde cualquier hilo."""
+        self._dirty = True
+
+    async def subscribe(self) -> Subscriber:
+        async with self._lock:
+            if self._state is None:
+                await self._recompute()
+        subscriber = Subscriber(self)
+        subscriber.offer(self.snapshot_message())
+        self._subscribers.add(subscriber)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="live-feed")
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self._subscribers.discard(subscriber)
+
+    def snapshot_message(self) -> LiveMessage:
+        state = self._state
+        return LiveMessage(self._seq, "snapshot", _dumps({
+            "type": "snapshot",
+            "seq": self._seq,
+            "parts_by_status": state.parts_by_status,
+            "throughput": [{"fecha": d, "piezas": n} for d, n in sorted(state.throughput.items())],
+            "anomalies": self._recent,
+        }))
+
+    async def _recompute(self) -> LiveMessage | None:
+        """Una sola consulta del estado para todos los suscriptores; retorna el delta o None."""
+        self._dirty = False
+        before = self._state
+        state, anomalies = await run_in_threadpool(_compute, before.last_anomaly_id if before else None)
+        self._state = state
+        self._computed_at = time.monotonic()
+        self._recent = (self._recent + anomalies)[-ANOMALIES_LIMIT:]
+        self.computations += 1
+        if before is None:
+            return None
+
+        parts_by_status = _changed(before.parts_by_status, state.parts_by_status)
+        throughput = _changed(before.throughput, state.throughput)
+        if not (parts_by_status or throughput or anomalies):
+            return None
+        self._seq += 1
+        return LiveMessage(self._seq, "delta", _dumps({
+            "type": "delta",
+            "seq": self._seq,
+            "parts_by_status": parts_by_status,
+            "throughput": [{"fecha": d, "piezas": n} for d, n in throughput.items()],
+            "anomalies": anomalies,
+        }))
+
+    async def _run(self) -> None:
+        """Ciclo de ticks: termina cuando no quedan suscriptores."""
+        try:
+            while self._subscribers:
+                await asyncio.sleep(settings.LIVE_TICK_SECONDS)
+                poll_due = time.monotonic() - self._computed_at >= settings.LIVE_POLL_SECONDS
+                if not (self._dirty or poll_due) or not self._subscribers:
+                    continue
+                try:
+                    async with self._lock:
+                        message = await self._recompute()
+                except Exception:
+                    # Error de BD: se reintenta en el próximo tick sin cortar las conexiones
+                    self._dirty = True
+                    self.errors += 1
+                    continue
+                if message is not None:
+                    self.messages += 1
+                    for subscriber in list(self._subscribers):
+                        subscriber.offer(message)
+        finally:
+            # Sin suscriptores el estado deja de seguirse; el próximo se recalcula
+            if not self._subscribers:
+                self._state = None
+                self._recent = []
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "running": self._task is not None and not self._task.done(),
+            "seq": self._seq,
+            "computations": self.computations,
+            "messages": self.messages,
+            "resyncs": self.resyncs,
+            "errors": self.errors,
+        }
+
+
+live_feed = LiveFeed()
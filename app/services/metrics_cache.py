@@ -0,0 +1,76 @@
+"""
+Caché de resultados de /metrics/* y /ai/anomalies.
+
+Cada endpoint tiene su TTL; las escrituras en trace_events, parts y stations
+invalidan los endpoints que dependen de esa tabla. La caché es por proceso:
+con varios workers, cada uno invalida la suya y el resto expira por TTL.
+"""
+import functools
+import inspect
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.services.live_feed import live_feed
+from app.services.trace_snapshot import trace_snapshot
+
+metrics_cache = TTLCache(maxsize=settings.METRICS_CACHE_MAX_ENTRIES)
+
+# Segundos que vive cada resultado
+TTL = {
+    "parts-by-status": 5,
+    "throughput": 30,
+    "station-cycle-time": 30,
+    "scrap-rate": 30,
+    "anomalies": 10,
+}
+
+# Endpoints afectados por las escrituras en cada tabla
+INVALIDATES = {
+    "trace_events": ("parts-by-status", "throughput", "station-cycle-time", "scrap-rate", "anomalies"),
+    "parts": ("parts-by-status", "scrap-rate", "anomalies"),
+    "stations": ("throughput", "station-cycle-time", "anomalies"),
+}
+
+
+def _normalize(value):
+    if isinstance(value, str):
+        return value.strip().upper()
+    return value
+
+
+def cached_endpoint(name: str, params: tuple = ()):
+    """
+    Decorador para endpoints de métricas: la clave es el nombre del endpoint
+    más los parámetros de consulta indicados (normalizados).
+    Funciona con endpoints def y async def.
+    Los errores (HTTPException) no se guardan.
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                key = (name, tuple(_normalize(kwargs.get(p)) for p in params))
+                found, value = metrics_cache.get(key)
+                if found:
+                    return value
+                generation = metrics_cache.generation(name)
+                value = await func(*args, **kwargs)
+                metrics_cache.set(key, value, TTL[name], generation)
+                return value
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (name, tuple(_normalize(kwargs.get(p)) for p in params))
+            return metrics_cache.get_or_compute(key, TTL[name], lambda: func(*args, **kwargs))
+        return wrapper
+    return decorator
+
+
+def invalidate_for(table: str) -> None:
+    """Invalida los endpoints que dependen de la tabla escrita (llamar después del commit)."""
+    metrics_cache.invalidate(*INVALIDATES[table])
+    if table == "trace_events":
+        trace_snapshot.mark_stale()
+    if table in ("trace_events", "parts"):
+        live_feed.notify()
@@ -0,0 +1,189 @@
+"""
+Motor de reglas de riesgo compartido por los routers trace_events y ai.
+
+Las reglas (umbrales, pesos, razones y cortes de nivel) se compilan una sola vez
+en tablas ordenadas; cada evaluación es una búsqueda binaria por factor.
+La misma tabla sirve para la evaluación escalar (bisect) y en lote (NumPy).
+"""
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+# ---------------------- DEFINICIÓN DE REGLAS ---------------------- #
+# Cada umbral se cumple cuando el valor es ESTRICTAMENTE mayor.
+# Para cada factor solo aplica el umbral más alto que se cumpla.
+DEFAULT_RULES = {
+    "tiempo_total": [
+        (900, 0.4, "Tiempo total elevado ({minutos} min > 15 min)"),
+        (600, 0.2, "Tiempo sobre promedio ({minutos} min > 10 min)"),
+    ],
+    "scrap_count": [
+        (0, 0.4, "Historial de SCRAP ({scrap_count} evento{plural_scrap})"),
+    ],
+    "retrabajo_count": [
+        (1, 0.2, "Múltiples retrabajos ({retrabajo_count} eventos)"),
+        (0, 0.1, "Un retrabajo registrado"),
+    ],
+    # Prefijo de estación (solo cuando se conoce la estación actual)
+    "estacion": ("INSPECCION", 0.1, "Se encuentra en inspección final"),
+    # Riesgo mínimo para cada nivel
+    "niveles": [(0.7, "ALTO"), (0.4, "MEDIO"), (0.0, "BAJO")],
+    "sin_riesgo": "Sin factores de riesgo detectados",
+    "max_riesgo": 1.0,
+}
+
+
+class RiskInputs:
+    """Valores agregados de una pieza que alimentan las reglas."""
+    __slots__ = ("tiempo_total", "scrap_count", "retrabajo_count", "estacion")
+
+    def __init__(
+        self,
+        tiempo_total: float = 0.0,
+        scrap_count: int = 0,
+        retrabajo_count: int = 0,
+        estacion: str | None = None,
+    ):
+        self.tiempo_total = tiempo_total
+        self.scrap_count = scrap_count
+        self.retrabajo_count = retrabajo_count
+        self.estacion = estacion
+
+
+class RiskResult:
+    """Resultado de evaluar las reglas sobre un RiskInputs."""
+    __slots__ = ("riesgo", "nivel", "razones")
+
+    def __init__(self, riesgo: float, nivel: str, razones: list[str]):
+        self.riesgo = riesgo
+        self.nivel = nivel
+        self.razones = razones
+
+
+class _Factor:
+    """Un factor compilado: umbrales ascendentes y tablas de peso/razón indexadas."""
+    __slots__ = ("name", "thresholds", "weights", "reasons", "np_thresholds", "np_weights")
+
+    def __init__(self, name: str, rules):
+        ordered = sorted(rules, key=lambda r: r[0])
+        self.name = name
+        self.thresholds = [r[0] for r in ordered]
+        # Índice k = número de umbrales superados; 0 significa que no aplica
+        self.weights = [0.0] + [r[1] for r in ordered]
+        self.reasons = [None] + [r[2] for r in ordered]
+        self.np_thresholds = np.asarray(self.thresholds, dtype=np.float64)
+        self.np_weights = np.asarray(self.weights, dtype=np.float64)
+
+
+class CompiledRules:
+    """Conjunto de reglas listo para evaluarse."""
+    __slots__ = (
+        "factors",
+        "station_prefix",
+        "station_weight",
+        "station_reason",
+        "level_cutoffs",
+        "level_names",
+        "np_level_cutoffs",
+        "np_level_names",
+        "no_risk_reason",
+        "max_riesgo",
+    )
+
+    def __init__(self, rules: dict):
+        self.factors = tuple(
+            _Factor(name, rules[name])
+            for name in ("tiempo_total", "scrap_count", "retrabajo_count")
+        )
+        self.station_prefix, self.station_weight, self.station_reason = rules["estacion"]
+
+        niveles = sorted(rules["niveles"], key=lambda n: n[0])
+        # El primer nivel es el de riesgo 0; los demás se alcanzan con riesgo >= corte
+        self.level_cutoffs = [n[0] for n in niveles[1:]]
+        self.level_names = [n[1] for n in niveles]
+        self.np_level_cutoffs = np.asarray(self.level_cutoffs, dtype=np.float64)
+        self.np_level_names = np.asarray(self.level_names)
+
+        self.no_risk_reason = rules["sin_riesgo"]
+        self.max_riesgo = rules["max_riesgo"]
+
+
+def compile_rules(rules: dict = DEFAULT_RULES) -> CompiledRules:
+    return CompiledRules(rules)
+
+
+RULES = compile_rules()
+
+
+# ---------------------- EVALUACIÓN ESCALAR ---------------------- #
+def evaluate(inputs: RiskInputs, rules: CompiledRules = RULES) -> RiskResult:
+    """Evalúa las reglas para una sola pieza."""
+    riesgo = 0.0
+    razones = []
+    context = None
+
+    for factor in rules.factors:
+        k = bisect_left(factor.thresholds, getattr(inputs, factor.name))
+        if k:
+            riesgo += factor.weights[k]
+            if context is None:
+                context = _reason_context(inputs)
+            razones.append(factor.reasons[k].format(**context))
+
+    if inputs.estacion and inputs.estacion.strip().upper().startswith(rules.station_prefix):
+        riesgo += rules.station_weight
+        razones.append(rules.station_reason)
+
+    riesgo = round(min(riesgo, rules.max_riesgo), 2)
+    nivel = rules.level_names[bisect_right(rules.level_cutoffs, riesgo)]
+
+    if not razones:
+        razones.append(rules.no_risk_reason)
+
+    return RiskResult(riesgo, nivel, razones)
+
+
+def _reason_context(inputs: RiskInputs) -> dict:
+    return {
+        "minutos": round(inputs.tiempo_total / 60, 1),
+        "scrap_count": inputs.scrap_count,
+        "plural_scrap": "s" if inputs.scrap_count > 1 else "",
+        "retrabajo_count": inputs.retrabajo_count,
+    }
+
+
+# ---------------------- EVALUACIÓN EN LOTE ---------------------- #
+def evaluate_batch(
+    tiempo_total,
+    scrap_count,
+    retrabajo_count,
+    estacion=None,
+    rules: CompiledRules = RULES,
+):
+    """
+    Evalúa las reglas para muchas piezas a la vez.
+    Recibe arreglos del mismo tamaño y retorna (riesgo, nivel) como arreglos NumPy.
+    No genera razones de texto.
+    """
+    values = {
+        "tiempo_total": np.asarray(tiempo_total, dtype=np.float64),
+        "scrap_count": np.asarray(scrap_count, dtype=np.float64),
+        "retrabajo_count": np.asarray(retrabajo_count, dtype=np.float64),
+    }
+
+    riesgo = np.zeros(values["tiempo_total"].shape, dtype=np.float64)
+    for factor in rules.factors:
+        k = np.searchsorted(factor.np_thresholds, values[factor.name], side="left")
+        riesgo += factor.np_weights[k]
+
+    if estacion is not None:
+        estacion = np.char.upper(np.char.strip(np.asarray(estacion, dtype=str)))
+        riesgo += np.where(
+            np.char.startswith(estacion, rules.station_prefix), rules.station_weight, 0.0
+        )
+
+    riesgo = np.round(np.minimum(riesgo, rules.max_riesgo), 2)
+    nivel = rules.np_level_names[
+        np.searchsorted(rules.np_level_cutoffs, riesgo, side="right")
+    ]
+    return riesgo, nivel
@@ -0,0 +1,219 @@
+"""
+Mantenimiento incremental de la tabla part_risk_state.
+"""
+from collections import defaultdict
+
+import pyarrow as pa
+import pyarrow.compute as pc
+from sqlalchemy import Column, Float, Integer, MetaData, Table, func, select, delete, insert, or_, text, union_all
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.models.part import Part
+from app.models.part_risk_state import PartRiskState
+from app.models.trace_event import TraceEvent
+from app.services import event_archive
+
+# Columnas acumulables, en el mismo orden que devuelve _contribution
+_COUNTERS = (
+    "tiempo_total_segundos",
+    "eventos_con_tiempo",
+    "scrap_count",
+    "retrabajo_count",
+    "eventos_totales",
+)
+
+# Totales por pieza de los eventos archivados (tabla temporal por transacción)
+_archived = Table(
+    "archived_part_totals",
+    MetaData(),
+    Column("part_id", Integer),
+    Column("tiempo_total_segundos", Float),
+    *[Column(name, Integer) for name in _COUNTERS[1:]],
+)
+
+
+def _contribution(snapshot) -> tuple:
+    """Aporte de un evento a los totales de su pieza."""
+    if snapshot is None:
+        return (0.0, 0, 0, 0, 0)
+    duration = snapshot.duration
+    return (
+        duration or 0.0,
+        1 if duration is not None else 0,
+        1 if snapshot.resultado == "SCRAP" else 0,
+        1 if snapshot.resultado == "RETRABAJO" else 0,
+        1,
+    )
+
+
+class Totals:
+    """
+    Acumula los totales de una pieza recorriendo sus eventos, con la misma
+    definición que part_risk_state (para quien ya tiene los eventos cargados).
+    """
+
+    __slots__ = ("values",)
+
+    def __init__(self):
+        self.values = [0.0, 0, 0, 0, 0]
+
+    def add(self, snapshot) -> None:
+        for i, value in enumerate(_contribution(snapshot)):
+            self.values[i] += value
+
+    def as_dict(self) -> dict:
+        return dict(zip(_COUNTERS, self.values))
+
+
+def apply_changes(db: Session, changes) -> dict[int, dict]:
+    """
+    Suma la diferencia (después - antes) de cada evento a los totales de su pieza
+    con un único INSERT ... ON CONFLICT DO UPDATE. Retorna los totales ya
+    actualizados de las piezas tocadas ({part_id: totales}, vía RETURNING),
+    para calcular el risk score sin volver a leer part_risk_state.
+    """
+    deltas = defaultdict(lambda: [0.0, 0, 0, 0, 0])
+    for old, new in changes:
+        acc = deltas[new.part_id]
+        for i, (before, after) in enumerate(zip(_contribution(old), _contribution(new))):
+            acc[i] += after - before
+
+    values = [
+        {"part_id": part_id, **dict(zip(_COUNTERS, acc))}
+        for part_id, acc in deltas.items()
+        if any(acc)
+    ]
+    if not values:
+        return {}
+
+    stmt = pg_insert(PartRiskState).values(values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[PartRiskState.part_id],
+        set_={
+            **{
+                name: getattr(PartRiskState, name) + getattr(stmt.excluded, name)
+                for name in _COUNTERS
+            },
+            "updated_at": func.now(),
+        },
+    ).returning(PartRiskState.part_id, *(getattr(PartRiskState, name) for name in _COUNTERS))
+    return {row[0]: dict(zip(_COUNTERS, row[1:])) for row in db.execute(stmt)}
+
+
+def _aggregate_from_events():
+    """SELECT que recalcula los totales de cada pieza desde trace_events."""
+    duration = func.extract(
+        "epoch",
+        TraceEvent.timestamp_salida - TraceEvent.timestamp_entrada,
+    )
+    return select(
+        TraceEvent.part_id.label("part_id"),
+        func.coalesce(func.sum(duration), 0).label("tiempo_total_segundos"),
+        func.count(duration).label("eventos_con_tiempo"),
+        func.count(TraceEvent.id).filter(TraceEvent.resultado == "SCRAP").label("scrap_count"),
+        func.count(TraceEvent.id).filter(TraceEvent.resultado == "RETRABAJO").label("retrabajo_count"),
+        func.count(TraceEvent.id).label("eventos_totales"),
+    ).group_by(TraceEvent.part_id)
+
+
+def _load_archived_totals(db: Session) -> bool:
+    """
+    Carga en una tabla temporal (ON COMMIT DROP) los totales por pieza de los
+    eventos archivados. Retorna False si no hay archivo.
+    """
+    paths = db.scalars(event_archive.manifest_query()).all()
+    if not paths:
+        return False
+
+    db.execute(text(f"DROP TABLE IF EXISTS {_archived.name}"))
+    db.execute(text(
+        f"CREATE TEMP TABLE {_archived.name} (part_id integer, tiempo_total_segundos float8, "
+        f"{', '.join(f'{name} integer' for name in _COUNTERS[1:])}) ON COMMIT DROP"
+    ))
+    columns = ["part_id", "resultado", "timestamp_entrada", "timestamp_salida"]
+    cursor = db.connection().connection.driver_connection.cursor()
+    with cursor.copy(f"COPY {_archived.name} (part_id, {', '.join(_COUNTERS)}) FROM STDIN") as copy:
+        for table in event_archive.read_tables(paths, columns):
+            table = pa.table({
+                "part_id": table["part_id"],
+                "segundos": event_archive.durations(table),
+                "scrap": pc.cast(pc.equal(table["resultado"], "SCRAP"), pa.int64()),
+                "retrabajo": pc.cast(pc.equal(table["resultado"], "RETRABAJO"), pa.int64()),
+            })
+            grouped = table.group_by("part_id").aggregate([
+                ("segundos", "sum"),
+                ("segundos", "count"),
+                ("scrap", "sum"),
+                ("retrabajo", "sum"),
+                ("part_id", "count"),
+            ])
+            for row in zip(*(grouped[name].to_pylist() for name in (
+                "part_id", "segundos_sum", "segundos_count", "scrap_sum", "retrabajo_sum", "part_id_count",
+            ))):
+                copy.write_row(row)
+    return True
+
+
+def _aggregate(db: Session):
+    """
+    Totales de cada pieza desde trace_events más el archivo (si lo hay).
+    Las piezas borradas después de archivar se descartan.
+    """
+    if not _load_archived_totals(db):
+        return _aggregate_from_events()
+
+    archived = select(_archived).where(_archived.c.part_id.in_(select(Part.id)))
+    both = union_all(_aggregate_from_events(), archived).subquery()
+    return select(
+        both.c.part_id,
+        *[func.sum(getattr(both.c, name)).label(name) for name in _COUNTERS],
+    ).group_by(both.c.part_id)
+
+
+def rebuild(db: Session) -> int:
+    """
+    Recalcula part_risk_state completo desde trace_events y el archivo.
+    Retorna el número de piezas escritas. No hace commit.
+    """
+    # Bloquea las escrituras incrementales hasta el commit para no perder deltas
+    db.execute(text("LOCK TABLE part_risk_state IN EXCLUSIVE MODE"))
+    db.execute(delete(PartRiskState))
+    db.execute(
+        insert(PartRiskState).from_select(
+            ["part_id", *_COUNTERS],
+            _aggregate(db),
+        )
+    )
+    return db.scalar(select(func.count()).select_from(PartRiskState))
+
+
+def find_inconsistencies(db: Session, limit: int = 100) -> list[dict]:
+    """
+    Compara part_risk_state contra un recálculo desde trace_events y el archivo.
+    Retorna las piezas cuyos totales no coinciden.
+    """
+    agg = _aggregate(db).subquery()
+    state = PartRiskState.__table__
+
+    mismatch = [
+        func.abs(
+            func.coalesce(agg.c.tiempo_total_segundos, 0)
+            - func.coalesce(state.c.tiempo_total_segundos, 0)
+        ) > 0.001
+    ] + [
+        func.coalesce(getattr(agg.c, name), 0) != func.coalesce(getattr(state.c, name), 0)
+        for name in _COUNTERS[1:]
+    ]
+
+    rows = db.execute(
+        select(
+            func.coalesce(agg.c.part_id, state.c.part_id).label("part_id"),
+            *[getattr(agg.c, name).label(f"esperado_{name}") for name in _COUNTERS],
+            *[getattr(state.c, name).label(f"actual_{name}") for name in _COUNTERS],
+        )
+        .select_from(agg.join(state, agg.c.part_id == state.c.part_id, full=True))
+        .where(or_(*mismatch))
+        .limit(limit)
+    ).mappings().all()
+    return [dict(r) for r in rows]
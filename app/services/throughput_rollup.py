@@ -0,0 +1,146 @@
+"""
+Mantenimiento incremental de la tabla throughput_rollup.
+"""
+from collections import Counter
+from datetime import date, datetime, time, timezone
+
+import pyarrow.compute as pc
+from sqlalchemy import func, select, delete, insert, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.db import partitions
+from app.models.part import Part
+from app.models.station import Station
+from app.models.throughput_rollup import ThroughputRollup
+from app.models.trace_event import TraceEvent
+from app.services import event_archive
+
+# Filas por INSERT al sumar lo archivado
+ARCHIVE_UPSERT_CHUNK = 5000
+
+# Día UTC de cada hora, sin depender del timezone de la sesión: el mismo corte
+# que usan los sketches de ciclo y la copia en memoria de trace_events
+UTC_DAY = func.date(func.timezone("UTC", ThroughputRollup.bucket))
+
+
+def utc_midnight(day: date) -> datetime:
+    return datetime.combine(day, time.min, tzinfo=timezone.utc)
+
+
+def _bucket(snapshot) -> tuple | None:
+    """Clave (hora, estación, tipo) a la que aporta el evento, o None si no aporta."""
+    if snapshot is None or snapshot.resultado != "OK" or snapshot.timestamp_salida is None:
+        return None
+    hour = snapshot.timestamp_salida.replace(minute=0, second=0, microsecond=0)
+    return (hour, snapshot.station_id, snapshot.tipo_pieza)
+
+
+def apply_changes(db: Session, changes) -> None:
+    """
+    Suma +1/-1 a las horas afectadas por cada cambio (antes, después)
+    con un único INSERT ... ON CONFLICT DO UPDATE.
+    """
+    deltas = Counter()
+    for old, new in changes:
+        before, after = _bucket(old), _bucket(new)
+        if before == after:
+            continue
+        if before:
+            deltas[before] -= 1
+        if after:
+            deltas[after] += 1
+
+    values = [
+        {"bucket": hour, "station_id": station_id, "tipo_pieza": tipo, "ok_count": delta}
+        for (hour, station_id, tipo), delta in deltas.items()
+        if delta
+    ]
+    if not values:
+        return
+
+    _upsert_add(db, values)
+
+
+def _upsert_add(db: Session, values: list[dict]) -> None:
+    """INSERT ... ON CONFLICT DO UPDATE que suma ok_count a las horas existentes."""
+    stmt = pg_insert(ThroughputRollup).values(values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[
+            ThroughputRollup.bucket,
+            ThroughputRollup.station_id,
+            ThroughputRollup.tipo_pieza,
+        ],
+        set_={"ok_count": ThroughputRollup.ok_count + stmt.excluded.ok_count},
+    )
+    db.execute(stmt)
+
+
+def rebuild(db: Session, desde: datetime | None = None, hasta: datetime | None = None) -> int:
+    """
+    Recalcula throughput_rollup desde trace_events, completo o solo en [desde, hasta).
+    Retorna el número de filas escritas. No hace commit.
+    """
+    # Bloquea las escrituras incrementales hasta el commit para no perder deltas
+    db.execute(text("LOCK TABLE throughput_rollup IN EXCLUSIVE MODE"))
+
+    hour = func.date_trunc("hour", TraceEvent.timestamp_salida)
+    source = (
+        select(
+            hour.label("bucket"),
+            TraceEvent.station_id,
+            Part.tipo_pieza,
+            func.count(TraceEvent.id).label("ok_count"),
+        )
+        .join(Part, Part.id == TraceEvent.part_id)
+        .where(TraceEvent.resultado == "OK")
+        .where(TraceEvent.timestamp_salida.isnot(None))
+        .group_by(hour, TraceEvent.station_id, Part.tipo_pieza)
+    )
+    cleanup = delete(ThroughputRollup)
+    if desde:
+        source = source.where(TraceEvent.timestamp_salida >= desde)
+        cleanup = cleanup.where(ThroughputRollup.bucket >= desde)
+    if hasta:
+        source = source.where(TraceEvent.timestamp_salida < hasta)
+        cleanup = cleanup.where(ThroughputRollup.bucket < hasta)
+    # Rango equivalente sobre la clave de partición, para leer solo esos meses
+    source = source.where(*partitions.entrada_window(desde, hasta))
+
+    db.execute(cleanup)
+    db.execute(
+        insert(ThroughputRollup).from_select(
+            ["bucket", "station_id", "tipo_pieza", "ok_count"],
+            source,
+        )
+    )
+    _add_archived(db, desde, hasta)
+
+    count = select(func.count()).select_from(ThroughputRollup)
+    if desde:
+        count = count.where(ThroughputRollup.bucket >= desde)
+    if hasta:
+        count = count.where(ThroughputRollup.bucket < hasta)
+    return db.scalar(count)
+
+
+def _add_archived(db: Session, desde: datetime | None, hasta: datetime | None) -> None:
+    """Suma a throughput_rollup los eventos OK del archivo Parquet en [desde, hasta)."""
+    stations = set(db.scalars(select(Station.id)))
+    deltas = Counter()
+    columns = ["timestamp_salida", "station_id", "tipo_pieza", "resultado"]
+    for table in event_archive.archived_tables(db, columns, desde, hasta):
+        table = table.filter(pc.equal(table["resultado"], "OK"))
+        table = table.append_column("bucket", pc.floor_temporal(table["timestamp_salida"], unit="hour"))
+        grouped = table.group_by(["bucket", "station_id", "tipo_pieza"]).aggregate([("resultado", "count")])
+        for row in grouped.to_pylist():
+            # Estaciones borradas después de archivar no tienen fila posible (FK)
+            if row["station_id"] in stations and row["tipo_pieza"] is not None:
+                deltas[(row["bucket"], row["station_id"], row["tipo_pieza"])] += row["resultado_count"]
+
+    values = [
+        {"bucket": hour, "station_id": station_id, "tipo_pieza": tipo, "ok_count": count}
+        for (hour, station_id, tipo), count in deltas.items()
+    ]
+    for i in range(0, len(values), ARCHIVE_UPSERT_CHUNK):
+        _upsert_add(db, values[i:i + ARCHIVE_UPSERT_CHUNK])
@@ -0,0 +1,118 @@
+"""
+Punto único donde se mantienen los agregados derivados de trace_events.
+
+Los routers toman una foto del evento antes y después de modificarlo y
+llaman a record_event_changes dentro de la misma transacción, antes del commit.
+"""
+from datetime import datetime, timezone
+from typing import Iterable, NamedTuple
+
+from sqlalchemy.orm import Session
+
+from app.models.part import Part
+from app.services import anomaly_detector, change_feed, cycle_sketches, risk_state, throughput_rollup
+
+
+class EventSnapshot(NamedTuple):
+    """Valores de un TraceEvent que afectan a los agregados."""
+    part_id: int
+    station_id: int
+    timestamp_entrada: datetime | None
+    timestamp_salida: datetime | None
+    resultado: str | None
+    # Se completa desde parts si el llamador no lo conoce
+    tipo_pieza: str | None = None
+    event_id: int | None = None
+
+    @classmethod
+    def from_event(cls, event, tipo_pieza: str | None = None) -> "EventSnapshot":
+        return cls(
+            part_id=event.part_id,
+            station_id=event.station_id,
+            timestamp_entrada=_as_utc(event.timestamp_entrada),
+            timestamp_salida=_as_utc(event.timestamp_salida),
+            resultado=event.resultado,
+            tipo_pieza=tipo_pieza,
+            event_id=event.id,
+        )
+
+    @classmethod
+    def from_mapping(cls, values: dict, tipo_pieza: str | None = None) -> "EventSnapshot":
+        return cls(
+            part_id=values["part_id"],
+            station_id=values["station_id"],
+            timestamp_entrada=_as_utc(values.get("timestamp_entrada")),
+            timestamp_salida=_as_utc(values.get("timestamp_salida")),
+            resultado=values.get("resultado"),
+            tipo_pieza=tipo_pieza,
+            event_id=values.get("id"),
+        )
+
+    @property
+    def duration(self) -> float | None:
+        """Segundos entre entrada y salida, o None si falta alguno."""
+        if self.timestamp_entrada is None or self.timestamp_salida is None:
+            return None
+        return (self.timestamp_salida - self.timestamp_entrada).total_seconds()
+
+
+def _as_utc(value: datetime | None) -> datetime | None:
+    # datetime.utcnow() llega sin zona horaria; la BD devuelve timestamps con zona
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _with_tipo_pieza(db: Session, changes: list) -> list:
+    """Completa tipo_pieza de las fotos que no lo traen, con una sola consulta."""
+    missing = {
+        snap.part_id
+        for change in changes
+        for snap in change
+        if snap is not None and snap.tipo_pieza is None
+    }
+    if not missing:
+        return changes
+    tipos = dict(db.query(Part.id, Part.tipo_pieza).filter(Part.id.in_(missing)))
+
+    def fill(snap):
+        if snap is None or snap.tipo_pieza is not None:
+            return snap
+        return snap._replace(tipo_pieza=tipos.get(snap.part_id))
+
+    return [(fill(old), fill(new)) for old, new in changes]
+
+
+def record_event_changes(
+    db: Session,
+    changes: Iterable[tuple[EventSnapshot | None, EventSnapshot]],
+) -> dict[int, dict]:
+    """
+    Aplica una lista de cambios (antes, después) a los agregados.
+    antes es None cuando el evento se acaba de insertar.
+    Retorna los totales de part_risk_state ya actualizados ({part_id: totales})
+    de las piezas cuyo total cambió.
+    No hace commit: el llamador controla la transacción.
+    """
+    changes = list(changes)
+    if not changes:
+        return {}
+    changes = _with_tipo_pieza(db, changes)
+    risk_totals = risk_state.apply_changes(db, changes)
+    throughput_rollup.apply_changes(db, changes)
+    cycle_sketches.apply_changes(db, changes)
+    anomaly_detector.apply_changes(db, changes)
+    # Se escribe al hacer commit (ver change_feed)
+    change_feed.queue_event_changes(db, changes)
+    return risk_totals
+
+
+def record_event_change(
+    db: Session,
+    old: EventSnapshot | None,
+    new: EventSnapshot,
+) -> dict[int, dict]:
+    """Atajo para un solo evento."""
+    return record_event_changes(db, [(old, new)])
@@ -0,0 +1,320 @@
+"""
+Copia columnar de trace_events en memoria (NumPy), por proceso.
+
+Guarda las columnas que usan los endpoints de métricas (id, part_id,
+station_id, entrada/salida en segundos epoch y el resultado como código) y
+responde throughput y tiempos de ciclo con operaciones vectorizadas, sin ir a
+Postgres. Se activa con METRICS_SOURCE=snapshot; por defecto las métricas
+siguen leyendo las tablas agregadas.
+
+Carga completa al primer uso (trace_events más el archivo Parquet, en una
+transacción REPEATABLE READ) y luego refresco incremental cada
+TRACE_SNAPSHOT_REFRESH_SECONDS:
+- filas nuevas: id mayor que la marca de agua (el id más alto visto), menos
+  ID_OVERLAP para no perder inserciones que hicieron commit fuera de orden;
+- filas abiertas: se releen por id, porque cerrar un evento es un UPDATE.
+Los eventos cerrados no cambian y la API no los borra (archivarlos no los
+quita de la copia); un borrado hecho por fuera se refleja en la recarga
+completa, cada TRACE_SNAPSHOT_FULL_RELOAD_SECONDS.
+
+Cada versión es inmutable (Columns): un refresco arma arreglos nuevos y los
+publica de una vez, así que las lecturas concurrentes no necesitan lock.
+"""
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import NamedTuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from sqlalchemy import BigInteger, Float, any_, bindparam, case, cast, func, select
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from app.core.config import settings
+from app.db.session import engine
+from app.models.trace_event import TraceEvent
+from app.services import event_archive
+
+# Código de cada resultado en la columna resultado (0 = sin resultado)
+RESULTADOS = ("EN_PROCESO", "OK", "SCRAP", "RETRABAJO")
+OK = RESULTADOS.index("OK") + 1
+
+# Ids por debajo de la marca de agua que se vuelven a pedir en cada refresco
+ID_OVERLAP = 10_000
+
+# Filas por lectura del cursor en la carga completa
+LOAD_CHUNK_SIZE = 100_000
+
+QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+_EPOCH = date(1970, 1, 1)
+_DAY = 86_400.0
+
+_QUERY = select(
+    TraceEvent.id,
+    TraceEvent.part_id,
+    TraceEvent.station_id,
+    cast(func.extract("epoch", TraceEvent.timestamp_entrada), Float),
+    cast(func.extract("epoch", TraceEvent.timestamp_salida), Float),
+    case({r: i for i, r in enumerate(RESULTADOS, 1)}, value=TraceEvent.resultado, else_=0),
+)
+
+
+class Columns(NamedTuple):
+    """Una versión de la copia: arreglos paralelos ordenados por id."""
+    id: np.ndarray          # int64
+    part_id: np.ndarray     # int64
+    station_id: np.ndarray  # int32
+    entrada: np.ndarray     # float64, segundos epoch
+    salida: np.ndarray      # float64, NaN si el evento sigue abierto
+    resultado: np.ndarray   # int8, índice en RESULTADOS + 1
+
+    @property
+    def nbytes(self) -> int:
+        return sum(col.nbytes for col in self)
+
+    def take(self, index) -> "Columns":
+        return Columns(*(col[index] for col in self))
+
+
+_DTYPES = (np.int64, np.int64, np.int32, np.float64, np.float64, np.int8)
+
+
+def _from_rows(rows) -> Columns:
+    if not rows:
+        return Columns(*(np.empty(0, dtype=dtype) for dtype in _DTYPES))
+    # None (salida abierta) pasa a NaN al convertir a float64
+    return Columns(*(np.array(col, dtype=dtype) for col, dtype in zip(zip(*rows), _DTYPES)))
+
+
+def _from_archive(table: pa.Table) -> Columns:
+    def seconds(column):
+        return pc.divide(pc.cast(pc.cast(table[column], pa.int64()), pa.float64()), 1_000_000.0)
+
+    codes = pc.add(pc.index_in(table["resultado"], value_set=pa.array(RESULTADOS)), 1)
+    return Columns(
+        table["id"].to_numpy(),
+        table["part_id"].to_numpy(),
+        table["station_id"].to_numpy().astype(np.int32),
+        seconds("timestamp_entrada").to_numpy(),
+        seconds("timestamp_salida").to_numpy(zero_copy_only=False),
+        pc.fill_null(codes, 0).to_numpy().astype(np.int8),
+    )
+
+
+def _concat(parts: list[Columns]) -> Columns:
+    """Une versiones y deja el resultado ordenado por id."""
+    merged = Columns(*(
+        np.concatenate([getattr(p, name) for p in parts]).astype(dtype, copy=False)
+        for name, dtype in zip(Columns._fields, _DTYPES)
+    ))
+    if merged.id.size > 1 and np.any(merged.id[1:] < merged.id[:-1]):
+        merged = merged.take(np.argsort(merged.id, kind="stable"))
+    return merged
+
+
+def _by_ids(conn, ids: np.ndarray) -> Columns:
+    if not ids.size:
+        return _from_rows([])
+    return _from_rows(conn.execute(
+        _QUERY.where(TraceEvent.id == any_(bindparam("ids", type_=ARRAY(BigInteger)))),
+        {"ids": ids.tolist()},
+    ).all())
+
+
+def _contains(sorted_ids: np.ndarray, ids: np.ndarray) -> np.ndarray:
+    """Máscara de los ids que están en sorted_ids (ordenado)."""
+    if not sorted_ids.size:
+        return np.zeros(ids.size, dtype=bool)
+    positions = np.searchsorted(sorted_ids, ids).clip(max=sorted_ids.size - 1)
+    return sorted_ids[positions] == ids
+
+
+def _epoch(day: date) -> float:
+    return (day - _EPOCH).days * _DAY
+
+
+class TraceSnapshot:
+    """Copia en memoria con refresco perezoso: se actualiza al leerla si está vieja."""
+
+    def __init__(self):
+        self._columns: Columns | None = None
+        self._lock = threading.Lock()
+        self._watermark = 0
+        self._stale = False
+        self._loaded_at = 0.0
+        self._refreshed_at = 0.0
+        self._refreshed_wall: datetime | None = None
+        self.loads = 0
+        self.refreshes = 0
+        self.last_load_seconds = 0.0
+        self.last_refresh_seconds = 0.0
+        self.last_refresh_rows = 0
+
+    # ---------------------- CICLO DE VIDA ---------------------- #
+    def mark_stale(self) -> None:
+        """Hubo escrituras en este proceso: la siguiente lectura refresca antes de responder."""
+        self._stale = True
+
+    def columns(self) -> Columns:
+        """
+        Versión actual, refrescada si está vieja. Si otro hilo ya está
+        refrescando, devuelve la versión anterior en vez de esperar (salvo que
+        no haya ninguna o que este proceso haya escrito desde el último refresco).
+        """
+        columns = self._columns
+        now = time.monotonic()
+        due = (
+            self._stale
+            or now - self._refreshed_at >= settings.TRACE_SNAPSHOT_REFRESH_SECONDS
+            or now - self._loaded_at >= settings.TRACE_SNAPSHOT_FULL_RELOAD_SECONDS
+        )
+        if columns is not None and not due:
+            return columns
+        if not self._lock.acquire(blocking=columns is None or self._stale):
+            return columns
+        try:
+            now = time.monotonic()
+            if (
+                self._columns is None
+                or now - self._loaded_at >= settings.TRACE_SNAPSHOT_FULL_RELOAD_SECONDS
+            ):
+                self._load()
+            elif self._stale or now - self._refreshed_at >= settings.TRACE_SNAPSHOT_REFRESH_SECONDS:
+                self._refresh()
+            return self._columns
+        finally:
+            self._lock.release()
+
+    def _load(self) -> None:
+        start = time.perf_counter()
+        self._stale = False
+        parts = []
+        # Misma foto para trace_events y el manifiesto: un mes que se archiva
+        # mientras tanto no aparece dos veces ni se pierde
+        with engine.connect().execution_options(isolation_level="REPEATABLE READ") as conn:
+            result = conn.execution_options(yield_per=LOAD_CHUNK_SIZE).execute(_QUERY)
+            for rows in result.partitions():
+                parts.append(_from_rows(rows))
+            paths = conn.scalars(event_archive.manifest_query()).all()
+        columns = ["id", "part_id", "station_id", "timestamp_entrada", "timestamp_salida", "resultado"]
+        for table in event_archive.read_tables(paths, columns):
+            parts.append(_from_archive(table))
+
+        merged = _concat(parts or [_from_rows([])])
+        self._publish(merged)
+        self._loaded_at = self._refreshed_at
+        self.loads += 1
+        self.last_load_seconds = time.perf_counter() - start
+
+    def _refresh(self) -> None:
+        start = time.perf_counter()
+        self._stale = False
+        current = self._columns
+        open_ids = current.id[np.isnan(current.salida)]
+        with engine.connect() as conn:
+            # Primero solo los ids recientes; las filas completas, solo de los que faltan
+            recent = np.array(conn.scalars(
+                select(TraceEvent.id).where(TraceEvent.id > self._watermark - ID_OVERLAP)
+            ).all(), dtype=np.int64)
+            fresh = _by_ids(conn, recent[~_contains(current.id, recent)])
+            # Eventos abiertos: se reemplazan por su versión actual (los que ya no
+            # están se borraron). El resto de las filas vistas está cerrado y no cambia.
+            reopened = _by_ids(conn, open_ids)
+
+        keep = ~_contains(open_ids, current.id) if open_ids.size else np.ones(current.id.size, dtype=bool)
+        closed = int(np.count_nonzero(~np.isnan(reopened.salida)))
+        deleted = open_ids.size - reopened.id.size
+        if fresh.id.size or closed or deleted:
+            self._publish(_concat([current.take(keep), reopened, fresh]))
+        else:
+            self._refreshed_at = time.monotonic()
+            self._refreshed_wall = datetime.now(timezone.utc)
+        if recent.size:
+            self._watermark = max(self._watermark, int(recent.max()))
+        self.refreshes += 1
+        self.last_refresh_rows = fresh.id.size + closed + deleted
+        self.last_refresh_seconds = time.perf_counter() - start
+
+    def _publish(self, columns: Columns) -> None:
+        for col in columns:
+            col.setflags(write=False)
+        if columns.id.size:
+            self._watermark = max(self._watermark, int(columns.id[-1]))
+        self._columns = columns
+        self._refreshed_at = time.monotonic()
+        self._refreshed_wall = datetime.now(timezone.utc)
+
+    def stats(self) -> dict:
+        columns = self._columns
+        return {
+            "loaded": columns is not None,
+            "rows": int(columns.id.size) if columns is not None else 0,
+            "open_events": int(np.isnan(columns.salida).sum()) if columns is not None else 0,
+            "memory_bytes": columns.nbytes if columns is not None else 0,
+            "watermark_id": self._watermark,
+            "refreshed_at": self._refreshed_wall.isoformat() if self._refreshed_wall else None,
+            "lag_seconds": round(time.monotonic() - self._refreshed_at, 3) if columns is not None else None,
+            "loads": self.loads,
+            "last_load_seconds": round(self.last_load_seconds, 3),
+            "refreshes": self.refreshes,
+            "last_refresh_seconds": round(self.last_refresh_seconds, 4),
+            "last_refresh_rows": self.last_refresh_rows,
+        }
+
+    # ---------------------- CONSULTAS ---------------------- #
+    def throughput(self, from_date: date, to_date: date) -> list[dict]:
+        """Piezas OK por día UTC de salida entre from_date y to_date (incluidos)."""
+        c = self.columns()
+        mask = (c.resultado == OK) & (c.salida >= _epoch(from_date)) & (c.salida < _epoch(to_date) + _DAY)
+        days, counts = np.unique(np.floor(c.salida[mask] / _DAY).astype(np.int64), return_counts=True)
+        return [
+            {"fecha": str(_EPOCH + timedelta(days=int(day))), "piezas": int(count)}
+            for day, count in zip(days, counts)
+        ]
+
+    def station_cycle_time(
+        self,
+        desde: date | None = None,
+        hasta: date | None = None,
+        station_id: int | None = None,
+    ) -> list[dict]:
+        """
+        Conteo, promedio y cuantiles exactos del tiempo de ciclo por estación,
+        para los eventos cerrados con salida en los días UTC [desde, hasta].
+        """
+        c = self.columns()
+        mask = ~np.isnan(c.salida)
+        if desde:
+            mask &= c.salida >= _epoch(desde)
+        if hasta:
+            mask &= c.salida < _epoch(hasta) + _DAY
+        if station_id is not None:
+            mask &= c.station_id == station_id
+
+        stations = c.station_id[mask]
+        durations = c.salida[mask] - c.entrada[mask]
+        # Ordenado por estación y, dentro de cada una, por duración
+        order = np.lexsort((durations, stations))
+        stations, durations = stations[order], durations[order]
+        starts = np.flatnonzero(np.r_[True, stations[1:] != stations[:-1]]) if stations.size else []
+        bounds = np.r_[starts, stations.size]
+
+        result = []
+        for i, start in enumerate(starts):
+            group = durations[start:bounds[i + 1]]
+            p50, p90, p95, p99 = np.quantile(group, QUANTILES).tolist()
+            result.append({
+                "station_id": int(stations[start]),
+                "eventos": int(group.size),
+                "tiempo_promedio_segundos": float(group.mean()),
+                "p50": p50,
+                "p90": p90,
+                "p95": p95,
+                "p99": p99,
+            })
+        return result
+
+
+trace_snapshot = TraceSnapshot()
@@ -0,0 +1,65 @@
+"""
+Caché de usuarios autenticados.
+
+get_current_user solo necesita id, nombre, rol y activo para autorizar; en vez
+de consultar users en cada petición se guarda un Principal por sub del token.
+Los cambios en /users invalidan la entrada del usuario afectado. La caché es por
+proceso: con varios workers, el resto ve el cambio al expirar el TTL.
+"""
+from dataclasses import dataclass
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.user import User
+
+user_cache = TTLCache(maxsize=settings.USER_CACHE_MAX_ENTRIES)
+
+# Sin usuario en la BD también se guarda (None) para no repetir la consulta
+_MISSING = None
+
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """Datos mínimos del usuario autenticado que usan las validaciones de rol."""
+    id: int
+    nombre: str
+    rol: str
+    activo: bool
+
+
+def _namespace(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+def _load(user_id: int) -> Principal | None:
+    # Sesión propia y corta: solo se abre cuando el usuario no está en caché
+    db = SessionLocal()
+    try:
+        row = db.query(User.id, User.nombre, User.rol, User.activo).filter(User.id == user_id).first()
+    finally:
+        db.close()
+    if row is None:
+        return _MISSING
+    return Principal(id=row.id, nombre=row.nombre, rol=row.rol, activo=bool(row.activo))
+
+
+async def get_principal(user_id: int) -> Principal | None:
+    """
+    Con la entrada en caché no sale del event loop; en un fallo la consulta
+    corre en el threadpool.
+    """
+    key = (_namespace(user_id),)
+    found, principal = user_cache.get(key)
+    if found:
+        return principal
+    generation = user_cache.generation(key[0])
+    principal = await run_in_threadpool(_load, user_id)
+    user_cache.set(key, principal, settings.USER_CACHE_TTL_SECONDS, generation)
+    return principal
+
+
+def invalidate_user(user_id: int) -> None:
+    user_cache.invalidate(_namespace(user_id))
@@ -0,0 +1,98 @@
+"""
+Utilidades compartidas por los benchmarks.
+Se ejecutan contra la base de datos configurada en DATABASE_URL.
+"""
+import math
+import os
+import subprocess
+import sys
+import time
+import uuid
+
+import httpx
+
+from app.api.auth import get_current_user
+from app.db.session import SessionLocal
+from app.models.part import Part
+from app.models.station import Station
+from app.services.user_cache import Principal
+
+
+def override_auth(app, rol: str = "ADMIN"):
+    """
+    Reemplaza la autenticación por un usuario fijo para medir solo el endpoint.
+    """
+    fake_user = Principal(id=0, nombre="bench", rol=rol, activo=True)
+    app.dependency_overrides[get_current_user] = lambda: fake_user
+
+
+def seed_parts(n_parts: int, tipo_pieza: str = "BENCH"):
+    """
+    Crea una estación y n_parts piezas de prueba.
+    Retorna (station_id, [part_ids]).
+    """
+    prefix = uuid.uuid4().hex[:8]
+    db = SessionLocal()
+    try:
+        station = Station(nombre=f"BENCH-{prefix}", tipo="benchmark", linea="BENCH")
+        db.add(station)
+        parts = [
+            Part(serial=f"{prefix}-{i}", tipo_pieza=tipo_pieza, lote=f"LOTE-{prefix}")
+            for i in range(n_parts)
+        ]
+        db.add_all(parts)
+        db.commit()
+        return station.id, [p.id for p in parts]
+    finally:
+        db.close()
+
+
+class Timer:
+    """Context manager sencillo para medir tiempo transcurrido."""
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+        return False
+
+
+def percentile(values, q: float) -> float:
+    """Percentil q (0-100) por el método del rango más cercano."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, math.ceil(q * len(ordered) / 100) - 1))
+    return ordered[k]
+
+
+def start_server(port: int, env: dict | None = None, cwd: str | None = None) -> subprocess.Popen:
+    """
+    Arranca uvicorn con la app en un proceso aparte y espera a que responda.
+    env agrega/reemplaza variables de entorno (p. ej. settings); cwd permite
+    servir otra copia del código (p. ej. un git worktree de otra versión).
+    """
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env={**os.environ, **(env or {})},
+        cwd=cwd,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=1)
+            return proc
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    stop_server(proc)
+    raise RuntimeError("El servidor no arrancó")
+
+
+def stop_server(proc: subprocess.Popen) -> None:
+    proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
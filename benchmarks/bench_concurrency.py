@@ -0,0 +1,176 @@
+"""
+Peticiones por segundo de los endpoints calientes con 50, 200 y 1000 clientes
+concurrentes, contra un servidor uvicorn real.
+
+Mezcla: historial de pieza, risk score de pieza y alta de eventos (--write-ratio).
+Cada cliente repite peticiones durante --duration segundos.
+
+Con --baseline <ref> la misma carga corre primero contra esa versión del código
+(p. ej. el commit anterior a los handlers async, servido desde un git worktree
+temporal) y luego contra el árbol actual, y se imprimen rps y p95 lado a lado.
+Las dos usan la misma DATABASE_URL: correrlo sobre una base de pruebas, porque
+una versión vieja no mantiene las tablas derivadas que se agregaron después.
+
+Uso:
+    python -m benchmarks.bench_concurrency
+    python -m benchmarks.bench_concurrency --clients 50 200 1000 --duration 15
+    python -m benchmarks.bench_concurrency --baseline <commit-anterior>
+"""
+import argparse
+import asyncio
+import random
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from app.core.security import create_access_token
+from app.db.session import SessionLocal
+from app.models.user import User
+from benchmarks._common import percentile, seed_parts, start_server, stop_server
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def seed_admin_token() -> str:
+    db = SessionLocal()
+    try:
+        user = User(nombre="bench", email=f"bench-{time.time_ns()}@example.com", password_hash="-", rol="ADMIN")
+        db.add(user)
+        db.commit()
+        return create_access_token({"sub": str(user.id)})
+    finally:
+        db.close()
+
+
+async def seed_events(client, station_id: int, part_ids: list[int]):
+    # Algunos eventos por pieza para que historial y risk score tengan datos
+    payload = [
+        {"part_id": pid, "station_id": station_id, "resultado": "OK"}
+        for pid in part_ids
+        for _ in range(3)
+    ]
+    for start in range(0, len(payload), 1000):
+        resp = await client.post("/trace-events/bulk", json=payload[start:start + 1000])
+        resp.raise_for_status()
+
+
+async def run_level(client, n_clients: int, args, station_id: int, part_ids: list[int]) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    deadline = time.monotonic() + args.duration
+    read_split = args.write_ratio + (1 - args.write_ratio) / 2
+
+    async def worker(seed: int):
+        nonlocal errors
+        rng = random.Random(seed)
+        while time.monotonic() < deadline:
+            part_id = rng.choice(part_ids)
+            roll = rng.random()
+            start = time.perf_counter()
+            try:
+                if roll < args.write_ratio:
+                    resp = await client.post(
+                        "/trace-events/",
+                        json={"part_id": part_id, "station_id": station_id, "resultado": "OK"},
+                    )
+                elif roll < read_split:
+                    resp = await client.get(f"/trace-events/part/{part_id}")
+                else:
+                    resp = await client.get(f"/trace-events/part/{part_id}/risk-score")
+                if resp.status_code >= 400:
+                    errors += 1
+                    continue
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(n_clients)))
+    elapsed = time.perf_counter() - start
+    result = {
+        "clients": n_clients,
+        "rps": len(latencies) / elapsed,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "errors": errors,
+    }
+    print(
+        f"clientes={n_clients:5d} rps={result['rps']:8.1f} "
+        f"p50={result['p50']:7.1f}ms p95={result['p95']:7.1f}ms "
+        f"p99={result['p99']:7.1f}ms errores={errors}"
+    )
+    return result
+
+
+async def run(args, base_url: str, token: str, station_id: int, part_ids: list[int], seed: bool) -> list[dict]:
+    headers = {"Authorization": f"Bearer {token}"}
+    limits = httpx.Limits(max_connections=max(args.clients), max_keepalive_connections=max(args.clients))
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=60) as client:
+        if seed:
+            await seed_events(client, station_id, part_ids)
+        return [
+            await run_level(client, n_clients, args, station_id, part_ids)
+            for n_clients in args.clients
+        ]
+
+
+def measure(args, token: str, station_id: int, part_ids: list[int], seed: bool, cwd: str | None = None) -> list[dict]:
+    server = start_server(args.port, cwd=cwd)
+    try:
+        return asyncio.run(run(args, f"http://127.0.0.1:{args.port}", token, station_id, part_ids, seed))
+    finally:
+        stop_server(server)
+
+
+def measure_baseline(args, token: str, station_id: int, part_ids: list[int]) -> list[dict]:
+    """Misma carga contra args.baseline, servido desde un git worktree temporal."""
+    with tempfile.TemporaryDirectory(prefix="bench-baseline-") as tmp:
+        worktree = str(Path(tmp) / "tree")
+        subprocess.run(
+            ["git", "worktree", "add", "--detach", worktree, args.baseline],
+            cwd=REPO_ROOT, check=True, capture_output=True,
+        )
+        try:
+            print(f"--- baseline {args.baseline}")
+            return measure(args, token, station_id, part_ids, seed=False, cwd=worktree)
+        finally:
+            subprocess.run(
+                ["git", "worktree", "remove", "--force", worktree],
+                cwd=REPO_ROOT, check=False, capture_output=True,
+            )
+
+
+def print_comparison(baseline: str, before: list[dict], after: list[dict]) -> None:
+    print(f"\n{'clientes':>8} {'rps antes':>10} {'rps ahora':>10} {'p95 antes':>10} {'p95 ahora':>10}   (antes = {baseline})")
+    for b, a in zip(before, after):
+        print(f"{a['clients']:8d} {b['rps']:10.1f} {a['rps']:10.1f} {b['p95']:8.1f}ms {a['p95']:8.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--parts", type=int, default=500)
+    parser.add_argument("--write-ratio", type=float, default=0.1)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--baseline", metavar="REF", help="Commit o rama con la que comparar (git)")
+    args = parser.parse_args()
+
+    token = seed_admin_token()
+    station_id, part_ids = seed_parts(args.parts)
+
+    # Los eventos iniciales se cargan con el árbol actual, antes de medir cualquiera de las dos
+    print("--- actual")
+    after = measure(args, token, station_id, part_ids, seed=True)
+    if args.baseline:
+        before = measure_baseline(args, token, station_id, part_ids)
+        print_comparison(args.baseline, before, after)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Ráfaga de logins contra un servidor uvicorn real, midiendo al mismo tiempo la
+latencia de otro endpoint (GET /stations/). Con la verificación fuera del
+threadpool, la latencia del resto de endpoints debe mantenerse estable.
+
+Uso:
+    python -m benchmarks.bench_login_burst --logins 400 --concurrency 100
+    python -m benchmarks.bench_login_burst --workers 0   # verificación en un solo hilo
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+import httpx
+
+from app.core.security import create_access_token, hash_password
+from app.db.session import SessionLocal
+from app.models.user import User
+from benchmarks._common import percentile, start_server, stop_server
+
+
+def seed_user() -> tuple[str, str, int]:
+    email = f"bench-{uuid.uuid4().hex[:8]}@example.com"
+    password = "bench-password"
+    db = SessionLocal()
+    try:
+        user = User(nombre="bench", email=email, password_hash=hash_password(password), rol="ADMIN")
+        db.add(user)
+        db.commit()
+        return email, password, user.id
+    finally:
+        db.close()
+
+
+async def probe(client, headers, stop: asyncio.Event, latencies: list, interval: float):
+    while not stop.is_set():
+        start = time.perf_counter()
+        resp = await client.get("/stations/", headers=headers)
+        resp.raise_for_status()
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(interval)
+
+
+async def run(args, base_url: str, email: str, password: str, user_id: int):
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': str(user_id)})}"}
+    limits = httpx.Limits(max_connections=args.concurrency + 10)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        # --- Latencia en reposo ---
+        idle: list[float] = []
+        stop = asyncio.Event()
+        task = asyncio.create_task(probe(client, headers, stop, idle, args.probe_interval))
+        await asyncio.sleep(args.idle_seconds)
+        stop.set()
+        await task
+
+        # --- Latencia durante la ráfaga ---
+        burst: list[float] = []
+        stop = asyncio.Event()
+        task = asyncio.create_task(probe(client, headers, stop, burst, args.probe_interval))
+        sem = asyncio.Semaphore(args.concurrency)
+        codes: dict[int, int] = {}
+
+        async def login():
+            async with sem:
+                resp = await client.post("/auth/login", data={"username": email, "password": password})
+                codes[resp.status_code] = codes.get(resp.status_code, 0) + 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(login() for _ in range(args.logins)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await task
+
+    print(f"logins: {args.logins} en {elapsed:.2f}s ({codes.get(200, 0) / elapsed:.1f} OK/s) códigos={codes}")
+    for name, values in (("reposo", idle), ("ráfaga", burst)):
+        print(
+            f"GET /stations/ {name:7s} n={len(values):4d} "
+            f"p50={percentile(values, 50):7.1f}ms p95={percentile(values, 95):7.1f}ms "
+            f"p99={percentile(values, 99):7.1f}ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logins", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=2, help="PASSWORD_POOL_WORKERS del servidor")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--idle-seconds", type=float, default=3.0)
+    parser.add_argument("--probe-interval", type=float, default=0.02)
+    args = parser.parse_args()
+
+    email, password, user_id = seed_user()
+    server = start_server(args.port, {"PASSWORD_POOL_WORKERS": str(args.workers)})
+    try:
+        asyncio.run(run(args, f"http://127.0.0.1:{args.port}", email, password, user_id))
+    finally:
+        stop_server(server)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Microbenchmark del motor de reglas de riesgo: costo por evaluación
+en la ruta escalar (evaluate) y en lote (evaluate_batch).
+
+Uso:
+    python -m benchmarks.bench_risk_engine --n 100000
+"""
+import argparse
+import timeit
+
+import numpy as np
+
+from app.services.risk_engine import RiskInputs, evaluate, evaluate_batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--n", type=int, default=100_000, help="Piezas por lote")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    tiempo = rng.gamma(2.0, 300.0, args.n)
+    scrap = rng.binomial(1, 0.04, args.n)
+    retrabajos = rng.poisson(0.3, args.n)
+    inputs = [
+        RiskInputs(t, s, r)
+        for t, s, r in zip(tiempo.tolist(), scrap.tolist(), retrabajos.tolist())
+    ]
+
+    scalar = min(timeit.repeat(
+        lambda: [evaluate(i) for i in inputs], number=1, repeat=args.repeat
+    ))
+    batch = min(timeit.repeat(
+        lambda: evaluate_batch(tiempo, scrap, retrabajos), number=1, repeat=args.repeat
+    ))
+
+    print(f"escalar: {scalar / args.n * 1e9:10.1f} ns/evaluación ({scalar:.3f}s para {args.n})")
+    print(f"lote:    {batch / args.n * 1e9:10.1f} ns/evaluación ({batch:.3f}s para {args.n})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Microbenchmark de serialización de respuestas: costo por 10k filas antes
+(objetos ORM -> validación con response_model -> json.dumps, o dict ->
+jsonable_encoder -> json.dumps en los endpoints sin response_model) y después
+(filas de columnas -> dicts -> orjson, app.core.serialization).
+
+No usa la base de datos: las filas se generan en memoria. Verifica que ambas
+rutas produzcan el mismo JSON.
+
+Uso:
+    python -m benchmarks.bench_serialization --rows 10000
+"""
+import argparse
+import json
+import timeit
+from datetime import datetime, timedelta, timezone
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from app.core.serialization import dumps, model_rows
+from app.models.part import Part
+from app.models.station import Station
+from app.models.user import User
+from app.schemas.part import PartOut
+from app.schemas.station import StationOut
+from app.schemas.user import UserOut
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def fastapi_dumps(content) -> bytes:
+    """Render de la JSONResponse de Starlette (la clase por defecto antes del cambio)."""
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+def parts(n: int):
+    objs = [
+        Part(id=i, serial=f"S-{i:08d}", tipo_pieza="Motor", lote=f"L{i % 50}", status="OK",
+             fecha_creacion=START + timedelta(seconds=i))
+        for i in range(n)
+    ]
+    return objs, PartOut
+
+
+def stations(n: int):
+    objs = [Station(id=i, nombre=f"Estación {i}", tipo="ensamble", linea=f"L{i % 4}") for i in range(n)]
+    return objs, StationOut
+
+
+def users(n: int):
+    objs = [
+        User(id=i, nombre=f"Usuario {i}", email=f"u{i}@example.com", rol="OPERADOR", activo=True,
+             fecha_registro=START + timedelta(seconds=i))
+        for i in range(n)
+    ]
+    return objs, UserOut
+
+
+def history(n: int) -> list[dict]:
+    """Eventos del historial como los arma el endpoint (fechas ya en isoformat)."""
+    return [
+        {
+            "id": i,
+            "part_id": 1,
+            "station_id": i % 8,
+            "timestamp_entrada": (START + timedelta(minutes=i)).isoformat(),
+            "timestamp_salida": (START + timedelta(minutes=i, seconds=95.25)).isoformat(),
+            "resultado": "OK",
+            "operador_id": 3,
+            "observaciones": None,
+        }
+        for i in range(n)
+    ]
+
+
+def best(fn, repeat: int) -> float:
+    return min(timeit.repeat(fn, number=1, repeat=repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000, help="Filas por respuesta")
+    parser.add_argument("--repeat", type=int, default=7)
+    args = parser.parse_args()
+    per = 10_000 / args.rows
+
+    print(f"{'endpoint':12} {'antes':>10} {'después':>10} {'mejora':>8}   (ms por 10k filas)")
+    for name, build in (("parts", parts), ("stations", stations), ("users", users)):
+        objs, schema = build(args.rows)
+        # Lo que devuelve db.query(*model_columns(schema, Model)): tuplas en el orden del schema
+        rows = [tuple(getattr(o, f) for f in schema.model_fields) for o in objs]
+        adapter = TypeAdapter(list[schema])
+
+        def before():
+            # serialize_response: validar contra response_model y volcar en modo JSON
+            return fastapi_dumps(adapter.dump_python(adapter.validate_python(objs), mode="json"))
+
+        def after():
+            return dumps(model_rows(rows, schema))
+
+        assert json.loads(before()) == json.loads(after()), name
+        t0, t1 = best(before, args.repeat), best(after, args.repeat)
+        print(f"{name:12} {t0 * per * 1e3:10.1f} {t1 * per * 1e3:10.1f} {t0 / t1:7.1f}x")
+
+    eventos = history(args.rows)
+    body = {"part_id": 1, "total_eventos": len(eventos), "eventos": eventos}
+    before = lambda: fastapi_dumps(jsonable_encoder(body))
+    after = lambda: dumps(body)
+    assert before() == after(), "history"
+    t0, t1 = best(before, args.repeat), best(after, args.repeat)
+    print(f"{'history':12} {t0 * per * 1e3:10.1f} {t1 * per * 1e3:10.1f} {t0 / t1:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Compara eventos/segundo entre POST /trace-events/ (uno por petición)
+y POST /trace-events/bulk.
+
+Uso:
+    python -m benchmarks.bench_trace_events_bulk --events 2000 --batch 500
+"""
+import argparse
+import random
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from benchmarks._common import Timer, override_auth, seed_parts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--parts", type=int, default=200)
+    args = parser.parse_args()
+
+    override_auth(app)
+    client = TestClient(app)
+    station_id, part_ids = seed_parts(args.parts)
+    rng = random.Random(42)
+
+    def payload():
+        return {
+            "part_id": rng.choice(part_ids),
+            "station_id": station_id,
+            "resultado": rng.choices(["OK", "SCRAP", "RETRABAJO"], [90, 4, 6])[0],
+        }
+
+    # --- Ruta individual ---
+    with Timer() as t_single:
+        for _ in range(args.events):
+            resp = client.post("/trace-events/", json=payload())
+            resp.raise_for_status()
+
+    # --- Ruta masiva ---
+    with Timer() as t_bulk:
+        remaining = args.events
+        while remaining > 0:
+            size = min(args.batch, remaining)
+            resp = client.post("/trace-events/bulk", json=[payload() for _ in range(size)])
+            resp.raise_for_status()
+            remaining -= size
+
+    single_rate = args.events / t_single.elapsed
+    bulk_rate = args.events / t_bulk.elapsed
+    print(f"individual: {single_rate:10.1f} eventos/s ({t_single.elapsed:.2f}s)")
+    print(f"bulk({args.batch}): {bulk_rate:10.1f} eventos/s ({t_bulk.elapsed:.2f}s)")
+    print(f"aceleración: x{bulk_rate / single_rate:.1f}")
+
+
+if __name__ == "__main__":
+    main()
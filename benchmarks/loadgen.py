@@ -0,0 +1,309 @@
+"""
+Generador de carga con una mezcla parecida a la de la línea de producción.
+
+Actores (cada uno es una corrutina en un bucle cerrado con tiempo de espera):
+- Operadores: abren un evento en su pieza (POST /trace-events/, EN_PROCESO)
+  y lo cierran poco después (PUT /trace-events/{event_id}/close) con
+  OK / RETRABAJO / SCRAP.
+- Supervisores: consultan /metrics/* y el historial de piezas
+  (GET /trace-events/part/{part_id}).
+- Ráfagas de login: cada --login-every segundos, --login-burst logins
+  concurrentes (inicio de turno).
+
+Corre en proceso (httpx + ASGITransport, sin red) o contra un uvicorn local
+(--mode uvicorn lo arranca; --base-url usa uno ya levantado). El resultado es
+JSON con p50/p95/p99 y throughput por endpoint (agrupado por plantilla de
+ruta) y el commit actual, para comparar corridas entre commits.
+
+Uso:
+    python -m benchmarks.loadgen --mode inprocess --duration 20
+    python -m benchmarks.loadgen --mode uvicorn --operators 40 --supervisors 8 --output carga.json
+    python -m benchmarks.loadgen --base-url http://127.0.0.1:8000
+"""
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+
+import httpx
+
+from app.core.security import create_access_token, hash_password
+from app.db.session import SessionLocal
+from app.models.user import User
+from benchmarks._common import percentile, seed_parts, start_server, stop_server
+
+LOGIN_PASSWORD = "loadgen-password"
+CLOSE_RESULTS = (("OK", 0.90), ("RETRABAJO", 0.07), ("SCRAP", 0.03))
+
+
+class Recorder:
+    """Latencias (ms) y errores por endpoint."""
+
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = {}
+        self.errors: dict[str, int] = {}
+        self.statuses: dict[str, dict[int, int]] = {}
+
+    async def call(self, name: str, request):
+        """Ejecuta la petición y la registra bajo name. Retorna la respuesta o None."""
+        start = time.perf_counter()
+        try:
+            resp = await request
+        except httpx.HTTPError:
+            self.errors[name] = self.errors.get(name, 0) + 1
+            return None
+        elapsed = (time.perf_counter() - start) * 1000
+        codes = self.statuses.setdefault(name, {})
+        codes[resp.status_code] = codes.get(resp.status_code, 0) + 1
+        if resp.status_code >= 400:
+            self.errors[name] = self.errors.get(name, 0) + 1
+        else:
+            self.latencies.setdefault(name, []).append(elapsed)
+        return resp
+
+    def summary(self, elapsed: float) -> dict:
+        endpoints = {}
+        for name in sorted(set(self.latencies) | set(self.errors)):
+            values = self.latencies.get(name, [])
+            endpoints[name] = _stats(values, self.errors.get(name, 0), elapsed)
+            endpoints[name]["status"] = {
+                str(code): n for code, n in sorted(self.statuses.get(name, {}).items())
+            }
+        every = [v for values in self.latencies.values() for v in values]
+        return {
+            "endpoints": endpoints,
+            "total": _stats(every, sum(self.errors.values()), elapsed),
+        }
+
+
+def _stats(values: list[float], errors: int, elapsed: float) -> dict:
+    return {
+        "requests": len(values) + errors,
+        "errors": errors,
+        "throughput_rps": round(len(values) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(values, 50), 2),
+        "p95_ms": round(percentile(values, 95), 2),
+        "p99_ms": round(percentile(values, 99), 2),
+        "max_ms": round(max(values), 2) if values else 0.0,
+    }
+
+
+# ---------------------- DATOS DE PRUEBA ---------------------- #
+def seed_users() -> dict:
+    """Un usuario por rol; el operador tiene contraseña real para las ráfagas de login."""
+    prefix = uuid.uuid4().hex[:8]
+    db = SessionLocal()
+    try:
+        users = {
+            rol: User(
+                nombre=f"loadgen-{rol.lower()}",
+                email=f"loadgen-{rol.lower()}-{prefix}@example.com",
+                password_hash=hash_password(LOGIN_PASSWORD) if rol == "OPERADOR" else "-",
+                rol=rol,
+            )
+            for rol in ("OPERADOR", "SUPERVISOR")
+        }
+        db.add_all(users.values())
+        db.commit()
+        return {
+            "operator_email": users["OPERADOR"].email,
+            "operator_id": users["OPERADOR"].id,
+            "operator_token": create_access_token({"sub": str(users["OPERADOR"].id)}),
+            "supervisor_token": create_access_token({"sub": str(users["SUPERVISOR"].id)}),
+        }
+    finally:
+        db.close()
+
+
+# ---------------------- ACTORES ---------------------- #
+async def operator(client, rec: Recorder, rng: random.Random, ctx: dict, deadline: float, args):
+    headers = {"Authorization": f"Bearer {ctx['operator_token']}"}
+    results, weights = zip(*CLOSE_RESULTS)
+    while time.monotonic() < deadline:
+        part_id = rng.choice(ctx["part_ids"])
+        resp = await rec.call("POST /trace-events/", client.post(
+            "/trace-events/",
+            json={
+                "part_id": part_id,
+                "station_id": ctx["station_id"],
+                "operador_id": ctx["operator_id"],
+                "resultado": "EN_PROCESO",
+            },
+            headers=headers,
+        ))
+        await asyncio.sleep(rng.expovariate(1 / args.think_time))
+        if resp is None or resp.status_code >= 400:
+            continue
+        resultado = rng.choices(results, weights)[0]
+        await rec.call("PUT /trace-events/{event_id}/close", client.put(
+            f"/trace-events/{resp.json()['id']}/close",
+            params={"resultado": resultado},
+            headers=headers,
+        ))
+        await asyncio.sleep(rng.expovariate(1 / args.think_time))
+
+
+async def supervisor(client, rec: Recorder, rng: random.Random, ctx: dict, deadline: float, args):
+    headers = {"Authorization": f"Bearer {ctx['supervisor_token']}"}
+    today = date.today()
+    throughput_params = {
+        "from_date": (today - timedelta(days=7)).isoformat(),
+        "to_date": today.isoformat(),
+    }
+    # (nombre, peso, función que arma la petición)
+    actions = (
+        ("GET /trace-events/part/{part_id}", 4,
+         lambda: client.get(f"/trace-events/part/{rng.choice(ctx['part_ids'])}", headers=headers)),
+        ("GET /metrics/parts-by-status", 2,
+         lambda: client.get("/metrics/parts-by-status", headers=headers)),
+        ("GET /metrics/throughput", 2,
+         lambda: client.get("/metrics/throughput", params=throughput_params, headers=headers)),
+        ("GET /metrics/station-cycle-time", 2,
+         lambda: client.get("/metrics/station-cycle-time", headers=headers)),
+        ("GET /metrics/scrap-rate", 1,
+         lambda: client.get("/metrics/scrap-rate", headers=headers)),
+    )
+    weights = [weight for _, weight, _ in actions]
+    while time.monotonic() < deadline:
+        name, _, make = rng.choices(actions, weights)[0]
+        await rec.call(name, make())
+        await asyncio.sleep(rng.expovariate(1 / args.think_time))
+
+
+async def login_bursts(client, rec: Recorder, ctx: dict, deadline: float, args):
+    form = {"username": ctx["operator_email"], "password": LOGIN_PASSWORD}
+    while time.monotonic() + args.login_every < deadline:
+        await asyncio.sleep(args.login_every)
+        await asyncio.gather(*(
+            rec.call("POST /auth/login", client.post("/auth/login", data=form))
+            for _ in range(args.login_burst)
+        ))
+
+
+async def seed_history(client, ctx: dict):
+    # Un evento por pieza para que el historial que consultan los supervisores no dé 404
+    payload = [
+        {"part_id": pid, "station_id": ctx["station_id"], "resultado": "EN_PROCESO"}
+        for pid in ctx["part_ids"]
+    ]
+    headers = {"Authorization": f"Bearer {ctx['operator_token']}"}
+    for start in range(0, len(payload), 1000):
+        resp = await client.post("/trace-events/bulk", json=payload[start:start + 1000], headers=headers)
+        resp.raise_for_status()
+
+
+async def run(args, client: httpx.AsyncClient, ctx: dict) -> dict:
+    await seed_history(client, ctx)
+    rec = Recorder()
+    deadline = time.monotonic() + args.duration
+    tasks = [
+        operator(client, rec, random.Random(args.seed * 1000 + i), ctx, deadline, args)
+        for i in range(args.operators)
+    ] + [
+        supervisor(client, rec, random.Random(args.seed * 1000 + 500 + i), ctx, deadline, args)
+        for i in range(args.supervisors)
+    ]
+    if args.login_burst:
+        tasks.append(login_bursts(client, rec, ctx, deadline, args))
+
+    start = time.perf_counter()
+    await asyncio.gather(*tasks)
+    return rec.summary(time.perf_counter() - start)
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_inprocess(args, ctx: dict) -> dict:
+    from app.db.session import async_engine
+    from app.main import app
+    from app.core.password_pool import password_pool
+
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadgen", timeout=60) as client:
+            return await run(args, client, ctx)
+    finally:
+        password_pool.shutdown()
+        await async_engine.dispose()
+
+
+async def run_http(args, base_url: str, ctx: dict) -> dict:
+    n = args.operators + args.supervisors + args.login_burst
+    limits = httpx.Limits(max_connections=n, max_keepalive_connections=n)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        return await run(args, client, ctx)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("inprocess", "uvicorn"), default="uvicorn")
+    parser.add_argument("--base-url", help="Servidor ya levantado (ignora --mode)")
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--operators", type=int, default=20)
+    parser.add_argument("--supervisors", type=int, default=5)
+    parser.add_argument("--think-time", type=float, default=0.2, help="Espera media entre acciones (s)")
+    parser.add_argument("--login-burst", type=int, default=20, help="Logins por ráfaga (0 = sin ráfagas)")
+    parser.add_argument("--login-every", type=float, default=10.0, help="Segundos entre ráfagas")
+    parser.add_argument("--parts", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Archivo JSON de salida (por defecto stdout)")
+    args = parser.parse_args()
+
+    station_id, part_ids = seed_parts(args.parts, tipo_pieza="LOADGEN")
+    ctx = {"station_id": station_id, "part_ids": part_ids, **seed_users()}
+
+    started_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    if args.base_url:
+        mode = "http"
+        result = asyncio.run(run_http(args, args.base_url, ctx))
+    elif args.mode == "uvicorn":
+        mode = "uvicorn"
+        server = start_server(args.port)
+        try:
+            result = asyncio.run(run_http(args, f"http://127.0.0.1:{args.port}", ctx))
+        finally:
+            stop_server(server)
+    else:
+        mode = "inprocess"
+        result = asyncio.run(run_inprocess(args, ctx))
+
+    report = {
+        "commit": git_commit(),
+        "started_at": started_at,
+        "mode": mode,
+        "config": {
+            key: getattr(args, key)
+            for key in ("duration", "operators", "supervisors", "think_time",
+                        "login_burst", "login_every", "parts", "seed")
+        },
+        **result,
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        total = report["total"]
+        print(
+            f"{total['requests']} peticiones, {total['throughput_rps']} rps, "
+            f"p95={total['p95_ms']}ms, errores={total['errors']} -> {args.output}",
+            file=sys.stderr,
+        )
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Fixtures compartidas de las pruebas.
+
+Las pruebas necesitan Postgres (upserts, índices de expresión, particiones),
+pero nunca escriben en la base de DATABASE_URL: se crea una base temporal en
+el mismo servidor, la app se importa apuntando a ella y al terminar se borra
+completa (con usuarios, piezas y todo lo que hayan creado las pruebas).
+
+Los módulos de prueba no deben importar app.db ni app.main a nivel de módulo:
+el engine se crea al importarlos y tiene que ver ya la URL temporal.
+"""
+import os
+import sys
+import uuid
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+
+# Hash de contraseñas en un hilo: sin procesos hijos durante las pruebas
+os.environ.setdefault("PASSWORD_POOL_WORKERS", "0")
+
+
+@pytest.fixture(scope="session")
+def database_url():
+    """URL de una base temporal creada para la sesión de pruebas."""
+    from app.core.config import settings
+
+    if "app.db.session" in sys.modules:
+        pytest.fail("app.db.session se importó antes de crear la base temporal")
+
+    base_url = settings.DATABASE_URL
+    url = make_url(base_url)
+    if url.get_backend_name() != "postgresql":
+        pytest.skip("Las pruebas necesitan un servidor Postgres en DATABASE_URL")
+    name = f"{url.database or 'trace'}_test_{uuid.uuid4().hex[:8]}"
+
+    admin = create_engine(url, isolation_level="AUTOCOMMIT")
+    try:
+        with admin.connect() as conn:
+            conn.execute(text(f'CREATE DATABASE "{name}"'))
+    except Exception as exc:
+        admin.dispose()
+        pytest.skip(f"No se pudo crear la base temporal: {exc}")
+
+    test_url = url.set(database=name).render_as_string(hide_password=False)
+    settings.DATABASE_URL = test_url
+    try:
+        yield test_url
+    finally:
+        settings.DATABASE_URL = base_url
+        session = sys.modules.get("app.db.session")
+        if session is not None:
+            session.engine.dispose()
+        with admin.connect() as conn:
+            # FORCE cierra las conexiones que sigan abiertas (pool asíncrono)
+            conn.execute(text(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)'))
+        admin.dispose()
+
+
+@pytest.fixture(scope="session")
+def engine(database_url):
+    """Engine síncrono de la app sobre la base temporal, con el esquema creado."""
+    from app.db.maintenance import ensure_schema
+    from app.db.session import engine
+
+    ensure_schema(engine)
+    return engine
+
+
+@pytest.fixture(scope="session")
+def app(engine):
+    from app.main import app
+
+    return app
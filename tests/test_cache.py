@@ -0,0 +1,43 @@
+"""TTLCache: invalidación por namespace sin recorrer entradas."""
+from app.core.cache import TTLCache
+
+
+def test_invalidate_hides_entries_of_that_namespace_only():
+    cache = TTLCache(maxsize=10)
+    cache.set(("user:1",), "a", ttl=60)
+    cache.set(("user:2",), "b", ttl=60)
+
+    cache.invalidate("user:1")
+
+    assert cache.get(("user:1",)) == (False, None)
+    assert cache.get(("user:2",)) == (True, "b")
+
+
+def test_value_computed_before_an_invalidation_is_not_stored():
+    cache = TTLCache(maxsize=10)
+    cache.set(("user:1",), "a", ttl=60)
+    generation = cache.generation("user:1")
+    cache.invalidate("user:1")
+    cache.set(("user:1",), "viejo", ttl=60, generation=generation)
+    assert cache.get(("user:1",)) == (False, None)
+
+    # Namespace sin entradas: su marca no se guarda, pero el cálculo en curso igual se descarta
+    generation = cache.generation("user:2")
+    cache.invalidate("user:2")
+    cache.set(("user:2",), "viejo", ttl=60, generation=generation)
+    assert cache.get(("user:2",)) == (False, None)
+
+    cache.set(("user:2",), "nuevo", ttl=60, generation=cache.generation("user:2"))
+    assert cache.get(("user:2",)) == (True, "nuevo")
+
+
+def test_invalidation_marks_are_forgotten_with_their_entries():
+    cache = TTLCache(maxsize=5)
+    for user_id in range(1000):
+        key = (f"user:{user_id}",)
+        cache.set(key, user_id, ttl=60)
+        cache.invalidate(key[0])
+        cache.get(key)
+
+    assert len(cache._invalidated_at) == 0
+    assert len(cache._live) == 0
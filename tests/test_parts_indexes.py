@@ -0,0 +1,67 @@
+"""
+Los filtros de GET /parts usan los índices de expresión (EXPLAIN) en lugar
+de recorrer toda la tabla.
+
+Las piezas se insertan dentro de una transacción que se revierte al terminar.
+"""
+from datetime import date
+
+import pytest
+from sqlalchemy import insert, select, text
+
+# Piezas suficientes para que al planificador le convenga el índice
+N_PARTS = 50_000
+
+CASES = [
+    # (filtros, índice esperado o None si basta con no hacer Seq Scan)
+    ({"lote": "lote-7"}, "ix_parts_upper_lote_id"),
+    ({"tipo_pieza": "tipo-3", "lote": "LOTE-7"}, "ix_parts_upper_tipo_lote_fecha"),
+    (
+        {"tipo_pieza": "TIPO-3", "lote": "lote-7", "fecha_desde": date(2000, 1, 1)},
+        "ix_parts_upper_tipo_lote_fecha",
+    ),
+    ({"status": "scrap"}, None),
+]
+
+
+@pytest.fixture(scope="module")
+def conn(engine):
+    """Conexión con N_PARTS piezas y estadísticas al día; todo se revierte al final."""
+    from app.models.part import Part
+
+    statuses = ["EN_PROCESO", "OK", "OK", "OK", "OK", "OK", "RETRABAJO", "SCRAP"]
+    with engine.connect() as conn:
+        tx = conn.begin()
+        try:
+            conn.execute(insert(Part), [
+                {
+                    "serial": f"EXPLAIN-{i}",
+                    "tipo_pieza": f"Tipo-{i % 20}",
+                    "lote": f"Lote-{i % 500}",
+                    "status": statuses[i % len(statuses)],
+                }
+                for i in range(N_PARTS)
+            ])
+            conn.execute(text("ANALYZE parts"))
+            yield conn
+        finally:
+            tx.rollback()
+
+
+def explain(conn, stmt) -> str:
+    compiled = stmt.compile(dialect=conn.dialect)
+    return "\n".join(row[0] for row in conn.exec_driver_sql("EXPLAIN " + str(compiled), compiled.params))
+
+
+@pytest.mark.parametrize("filters, expected_index", CASES, ids=[str(f) for f, _ in CASES])
+def test_filtered_listing_uses_index(conn, filters, expected_index):
+    from app.api.parts import PART_COLUMNS, filter_parts
+    from app.models.part import Part
+
+    # Misma consulta que list_parts (primera página)
+    stmt = filter_parts(select(*PART_COLUMNS), **filters).order_by(Part.id).limit(101)
+    plan = explain(conn, stmt)
+
+    assert "Seq Scan on parts" not in plan, plan
+    if expected_index:
+        assert expected_index in plan, plan
@@ -0,0 +1,32 @@
+"""Pool de contraseñas: recuperación cuando un worker muere."""
+import asyncio
+import os
+
+from app.core.password_pool import PasswordPool, PasswordPoolBusy
+from app.core.security import verify_password
+
+
+def test_broken_process_pool_is_replaced():
+    pool = PasswordPool(workers=1, max_pending=4)
+
+    async def scenario():
+        # os._exit mata al worker en cada intento: se reintenta una vez y luego 503
+        try:
+            await pool._run(os._exit, 1)
+        except PasswordPoolBusy:
+            pass
+        else:
+            raise AssertionError("se esperaba PasswordPoolBusy")
+        return await pool.hash("secreto1")
+
+    try:
+        hashed = asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+
+    assert verify_password("secreto1", hashed)
+    stats = pool.stats()
+    assert stats["restarts"] == 2
+    assert stats["failed"] == 1
+    assert stats["completed"] == 1
+    assert stats["pending"] == 0